@@ -1,27 +1,65 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from collections import Counter
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
 import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Dataset_prep.tokenization import get_tokenizer, save_cache
 
 DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
 
+def english_words(text):
+    # sklearn's default tokens without its English stop words, from the shared token cache
+    return [w for w in get_tokenizer("sklearn").tokens(text) if w not in ENGLISH_STOP_WORDS]
+
+def build_vectorizer():
+    # the TF-IDF features used for the topic words (and by topic_classifier.py)
+    return TfidfVectorizer(analyzer=english_words)
+
+def document_frequencies(chunks):
+    # pass 1: in how many lines each word appears (adds up over chunks)
+    doc_freq, n_docs = Counter(), 0
+    for chunk in chunks:
+        for text in chunk["text"].astype(str):
+            doc_freq.update(set(english_words(text)))
+        n_docs += len(chunk)
+    return doc_freq, n_docs
+
+def mean_tfidf_by_label(chunks, doc_freq, n_docs):
+    """
+    pass 2: {label: mean TF-IDF row} with the same vocabulary, idf and row
+    normalisation as build_vectorizer().fit_transform() on all lines at once.
+    """
+    vocab = sorted(doc_freq)
+    idf = np.log((1 + n_docs) / (1 + np.array([doc_freq[w] for w in vocab], dtype=float))) + 1
+    counter = CountVectorizer(analyzer=english_words, vocabulary=vocab)
+
+    sums, lines = {}, Counter()
+    for chunk in chunks:
+        tfidf = normalize(counter.transform(chunk["text"].astype(str)).multiply(idf).tocsr())
+        labels = chunk["annotation_label"].astype(str).to_numpy()
+        for cat in np.unique(labels):
+            rows = tfidf[labels == cat]
+            sums[cat] = sums.get(cat, 0) + np.asarray(rows.sum(axis=0)).ravel()
+            lines[cat] += rows.shape[0]
+    return np.array(vocab), {cat: sums[cat] / lines[cat] for cat in sums}
+
 def main():
-    df = pd.read_csv(DATA_PATH)
+    # chunks of ANNOTATION_CHUNK_SIZE lines (or all at once), pending label/text fixes included
+    read = lambda: iter_annotation_frames(DATA_PATH, usecols=["text", "annotation_label"])
     
-    texts = df["text"].astype(str)
-    labels = df["annotation_label"].astype(str)
+    doc_freq, n_docs = document_frequencies(read())
+    vocab, means = mean_tfidf_by_label(read(), doc_freq, n_docs)
+    save_cache()
     
-    vectorizer = TfidfVectorizer(stop_words="english", lowercase=True)
-    tfidf = vectorizer.fit_transform(texts)
-    vocab = np.array(vectorizer.get_feature_names_out())
-    
-    categories = sorted(labels.unique())
+    categories = sorted(means)
     
     print("\n===== TOP 10 TF-IDF WORDS PER CATEGORY =====\n")
     for cat in categories:
-        idx = df.index[df["annotation_label"] == cat]
-        submatrix = tfidf[idx].toarray()
-        
-        mean_tfidf = submatrix.mean(axis=0)
+        mean_tfidf = means[cat]
         top10_idx = mean_tfidf.argsort()[::-1][:10]
         
         print(f"\nCategory: {cat}")
@@ -1,31 +1,33 @@
-import pandas as pd
 from collections import Counter
-from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Analysis.analyze_topics import english_words
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Dataset_prep.tokenization import save_cache
 
 DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
 
 def main():
-    # --------- load data ----------
-    df = pd.read_csv(DATA_PATH)
-
-    assert "text" in df.columns, "Expected a 'text' column"
-    texts = df["text"].astype(str).tolist()
-    print(f"Loaded {len(texts)} annotated lines.")
+    # --------- count tokens, chunk by chunk ----------
+    # chunks of ANNOTATION_CHUNK_SIZE lines (or all at once), pending label/text fixes included
+    term_counts = Counter()
+    n_docs = 0
+    for chunk in iter_annotation_frames(DATA_PATH, usecols=["text"]):
+        for text in chunk["text"].astype(str):
+            term_counts.update(english_words(text))  # lowercase + English stop words, from the token cache
+        n_docs += len(chunk)
+    print(f"Loaded {n_docs} annotated lines.")
 
     # --------- build raw vocabulary ----------
-    # CountVectorizer instead of Tfidf, no max_features limit
-    cv = CountVectorizer(
-        stop_words="english",
-        lowercase=True
-    )
-    X = cv.fit_transform(texts)
-    vocab = cv.get_feature_names_out()
-    term_counts = X.toarray().sum(axis=0)  # total count across all docs
+    # no max_features limit; sorted like CountVectorizer's vocabulary
+    vocab = sorted(term_counts)
 
     print(f"\nTotal unique tokens (after lowercasing + English stopword removal): {len(vocab)}")
 
     # Build a Counter of word -> frequency
-    freq = Counter(dict(zip(vocab, term_counts)))
+    freq = Counter({w: term_counts[w] for w in vocab})
 
     # how many words appear once, 2–5 times, >5 times
     once = sum(1 for c in freq.values() if c == 1)
@@ -57,15 +59,12 @@ def main():
             cov = coverage_at_k(k)
             print(f"\nIf you keep top {k} words, you cover about {cov:.2f}% of all token occurrences.")
 
-    # --------- OPTIONAL: build a TF-IDF model with no max_features ----------
-    # This is just to confirm it runs; you can still add max_features later.
-    print("\nFitting a TF-IDF model with full vocabulary (no max_features)...")
-    tfidf_vec = TfidfVectorizer(
-        stop_words="english",
-        lowercase=True
-    )
-    tfidf_matrix = tfidf_vec.fit_transform(texts)
-    print(f"TF-IDF matrix shape: {tfidf_matrix.shape}  (docs x vocab_size)")
+    # --------- size of a TF-IDF model with no max_features ----------
+    # build_vectorizer() in analyze_topics.py fitted on these lines has one column per word;
+    # you can still add max_features later.
+    print("\nTF-IDF model with full vocabulary (no max_features):")
+    print(f"TF-IDF matrix shape: {(n_docs, len(vocab))}  (docs x vocab_size)")
+    save_cache()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,300 @@
+"""
+Inter-annotator agreement between versions of the annotation dataset.
+
+Every version is one "rater". Versions are joined on annotation_id into an
+items x raters matrix of label codes (-1 = not labelled in that version),
+and everything is computed from two arrays built from it in one shot:
+
+- per-item category counts (items x labels) -> Fleiss' kappa and
+  Krippendorff's alpha (nominal), overall and per label
+- confusion matrices of every rater pair at once (one einsum) -> Cohen's
+  kappa per pair, overall and per label
+
+Per-character numbers reuse the same item-level arrays, summed per
+character with bincount, so no step loops over items or rater pairs in
+Python.
+
+    python src/Analysis/annotator_agreement.py                 # the built-in comparisons
+    python src/Analysis/annotator_agreement.py a.csv b.csv c.csv
+"""
+from pathlib import Path
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.merge_misspelled_labels import LABEL_FIXES
+from Dataset_prep.normalize_movie_names_RDH import NAME_MAP
+
+SPEECHES = Path("data/processed/processed_speeches")
+FINAL = SPEECHES / "annotation_dataset_RHD_final.csv"
+
+# successive annotation snapshots, oldest first
+VERSIONS = {
+    "Patrick": SPEECHES / "Obsolete/annotation_dataset_RHD_Patrick.csv",
+    "Patrick+Bonita": SPEECHES / "Obsolete/annotation_dataset_RHD_Patrick+Bonita.csv",
+    "Patrick+Bonita+Yumin": SPEECHES / "Obsolete/annotation_dataset_RHD_Patrick+Bonita+Yumin.csv",
+    "final": FINAL,
+}
+
+# the open coding sample has no annotation_id; its round-2 labels are matched
+# to the final dataset through (movie, character, speech_id)
+OPEN_CODING = SPEECHES / "Open_coding/DONE_open_coding_sample_RHD_100.csv"
+OPEN_CODING_LABEL = "Round 2"
+
+OUTPUT = SPEECHES / "annotator_agreement.csv"
+
+KEY = "annotation_id"
+LABEL = "annotation_label"
+
+
+# ---------- loading ----------
+
+def clean_labels(labels):
+    labels = labels.astype("string").str.strip()
+    labels = labels.replace(LABEL_FIXES)
+    return labels.mask(labels == "")
+
+
+def read_version(path, label_col=LABEL):
+    # older snapshots are not clean utf-8; only ids, characters and labels are used
+    df = pd.read_csv(path, encoding="utf-8", encoding_errors="replace")
+    out = df[[KEY, "character"]].copy()
+    out[LABEL] = clean_labels(df[label_col])
+    return out
+
+
+def read_open_coding(path=OPEN_CODING, final=FINAL):
+    sample = pd.read_csv(path, encoding="utf-8", encoding_errors="replace")
+    sample["movie"] = sample["movie"].map(lambda m: NAME_MAP.get(m, m))
+    ids = pd.read_csv(final, usecols=[KEY, "movie", "character", "speech_id"])
+    ids["movie"] = ids["movie"].map(lambda m: NAME_MAP.get(m, m))
+
+    joined = sample.merge(ids, on=["movie", "character", "speech_id"], how="inner")
+    out = joined[[KEY, "character"]].copy()
+    out[LABEL] = clean_labels(joined[OPEN_CODING_LABEL])
+    return out
+
+
+def rating_matrix(versions):
+    """
+    versions: {rater name: DataFrame(annotation_id, character, annotation_label)}
+    Returns (codes items x raters with -1 for missing, ids, characters, labels, raters).
+    """
+    raters = list(versions)
+    wide = None
+    characters = []
+    for name in raters:
+        part = versions[name].drop_duplicates(KEY).set_index(KEY)
+        characters.append(part["character"])
+        column = part[LABEL].rename(name)
+        wide = column.to_frame() if wide is None else wide.join(column, how="outer")
+
+    character = pd.concat(characters).groupby(level=0).first().reindex(wide.index)
+    labels = sorted(pd.unique(wide.stack().dropna()))
+    code = {label: i for i, label in enumerate(labels)}
+    codes = wide.apply(lambda col: col.map(code)).fillna(-1).to_numpy(dtype=np.int64)
+    return codes, wide.index.to_numpy(), character.fillna("").to_numpy(), labels, raters
+
+
+# ---------- agreement ----------
+
+def category_counts(codes, n_labels):
+    """items x labels: how many raters gave each label to each item."""
+    n_items, n_raters = codes.shape
+    rated = codes >= 0
+    flat = (np.arange(n_items)[:, None] * n_labels + codes)[rated]
+    return np.bincount(flat, minlength=n_items * n_labels).reshape(n_items, n_labels)
+
+
+def fleiss_kappa(counts, groups=None, n_groups=1):
+    """
+    Fleiss' kappa (items may have different numbers of ratings; items with
+    fewer than two are ignored), overall and per label. With groups (one id
+    per item) every value is computed per group.
+    Returns (kappa[groups], kappa_per_label[groups, labels]).
+    """
+    groups = np.zeros(len(counts), dtype=np.int64) if groups is None else groups
+    m = counts.sum(axis=1).astype(float)
+    usable = m >= 2
+    counts, m, groups = counts[usable].astype(float), m[usable], groups[usable]
+
+    def per_group(values):
+        if values.ndim == 1:
+            return np.bincount(groups, weights=values, minlength=n_groups)
+        return np.stack([np.bincount(groups, weights=v, minlength=n_groups) for v in values.T], axis=1)
+
+    # observed: share of agreeing rater pairs per item
+    p_item = ((counts * (counts - 1)).sum(axis=1)) / (m * (m - 1))
+    n_items = np.bincount(groups, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_obs = per_group(p_item) / n_items
+        p_label = per_group(counts) / per_group(m)[:, None]
+        p_exp = (p_label ** 2).sum(axis=1)
+        kappa = (p_obs - p_exp) / (1 - p_exp)
+
+        # per label: label vs everything else
+        disagree = per_group(counts * (m[:, None] - counts) / (m[:, None] - 1))
+        kappa_label = 1 - disagree / (per_group(m)[:, None] * p_label * (1 - p_label))
+    return kappa, kappa_label
+
+
+def krippendorff_alpha(counts, groups=None, n_groups=1):
+    """
+    Krippendorff's alpha for nominal labels, overall and per label (label
+    vs rest), from the coincidence matrix of every group.
+    Returns (alpha[groups], alpha_per_label[groups, labels]).
+    """
+    groups = np.zeros(len(counts), dtype=np.int64) if groups is None else groups
+    n_labels = counts.shape[1]
+    m = counts.sum(axis=1)
+    usable = m >= 2
+    counts, m, groups = counts[usable].astype(float), m[usable], groups[usable]
+
+    # coincidences o[g, k, l] = sum over items of n_ik * (n_il - [k == l]) / (m_i - 1)
+    weighted = counts / (m - 1)[:, None]
+    one_hot = np.zeros((len(counts), n_groups))
+    one_hot[np.arange(len(counts)), groups] = 1
+    o = np.einsum("ig,ik,il->gkl", one_hot, weighted, counts)
+    o -= np.einsum("ig,ik->gk", one_hot, weighted)[:, :, None] * np.eye(n_labels)
+
+    n_k = o.sum(axis=2)
+    n = n_k.sum(axis=1)
+    observed_off = n - np.trace(o, axis1=1, axis2=2)
+    expected_off = n ** 2 - (n_k ** 2).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        alpha = 1 - (n - 1) * observed_off / expected_off
+        o_kk = np.diagonal(o, axis1=1, axis2=2)
+        alpha_label = 1 - (n[:, None] - 1) * (n_k - o_kk) / (n_k * (n[:, None] - n_k))
+    return alpha, alpha_label
+
+
+def pairwise_confusion(codes, n_labels, groups=None, n_groups=1):
+    """[groups, rater_a, rater_b, label_a, label_b] counts over items both raters labelled."""
+    groups = np.zeros(len(codes), dtype=np.int64) if groups is None else groups
+    one_hot = np.zeros(codes.shape + (n_labels,))
+    items, raters = np.nonzero(codes >= 0)
+    one_hot[items, raters, codes[items, raters]] = 1
+    group_hot = np.zeros((len(codes), n_groups))
+    group_hot[np.arange(len(codes)), groups] = 1
+    return np.einsum("ig,iak,ibl->gabkl", group_hot, one_hot, one_hot)
+
+
+def cohen_kappa(confusion):
+    """Cohen's kappa from confusion matrices [..., k, l]; overall and per label."""
+    n = confusion.sum(axis=(-2, -1))
+    rows = confusion.sum(axis=-1)
+    cols = confusion.sum(axis=-2)
+    diag = np.diagonal(confusion, axis1=-2, axis2=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p_obs = diag.sum(axis=-1) / n
+        p_exp = (rows * cols).sum(axis=-1) / n ** 2
+        kappa = (p_obs - p_exp) / (1 - p_exp)
+
+        # per label: 2x2 table label vs rest
+        n_ = n[..., None]
+        p_obs_k = (n_ - rows - cols + 2 * diag) / n_
+        p_exp_k = (rows * cols + (n_ - rows) * (n_ - cols)) / n_ ** 2
+        kappa_label = (p_obs_k - p_exp_k) / (1 - p_exp_k)
+    return kappa, kappa_label, n
+
+
+# ---------- report ----------
+
+def agreement_report(versions, comparison):
+    codes, ids, characters, labels, raters = rating_matrix(versions)
+    n_labels = len(labels)
+    names = ["ALL"] + sorted(set(characters) - {""})
+    group_of = {name: i for i, name in enumerate(names)}
+    # group 0 = every item, groups 1.. = one per character (items are counted in both)
+    char_groups = np.array([group_of.get(c, 0) for c in characters])
+
+    counts = category_counts(codes, n_labels)
+    rows = []
+    for scope, groups, n_groups, keys in (
+        ("overall", None, 1, ["ALL"]),
+        ("character", char_groups, len(names), names),
+    ):
+        fleiss, fleiss_label = fleiss_kappa(counts, groups, n_groups)
+        alpha, alpha_label = krippendorff_alpha(counts, groups, n_groups)
+        confusion = pairwise_confusion(codes, n_labels, groups, n_groups)
+        kappa, kappa_label, shared = cohen_kappa(confusion)
+        a, b = np.triu_indices(len(raters), k=1)
+
+        for g, key in enumerate(keys):
+            if scope == "character" and g == 0:
+                continue
+            for label_idx, label in enumerate([None] + labels):
+                row = {"comparison": comparison, "scope": scope, "character": key,
+                       "label": label or "ALL"}
+                if label is None:
+                    row.update(fleiss_kappa=fleiss[g], krippendorff_alpha=alpha[g])
+                    pair_values = kappa[g, a, b]
+                else:
+                    row.update(fleiss_kappa=fleiss_label[g, label_idx - 1],
+                               krippendorff_alpha=alpha_label[g, label_idx - 1])
+                    pair_values = kappa_label[g, a, b, label_idx - 1]
+                for i, j, value, n in zip(a, b, pair_values, shared[g, a, b]):
+                    row[f"cohen[{raters[i]}|{raters[j]}]"] = value if n else np.nan
+                rows.append(row)
+
+    both = (codes >= 0).sum(axis=1) >= 2
+    print(f"\n=== {comparison}: {len(raters)} raters, {both.sum()} items labelled at least twice ===")
+    return pd.DataFrame(rows)
+
+
+def print_summary(report):
+    overall = report[(report["scope"] == "overall") & (report["label"] == "ALL")]
+    cohen_cols = [c for c in report.columns if c.startswith("cohen[")]
+    for _, r in overall.iterrows():
+        print(f"Fleiss' kappa {r['fleiss_kappa']:.3f}   Krippendorff's alpha {r['krippendorff_alpha']:.3f}")
+        for c in cohen_cols:
+            if pd.notna(r[c]):
+                print(f"  Cohen's kappa {c[6:-1]:<40} {r[c]:.3f}")
+
+    per_label = report[(report["scope"] == "overall") & (report["label"] != "ALL")]
+    print("\nPer label (alpha, label vs rest):")
+    for _, r in per_label.iterrows():
+        print(f"  {r['label']:<15} {r['krippendorff_alpha']:.3f}")
+
+    per_char = report[(report["scope"] == "character") & (report["label"] == "ALL")]
+    print("\nPer character (alpha):")
+    for _, r in per_char.iterrows():
+        if pd.notna(r["krippendorff_alpha"]):
+            print(f"  {r['character']:<15} {r['krippendorff_alpha']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agreement between annotation versions.")
+    parser.add_argument("files", nargs="*", help="annotation CSVs to compare (default: built-in versions)")
+    parser.add_argument("--label-column", default=LABEL)
+    args = parser.parse_args()
+
+    if args.files:
+        comparisons = {
+            "files": {Path(f).stem: read_version(f, args.label_column) for f in args.files},
+        }
+    else:
+        comparisons = {
+            "annotation versions": {name: read_version(path) for name, path in VERSIONS.items()},
+            "open coding round 2 vs final": {
+                "open_coding": read_open_coding(),
+                "final": read_version(FINAL),
+            },
+        }
+
+    reports = []
+    for name, versions in comparisons.items():
+        report = agreement_report(versions, name)
+        print_summary(report)
+        reports.append(report)
+
+    out = pd.concat(reports, ignore_index=True)
+    out.to_csv(OUTPUT, index=False)
+    print(f"\nSaved → {OUTPUT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Bootstrap confidence intervals for the topic shares and the TF-IDF top words.
+
+Every statistic is recomputed on N_RESAMPLES resamples of the annotated
+lines. Resamples are drawn as index matrices (one row per resample), or
+directly as multinomial counts where only counts matter, and evaluated
+with array operations, so a shard of resamples costs a few numpy calls.
+The resamples are cut into a fixed number of shards, each with its own
+seed spawned from SEED, so results don't depend on the number of workers.
+Large runs (TF-IDF) spread the shards over worker processes; small ones
+(the topic shares of the charts) run them in-process, where starting a
+pool would cost more than the resamples.
+
+- topic shares: each character's lines are resampled separately (its
+  number of lines stays fixed), CI per character x topic percentage. A
+  resample of n lines only changes the topic counts, which are a
+  multinomial draw from the observed shares, so the CI needs the counts
+  alone (topic_counts(), summed over chunks for large files)
+- TF-IDF: all lines are resampled, the label-level TF-IDF of
+  compute_tf_idf.py is recomputed, CI for the score and the rank of every
+  word in tfidf_custom_labels.csv plus how often it stays in the top 10
+
+    python src/Analysis/bootstrap_ci.py
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+from Dataset_prep.annotation_store import read_annotation_frame
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
+TFIDF_PATH = "data/processed/processed_speeches/tfidf_custom_labels.csv"
+TOPIC_CI_OUT = "data/processed/processed_speeches/topic_distribution_RHD_ci.csv"
+TFIDF_CI_OUT = "data/processed/processed_speeches/tfidf_custom_labels_ci.csv"
+
+TOPIC_ORDER = ["Danger", "Duty", "Informative", "Magic", "Mockery", "Relationship", "Storyline"]
+
+N_RESAMPLES = 2000
+CONFIDENCE = 0.95
+SEED = 42
+TOP_K = 10
+N_SHARDS = 8  # fixed, so the seeds (and results) don't depend on the worker count
+CHUNK = 50  # resamples evaluated together inside a worker (bounds memory)
+MIN_PARALLEL_WORK = 5_000_000  # array elements over all resamples below which shards run in-process
+
+
+# ---------- engine ----------
+
+def shard_sizes(n_resamples, n_shards):
+    base, extra = divmod(n_resamples, n_shards)
+    return [base + (i < extra) for i in range(n_shards) if base + (i < extra)]
+
+
+def run_sharded(worker, args, n_resamples=N_RESAMPLES, n_jobs=None, seed=SEED, work=None):
+    """
+    Split n_resamples into N_SHARDS shards run on n_jobs processes.
+    worker(*args, size, seed) returns arrays with the resamples on axis 0;
+    the shards are concatenated in order. work is the number of array
+    elements one resample touches; with n_jobs=None, runs under
+    MIN_PARALLEL_WORK in total stay in this process.
+    """
+    sizes = shard_sizes(n_resamples, N_SHARDS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if n_jobs is None and work is not None and work * n_resamples < MIN_PARALLEL_WORK:
+        n_jobs = 1
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(sizes)))
+
+    if n_jobs == 1:
+        results = [worker(*args, size, s) for size, s in zip(sizes, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(worker, *args, size, s) for size, s in zip(sizes, seeds)]
+            results = [f.result() for f in futures]
+
+    if isinstance(results[0], tuple):
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+    return np.concatenate(results)
+
+
+def percentile_ci(samples, confidence=CONFIDENCE):
+    alpha = (1 - confidence) / 2
+    low, high = np.percentile(samples, [100 * alpha, 100 * (1 - alpha)], axis=0)
+    return low, high
+
+
+# ---------- topic shares ----------
+
+def _topic_share_worker(counts, size, seed):
+    # -> (size, groups, topics) percentages
+    rng = np.random.default_rng(seed)
+    n = counts.sum(axis=1)
+    shares = np.divide(counts, n[:, None], out=np.zeros(counts.shape), where=n[:, None] > 0)
+    shares[n == 0, -1] = 1.0                               # any valid distribution, n = 0 draws nothing
+    draws = rng.multinomial(n, shares, size=(size, len(n)))  # one resample per row
+    return np.divide(100 * draws, n[:, None], out=np.zeros(draws.shape), where=n[:, None] > 0)
+
+
+def topic_counts(df, groups=TARGET_CHARACTERS, topics=TOPIC_ORDER, group_col="character"):
+    """
+    (groups x topics + 1) line counts; the last column counts lines with a
+    topic outside `topics` (they still count in the denominator).
+    Counts of separate chunks of the data add up.
+    """
+    labels = df["annotation_label"].astype(str).str.strip()
+    topic_code = {t: i for i, t in enumerate(topics)}
+    codes = labels.map(topic_code).fillna(len(topics)).to_numpy(dtype=np.int64)
+
+    if groups is None:
+        masks = [np.ones(len(df), dtype=bool)]
+    else:
+        column = df[group_col].to_numpy()
+        masks = [column == g for g in groups]
+    return np.array([np.bincount(codes[m], minlength=len(topics) + 1) for m in masks], dtype=np.int64)
+
+
+def topic_share_ci(df, groups=TARGET_CHARACTERS, topics=TOPIC_ORDER, group_col="character", **kwargs):
+    """
+    Long table group, annotation_label, pct, ci_low, ci_high.
+    groups=None treats all lines as one group ("ALL").
+    """
+    counts = topic_counts(df, groups, topics, group_col)
+    return topic_share_ci_from_counts(counts, groups, topics, group_col, **kwargs)
+
+
+def topic_share_ci_from_counts(counts, groups=TARGET_CHARACTERS, topics=TOPIC_ORDER, group_col="character",
+                               n_resamples=N_RESAMPLES, n_jobs=None, confidence=CONFIDENCE, seed=SEED):
+    """topic_share_ci() from the (summed) output of topic_counts()."""
+    keys = ["ALL"] if groups is None else list(groups)
+    samples = run_sharded(
+        _topic_share_worker, (counts,),
+        n_resamples=n_resamples, n_jobs=n_jobs, seed=seed, work=counts.size,
+    )[:, :, :len(topics)]
+    low, high = percentile_ci(samples, confidence)
+
+    rows = []
+    for g, key in enumerate(keys):
+        n = counts[g].sum()
+        for t, topic in enumerate(topics):
+            rows.append({
+                group_col: key,
+                "annotation_label": topic,
+                "pct": 100 * counts[g, t] / n if n else 0.0,
+                "ci_low": low[g, t],
+                "ci_high": high[g, t],
+            })
+    return pd.DataFrame(rows)
+
+
+# ---------- TF-IDF top words ----------
+
+def term_matrix(texts):
+    """(lines x vocabulary) token counts with the tokenizer of compute_tf_idf.py."""
+    tokenizer = get_tokenizer("split")
+    columns = {}  # shared token id -> column, in order of first appearance
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        for token_id in tokenizer.ids(text):
+            rows.append(i)
+            cols.append(columns.setdefault(token_id, len(columns)))
+    data = np.ones(len(rows))
+    X = sparse.csr_matrix((data, (rows, cols)), shape=(len(texts), len(columns)))
+    X.sum_duplicates()
+    words = tokenizer.vocab.tokens
+    return X, {words[token_id]: col for token_id, col in columns.items()}
+
+
+def label_tfidf(counts):
+    """counts (..., labels, words) -> TF-IDF as in compute_tf_idf.py."""
+    totals = counts.sum(axis=-1, keepdims=True)
+    tf = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+    present = counts > 0
+    n_labels = (totals[..., 0] > 0).sum(axis=-1)[..., None]          # labels with any tokens
+    df_word = present.sum(axis=-2)
+    idf = np.log(np.divide(n_labels, df_word, out=np.ones(df_word.shape), where=df_word > 0))
+    return tf * idf[..., None, :]
+
+
+def _tfidf_worker(X, label_codes, n_labels, tracked_labels, tracked_words, size, seed):
+    # -> scores (size, tracked), ranks (size, tracked)
+    rng = np.random.default_rng(seed)
+    n = X.shape[0]
+    Xt = X.T.tocsr()
+    scores = np.empty((size, len(tracked_words)))
+    ranks = np.empty((size, len(tracked_words)), dtype=np.int64)
+
+    for start in range(0, size, CHUNK):
+        m = min(CHUNK, size - start)
+        idx = rng.integers(0, n, size=(m, n))
+        weights = np.zeros((m, n))
+        np.add.at(weights, (np.arange(m)[:, None], idx), 1)      # how often each line was drawn
+
+        # (m, labels, lines) weights -> (m, labels, words) counts in one sparse product
+        per_label = np.zeros((m, n_labels, n))
+        per_label[:, label_codes, np.arange(n)] = weights
+        counts = (Xt @ per_label.reshape(m * n_labels, n).T).T.reshape(m, n_labels, -1)
+
+        tfidf = label_tfidf(counts)
+        value = tfidf[:, tracked_labels, tracked_words]              # (m, tracked)
+        rivals = tfidf[:, tracked_labels, :]                         # (m, tracked, words)
+        scores[start:start + m] = value
+        ranks[start:start + m] = 1 + (rivals > value[..., None]).sum(axis=-1)
+    return scores, ranks
+
+
+def tfidf_ci(df, top_words, n_resamples=N_RESAMPLES, n_jobs=None, confidence=CONFIDENCE,
+             seed=SEED, top_k=TOP_K):
+    """
+    CI for every (annotation_label, word) row of top_words (the table written
+    by compute_tf_idf.py): score interval, rank interval and how often the
+    word is still in the label's top_k.
+    """
+    labels = sorted(df["annotation_label"].unique())
+    label_code = {label: i for i, label in enumerate(labels)}
+    X, vocab = term_matrix(df["text"].astype(str).tolist())
+    label_codes = df["annotation_label"].map(label_code).to_numpy()
+
+    known = top_words[top_words["word"].isin(vocab) & top_words["annotation_label"].isin(label_code)]
+    tracked_labels = known["annotation_label"].map(label_code).to_numpy()
+    tracked_words = known["word"].map(vocab).to_numpy()
+
+    scores, ranks = run_sharded(
+        _tfidf_worker, (X, label_codes, len(labels), tracked_labels, tracked_words),
+        n_resamples=n_resamples, n_jobs=n_jobs, seed=seed, work=len(labels) * (X.shape[0] + X.shape[1]),
+    )
+    low, high = percentile_ci(scores, confidence)
+    rank_low, rank_high = percentile_ci(ranks, confidence)
+
+    out = known[["annotation_label", "word", "tfidf"]].copy()
+    out["ci_low"] = low
+    out["ci_high"] = high
+    out["rank_low"] = np.floor(rank_low).astype(int)
+    out["rank_high"] = np.ceil(rank_high).astype(int)
+    out[f"p_top{top_k}"] = (ranks <= top_k).mean(axis=0)
+    return out.reset_index(drop=True)
+
+
+def main():
+    df = read_annotation_frame(DATA_PATH)  # includes pending label/text fixes
+    df["annotation_label"] = df["annotation_label"].str.strip()
+    print(f"Loaded {len(df)} annotated lines, {N_RESAMPLES} resamples, {os.cpu_count()} workers")
+
+    start = time.perf_counter()
+    shares = topic_share_ci(df)
+    shares.to_csv(TOPIC_CI_OUT, index=False)
+    print(f"Topic shares done in {time.perf_counter() - start:.1f}s → {TOPIC_CI_OUT}")
+
+    start = time.perf_counter()
+    top_words = pd.read_csv(TFIDF_PATH, keep_default_na=False)
+    words = tfidf_ci(df, top_words)
+    save_cache()
+    words.to_csv(TFIDF_CI_OUT, index=False)
+    print(f"TF-IDF top words done in {time.perf_counter() - start:.1f}s → {TFIDF_CI_OUT}")
+
+    print(f"\n{int(CONFIDENCE * 100)}% intervals, % of each character's lines:\n")
+    for char, part in shares.groupby("character", sort=False):
+        print(f"{char}:")
+        for _, r in part.iterrows():
+            print(f"  {r['annotation_label']:<15} {r['pct']:6.2f}%  [{r['ci_low']:.2f}, {r['ci_high']:.2f}]")
+        print()
+
+    unstable = words[words[f"p_top{TOP_K}"] < 0.5]
+    print(f"{len(unstable)} of {len(words)} top-{TOP_K} TF-IDF words drop out of the top {TOP_K} in most resamples")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,69 @@
-import pandas as pd
 import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
 
-df = pd.read_csv("data/processed/processed_speeches/annotation_dataset_RHD_final.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Analysis.bootstrap_ci import topic_counts, topic_share_ci_from_counts
 
-# Ensure label column is correct
-df['annotation_label'] = df['annotation_label'].str.strip()
+DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
 
-characters = ["RON", "HERMIONE", "DUMBLEDORE"]
 
-results = {}
+def main():
+    # chunks of ANNOTATION_CHUNK_SIZE lines (or all at once), pending label/text fixes included
+    read = lambda: iter_annotation_frames(DATA_PATH, usecols=["character", "annotation_label"])
 
-for char in characters:
-    subset = df[df["character"] == char]
+    characters = TARGET_CHARACTERS
 
-    # Count topics
-    counts = subset["annotation_label"].value_counts()
+    results = {}
 
-    # Convert to percentage
-    perc = (counts / counts.sum()) * 100
+    # Count topics for every character in one pass (the counts of the chunks add up)
+    counts_by_char = None
+    for chunk in read():
+        # Ensure label column is correct
+        chunk['annotation_label'] = chunk['annotation_label'].str.strip()
+        part = chunk.groupby("character")["annotation_label"].value_counts()
+        counts_by_char = part if counts_by_char is None else counts_by_char.add(part, fill_value=0)
+    counts_by_char = counts_by_char.astype(int)
 
-    # Save top 3
-    results[char] = perc.head(3)
+    # Bootstrap 95% intervals for every character x topic share
+    topics = sorted(counts_by_char.index.get_level_values(1).unique())
+    pairs = sum(topic_counts(chunk, characters, topics) for chunk in read())
+    ci = topic_share_ci_from_counts(pairs, characters, topics).set_index(["character", "annotation_label"])
 
-    # --- Plot ---
-    plt.figure(figsize=(6,4))
-    perc.head(3).plot(kind="bar", color=["#4C72B0", "#55A868", "#C44E52"])
-    plt.title(f"Top 3 Topics for {char}")
-    plt.ylabel("Percentage of speech (%)")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+    for char in characters:
+        if char not in counts_by_char.index.get_level_values(0):
+            continue
+        # most frequent first, ties in topic order
+        counts = counts_by_char.loc[char].sort_index().sort_values(ascending=False, kind="stable")
 
-# Print results numerically too
-print("\n=== TOP 3 TOPICS PER CHARACTER ===\n")
-for char, data in results.items():
-    print(f"{char}:")
-    for topic, pct in data.items():
-        print(f"  {topic:<15} {pct:.2f}%")
-    print()
+        # Convert to percentage
+        perc = (counts / counts.sum()) * 100
+
+        # Save top 3
+        results[char] = perc.head(3)
+        top_ci = ci.loc[char].reindex(perc.head(3).index)
+
+        # --- Plot ---
+        plt.figure(figsize=(6,4))
+        yerr = [perc.head(3) - top_ci["ci_low"], top_ci["ci_high"] - perc.head(3)]
+        perc.head(3).plot(kind="bar", color=["#4C72B0", "#55A868", "#C44E52"], yerr=yerr, capsize=4)
+        plt.title(f"Top 3 Topics for {char}")
+        plt.ylabel("Percentage of speech (%)")
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        plt.show()
+
+    # Print results numerically too
+    print("\n=== TOP 3 TOPICS PER CHARACTER ===\n")
+    for char, data in results.items():
+        print(f"{char}:")
+        for topic, pct in data.items():
+            low, high = ci.loc[(char, topic), ["ci_low", "ci_high"]]
+            print(f"  {topic:<15} {pct:.2f}%  (95% CI {low:.2f}–{high:.2f})")
+        print()
+
+
+if __name__ == "__main__":
+    main()
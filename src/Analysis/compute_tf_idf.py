@@ -2,45 +2,72 @@ import pandas as pd
 import numpy as np
 from collections import Counter
 import math
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Dataset_prep.sentences import spans_from_starts
+from Dataset_prep.tokenization import get_tokenizer, save_cache
 
 INPUT = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
 OUTPUT = "data/processed/processed_speeches/tfidf_custom_labels.csv"
+# --sentences: every sentence of a labelled line counts a word once, under the line's label
+SENTENCES_OUTPUT = "data/processed/processed_speeches/tfidf_custom_labels_sentences.csv"
 
-def tokenize(text):
-    # basic tokenization — you can improve later
-    return [
-        w.lower()
-        for w in text.replace(".", " ").replace(",", " ").split()
-        if w.strip()
-    ]
-
-def main():
-    df = pd.read_csv(INPUT)
+def token_ids(text):
+    # basic tokenization: lowercase, split on spaces, dots and commas (the "split" preset, cached ids)
+    return get_tokenizer("split").ids(text)
 
-    print(f"Loaded {len(df)} annotated lines.")
+def sentence_token_ids(text, starts=None):
+    # the distinct tokens of each sentence: stored sentence_starts offsets if the file has them,
+    # otherwise the text is segmented (sentences.py)
+    for start, end in spans_from_starts(text, starts):
+        yield set(token_ids(text[start:end]))
 
+def main(per_sentence=False):
     # -------------------------------
-    # GROUP TEXT BY LABEL (TYPE)
+    # COUNT TOKENS PER LABEL (TYPE)
     # -------------------------------
-    grouped = df.groupby("annotation_label")["text"].apply(list)
-    labels = grouped.index.tolist()
+    # chunks of ANNOTATION_CHUNK_SIZE lines (or all at once), pending label/text fixes included;
+    # token counts of the chunks add up, in order of first appearance
+    counts_by_label = {}
+    n_lines = n_sentences = 0
+    columns = ("text", "annotation_label", "sentence_starts") if per_sentence else ("text", "annotation_label")
+    for chunk in iter_annotation_frames(INPUT, usecols=lambda c: c in columns):
+        n_lines += len(chunk)
+        starts = chunk["sentence_starts"] if "sentence_starts" in chunk else [None] * len(chunk)
+        for label, text, line_starts in zip(chunk["annotation_label"], chunk["text"], starts):
+            if pd.isna(label):
+                continue  # unlabelled lines are left out, as groupby does
+            counts = counts_by_label.setdefault(label, Counter())
+            if per_sentence:
+                for sentence in sentence_token_ids(text, None if pd.isna(line_starts) else str(line_starts)):
+                    counts.update(sentence)
+                    n_sentences += 1
+            else:
+                # same tokens as tokenizing the joined texts, but each text hits the cache
+                counts.update(token_ids(text))
+
+    print(f"Loaded {n_lines} annotated lines" + (f" ({n_sentences} labelled sentences)." if per_sentence else "."))
+
+    # token ids -> words, keeping the order of first appearance
+    words = get_tokenizer("split").vocab.tokens
+    counts_by_label = {
+        label: Counter({words[i]: n for i, n in counts.items()}) for label, counts in counts_by_label.items()
+    }
+
+    labels = sorted(counts_by_label)
     num_types = len(labels)
 
-    # store all tokens per label
-    tokens_by_label = {}
-    for label in labels:
-        combined = " ".join(grouped[label])
-        tokens = tokenize(combined)
-        tokens_by_label[label] = tokens
-
     # -------------------------------
     # COMPUTE TF
     # -------------------------------
     tf = {}  # tf[label][word] = value
 
-    for label, tokens in tokens_by_label.items():
-        total_words = len(tokens)
-        counts = Counter(tokens)
+    for label in labels:
+        counts = counts_by_label[label]
+        total_words = sum(counts.values())
         tf[label] = {
             word: counts[word] / total_words
             for word in counts
@@ -52,9 +79,8 @@ def main():
     # Determine in which labels each word appears
     word_in_labels = {}
 
-    for label, tokens in tokens_by_label.items():
-        unique_words = set(tokens)
-        for w in unique_words:
+    for label in labels:
+        for w in counts_by_label[label]:
             word_in_labels.setdefault(w, set()).add(label)
 
     idf = {}
@@ -90,11 +116,16 @@ def main():
         top = subset.sort_values("tfidf", ascending=False).head(10)
         top_rows.extend(top.to_dict(orient="records"))
 
+    output = SENTENCES_OUTPUT if per_sentence else OUTPUT
     out_df = pd.DataFrame(top_rows)
-    out_df.to_csv(OUTPUT, index=False)
+    out_df.to_csv(output, index=False)
+    save_cache()
 
-    print("\nSaved →", OUTPUT)
+    print("\nSaved →", output)
     print("Done.")
 
+def main_sentences():
+    main(per_sentence=True)
+
 if __name__ == "__main__":
-    main()
+    main(per_sentence="--sentences" in sys.argv[1:])
@@ -0,0 +1,191 @@
+"""
+Keyword-in-context (KWIC) concordance over every parsed speech.
+
+"Where does this word come from?" for any word or phrase, e.g. one that
+tops a label in tfidf_custom_labels.csv or a collocation of
+ngram_stats.py. Every hit is shown with its movie, character, speech_id
+and WIDTH characters of context on each side, in corpus order, one page
+at a time.
+
+Lines are tokenized with the shared "ngram" preset (lowercase words with
+inner apostrophes, see Dataset_prep/tokenization.py), so a phrase matches
+exactly the n-grams that ngram_stats.py counts; phrases never cross a line.
+The index is positional: every token occurrence is one integer key
+line * stride + position, and each word's keys are stored sorted in one
+array (CSR layout, offsets per word id). A phrase "w1 w2 ... wn" is the
+keys k of w1 for which k + i is a key of w(i+1), a vectorized membership
+test per word, so a query costs about the length of its words' postings
+lists, not the size of the corpus. Only the lines of the page shown are
+cut into KWIC windows.
+
+    python src/Analysis/concordance.py "dark lord"
+    python src/Analysis/concordance.py wand --character Harry --page 2 --per-page 10
+    python src/Analysis/concordance.py      # interactive: a query, then n / p to page, q to quit
+"""
+from array import array
+from collections import namedtuple
+from pathlib import Path
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.corpus import iter_corpus
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+PRESET = "ngram"
+PER_PAGE = 20
+WIDTH = 40  # characters of context on each side
+
+Hit = namedtuple("Hit", ["movie", "character", "speech_id", "left", "match", "right"])
+
+
+def _context(text, width, from_end):
+    text = " ".join(text.split())
+    if len(text) <= width:
+        return text
+    return "…" + text[-(width - 1):] if from_end else text[:width - 1] + "…"
+
+
+class Concordance:
+    """Positional index of (movie, character, speech_id, text) rows; find() a phrase, page() its hits."""
+
+    def __init__(self, rows=None, preset=PRESET):
+        self.rows = list(rows if rows is not None else iter_corpus())
+        self.tokenizer = get_tokenizer(preset)
+
+        ids = array("I")
+        lengths = np.empty(len(self.rows), dtype=np.int64)
+        for i, row in enumerate(self.rows):
+            line = self.tokenizer.ids(row[3])
+            ids.extend(line)
+            lengths[i] = len(line)
+        tokens = np.frombuffer(ids, dtype=np.uintc) if len(ids) else np.empty(0, dtype=np.uintc)
+
+        # key of every occurrence: line * stride + position in the line
+        self.stride = int(lengths.max(initial=0)) + 1
+        starts = np.cumsum(lengths) - lengths
+        lines = np.repeat(np.arange(len(self.rows), dtype=np.int64), lengths)
+        keys = lines * self.stride + (np.arange(len(tokens), dtype=np.int64) - np.repeat(starts, lengths))
+
+        # stable sort by word keeps every postings list in corpus order
+        order = np.argsort(tokens, kind="stable")
+        self.keys = keys[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(tokens, minlength=len(self.tokenizer.vocab)))])
+        self._filters = {}
+
+    def postings(self, word):
+        i = self.tokenizer.vocab.ids.get(word)
+        if i is None or i + 1 >= len(self.offsets):
+            return self.keys[:0]
+        return self.keys[self.offsets[i]:self.offsets[i + 1]]
+
+    def find(self, phrase, movie=None, character=None):
+        """-> (keys of the phrase's first word at every match, number of words in the phrase)."""
+        words = self.tokenizer.tokenize(phrase)
+        if not words:
+            return self.keys[:0], 0
+        lists = [self.postings(w) for w in words]
+        hits = lists[0]
+        for i, keys in enumerate(lists[1:], start=1):
+            if len(hits) == 0:
+                break
+            hits = hits[np.isin(hits + i, keys, assume_unique=True)]
+        if movie or character:
+            hits = hits[self._filter(movie, character)[hits // self.stride]]
+        return hits, len(words)
+
+    def _filter(self, movie, character):
+        # boolean mask over lines, one per (movie, character) asked for
+        key = (movie, (character or "").lower() or None)
+        mask = self._filters.get(key)
+        if mask is None:
+            mask = self._filters[key] = np.fromiter(
+                ((movie is None or r[0] == movie) and (key[1] is None or r[1].lower() == key[1]) for r in self.rows),
+                dtype=bool, count=len(self.rows),
+            )
+        return mask
+
+    def _token_spans(self, text):
+        # character spans of the tokens the index saw (translation and lowercasing keep offsets)
+        tok = self.tokenizer
+        if tok.table:
+            text = text.translate(tok.table)
+        if tok.lowercase:
+            text = text.lower()
+        return [m.span() for m in tok.regex.finditer(text)]
+
+    def kwic(self, key, n_words, width=WIDTH):
+        line, position = divmod(int(key), self.stride)
+        movie, character, speech_id, text = self.rows[line]
+        spans = self._token_spans(text)
+        start, end = spans[position][0], spans[position + n_words - 1][1]
+        return Hit(movie, character, speech_id,
+                   _context(text[:start], width, from_end=True), text[start:end],
+                   _context(text[end:], width, from_end=False))
+
+    def page(self, phrase, page=1, per_page=PER_PAGE, movie=None, character=None, width=WIDTH):
+        """-> (total hits, lines with a hit, KWIC hits of this page)."""
+        hits, n_words = self.find(phrase, movie, character)
+        lines = hits // self.stride  # sorted, so distinct lines are where it changes
+        n_lines = int(np.count_nonzero(np.diff(lines))) + 1 if len(lines) else 0
+        first = (page - 1) * per_page
+        return len(hits), n_lines, [self.kwic(k, n_words, width) for k in hits[first:first + per_page]]
+
+
+def print_page(phrase, total, n_lines, hits, page, per_page, ms, width=WIDTH):
+    pages = max(1, math.ceil(total / per_page))
+    print(f'\n"{phrase}": {total} hits in {n_lines} lines, page {page}/{pages} ({ms:.1f} ms)')
+    for h in hits:
+        print(f"  {h.movie:<24} {h.character:<12} #{h.speech_id:<5} {h.left:>{width}} [{h.match}] {h.right}")
+
+
+def interactive(index, per_page, movie, character):
+    phrase, page = None, 1
+    while True:
+        try:
+            command = input("\nkwic> ").strip()
+        except EOFError:
+            break
+        if command in ("", "q", "quit"):
+            break
+        if command in ("n", "p"):
+            if phrase is None:
+                continue
+            page = page + 1 if command == "n" else max(1, page - 1)
+        else:
+            phrase, page = command, 1
+        start = time.perf_counter()
+        total, n_lines, hits = index.page(phrase, page, per_page, movie, character)
+        print_page(phrase, total, n_lines, hits, page, per_page, (time.perf_counter() - start) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword-in-context lines for a word or phrase.")
+    parser.add_argument("phrase", nargs="*", help="word or phrase (interactive prompt if left out)")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--per-page", type=int, default=PER_PAGE)
+    parser.add_argument("--movie", help="only lines of this movie id")
+    parser.add_argument("--character", help="only lines of this character")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = Concordance()
+    save_cache()
+    print(f"Indexed {len(index.keys)} tokens of {len(index.rows)} lines in {time.perf_counter() - start:.2f}s")
+
+    if not args.phrase:
+        interactive(index, args.per_page, args.movie, args.character)
+        return
+
+    phrase = " ".join(args.phrase)
+    start = time.perf_counter()
+    total, n_lines, hits = index.page(phrase, args.page, args.per_page, args.movie, args.character)
+    print_page(phrase, total, n_lines, hits, args.page, args.per_page, (time.perf_counter() - start) * 1000)
+
+
+if __name__ == "__main__":
+    main()
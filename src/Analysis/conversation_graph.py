@@ -0,0 +1,166 @@
+"""
+Who speaks after whom, and who shares scenes, for every movie.
+
+Reads the all-character TSVs (scene_id comes from parse_dialogue.py through
+corpus.py, the scripts are not parsed again) in one pass and builds, over one shared
+character index:
+
+- turns: T[a, b] = how often b speaks right after a within a scene
+- co-occurrence: C[a, b] = number of scenes in which both a and b speak
+  (C[a, a] = scenes a speaks in)
+
+Both are scipy.sparse matrices per movie plus one over all movies. A scene
+is a row of a sparse scenes x characters incidence matrix S, so
+co-occurrence is S.T @ S; turns are summed from a COO list of consecutive
+speaker pairs. The per-scene turn counts are also written as a long table.
+
+    python src/Analysis/conversation_graph.py
+"""
+from pathlib import Path
+import csv
+import sys
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import clean_cue, get_resolver
+from Dataset_prep.corpus import read_speeches
+from Dataset_prep.parse_dialogue import MOVIES
+
+OUTPUT_DIR = Path("data/processed/processed_speeches/conversation_graph")
+
+# printed summary
+FOCUS = ["HARRY", "RON", "HERMIONE", "DUMBLEDORE"]
+
+
+def read_scenes(movies=MOVIES):
+    """(movie, scene_id, canonical character) for every speech, in script order."""
+    resolver = get_resolver()
+    for movie in movies:
+        for row in read_speeches(movie):
+            if not row["scene_id"]:
+                print(f"Warning: no scene ids for {movie}, run parse_dialogue.py first")
+                break
+            raw = (row.get("character") or "").strip()
+            name = resolver.canonical_name(row["character_id"]) or clean_cue(raw)
+            if name:
+                yield movie, int(row["scene_id"]), name
+
+
+class ConversationGraph:
+    """Sparse turn and co-occurrence matrices over one character index."""
+
+    def __init__(self, speeches):
+        self.characters = {}
+        movies, scenes, speakers = [], [], []
+        for movie, scene_id, name in speeches:
+            movies.append(movie)
+            scenes.append(scene_id)
+            speakers.append(self.characters.setdefault(name, len(self.characters)))
+
+        self.names = list(self.characters)
+        self.movie_names = list(dict.fromkeys(movies))
+        movie_code = {m: i for i, m in enumerate(self.movie_names)}
+        self.movie = np.array([movie_code[m] for m in movies], dtype=np.int64)
+        self.scene = np.array(scenes, dtype=np.int64)
+        self.speaker = np.array(speakers, dtype=np.int64)
+        self.lines = np.bincount(self.speaker, minlength=len(self.names))
+
+        # global scene number: a new scene starts whenever (movie, scene_id) changes
+        new_scene = np.ones(len(self.speaker), dtype=bool)
+        new_scene[1:] = (self.movie[1:] != self.movie[:-1]) | (self.scene[1:] != self.scene[:-1])
+        self.scene_index = np.cumsum(new_scene) - 1
+        starts = np.flatnonzero(new_scene)
+        self.scene_movie = self.movie[starts]
+        self.scene_id = self.scene[starts]
+
+        # consecutive speeches in the same scene by different speakers
+        same_scene = ~new_scene[1:]
+        changes = self.speaker[1:] != self.speaker[:-1]
+        keep = np.flatnonzero(same_scene & changes)
+        self.turn_src = self.speaker[keep]
+        self.turn_dst = self.speaker[keep + 1]
+        self.turn_scene = self.scene_index[keep + 1]
+
+    def _shape(self):
+        return len(self.names), len(self.names)
+
+    def turns(self, movie=None):
+        mask = np.ones(len(self.turn_src), dtype=bool)
+        if movie is not None:
+            mask = self.scene_movie[self.turn_scene] == self.movie_names.index(movie)
+        data = np.ones(int(mask.sum()), dtype=np.int64)
+        return sparse.coo_matrix((data, (self.turn_src[mask], self.turn_dst[mask])), shape=self._shape()).tocsr()
+
+    def incidence(self, movie=None):
+        """scenes x characters, 1 where the character speaks in the scene."""
+        n_scenes = len(self.scene_movie)
+        S = sparse.coo_matrix(
+            (np.ones(len(self.speaker), dtype=np.int64), (self.scene_index, self.speaker)),
+            shape=(n_scenes, len(self.names)),
+        ).tocsr()
+        S.data[:] = 1  # speaking twice in a scene still counts once
+        if movie is not None:
+            S = S[np.flatnonzero(self.scene_movie == self.movie_names.index(movie))]
+        return S
+
+    def cooccurrence(self, movie=None):
+        S = self.incidence(movie)
+        return (S.T @ S).tocsr()
+
+    def scene_turns(self):
+        """Rows (movie, scene_id, speaker, next_speaker, turns), one per pair and scene."""
+        n = len(self.names)
+        pair_key = (self.turn_scene * n + self.turn_src) * n + self.turn_dst
+        keys, counts = np.unique(pair_key, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            scene, rest = divmod(key, n * n)
+            src, dst = divmod(rest, n)
+            yield (self.movie_names[self.scene_movie[scene]], int(self.scene_id[scene]),
+                   self.names[src], self.names[dst], count)
+
+
+def focus_table(matrix, graph, names=FOCUS):
+    idx = [graph.characters[n] for n in names if n in graph.characters]
+    return matrix[idx][:, idx].toarray(), [graph.names[i] for i in idx]
+
+
+def main():
+    graph = ConversationGraph(read_scenes())
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    with (OUTPUT_DIR / "characters.csv").open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(["index", "character", "lines"])
+        for i, name in enumerate(graph.names):
+            writer.writerow([i, name, int(graph.lines[i])])
+
+    for movie in [None] + graph.movie_names:
+        suffix = movie or "all_movies"
+        sparse.save_npz(OUTPUT_DIR / f"turns_{suffix}.npz", graph.turns(movie))
+        sparse.save_npz(OUTPUT_DIR / f"cooccurrence_{suffix}.npz", graph.cooccurrence(movie))
+
+    with (OUTPUT_DIR / "scene_turns.csv").open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(["movie", "scene_id", "speaker", "next_speaker", "turns"])
+        writer.writerows(graph.scene_turns())
+
+    print(f"{len(graph.speaker)} speeches, {len(graph.scene_movie)} scenes, {len(graph.names)} characters, "
+          f"{len(graph.turn_src)} turns → {OUTPUT_DIR}")
+
+    turns, names = focus_table(graph.turns(), graph)
+    print("\nTurns, all movies (row speaks, column answers):")
+    print(" " * 12 + "".join(f"{n:>12}" for n in names))
+    for name, row in zip(names, turns):
+        print(f"{name:<12}" + "".join(f"{v:>12d}" for v in row))
+
+    shared, names = focus_table(graph.cooccurrence(), graph)
+    print("\nScenes shared, all movies:")
+    print(" " * 12 + "".join(f"{n:>12}" for n in names))
+    for name, row in zip(names, shared):
+        print(f"{name:<12}" + "".join(f"{v:>12d}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Lines and words per character, per movie, per series and overall, for every
+movie of the corpus manifest.
+
+Each movie is a shard: shard_stats() reads its all-characters TSV and writes
+a small JSON of counts to SHARDS_DIR/<series>/<movie>.json. merge_stats()
+adds the shards up, so a new movie or franchise costs one more shard (run
+in parallel with the others by pipeline.py, or here with a process pool)
+and one more file to merge, nothing is recounted.
+
+    python src/Analysis/corpus_stats.py
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import csv
+import json
+import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import clean_cue, get_resolver
+from Dataset_prep.corpus import read_speeches
+from Dataset_prep.parse_dialogue import MOVIES
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+SPEECHES = Path("data/processed/processed_speeches")
+SHARDS_DIR = SPEECHES / "shards"
+CHARACTERS_OUT = SPEECHES / "corpus_character_stats.csv"
+MOVIES_OUT = SPEECHES / "corpus_movie_stats.csv"
+
+ALL = "ALL"
+
+
+def shard_path(movie):
+    return SHARDS_DIR / MOVIES[movie].series / f"{movie}.json"
+
+
+def shard_stats(movie):
+    """Count one movie's parsed lines and write its shard. Returns the shard."""
+    resolver = get_resolver()
+    words = get_tokenizer("words")
+    lines, tokens, scenes = Counter(), Counter(), set()
+
+    for row in read_speeches(movie):
+        raw = (row.get("character") or "").strip()
+        name = resolver.canonical_name(row["character_id"]) or clean_cue(raw)
+        if not name:
+            continue
+        lines[name] += 1
+        tokens[name] += len(words.ids(row.get("text") or ""))
+        if row["scene_id"]:
+            scenes.add(row["scene_id"])
+    save_cache()
+
+    shard = {
+        "series": MOVIES[movie].series,
+        "movie": movie,
+        "scenes": len(scenes),
+        "characters": {name: [lines[name], tokens[name]] for name in lines},
+    }
+    path = shard_path(movie)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(shard, f, ensure_ascii=False)
+    return shard
+
+
+def read_shards(movies=MOVIES):
+    for movie in movies:
+        with shard_path(movie).open("r", encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def merge_stats(shards=None):
+    """Add the shards up into CHARACTERS_OUT and MOVIES_OUT."""
+    shards = read_shards() if shards is None else shards
+
+    # (series, movie) -> Counter of (character, "lines" / "words"); movie ALL = the series, series ALL = everything
+    per_scope = {}
+    movie_rows = []
+    for shard in shards:
+        series, movie = shard["series"], shard["movie"]
+        counts = Counter()
+        for name, (n_lines, n_words) in shard["characters"].items():
+            counts[name, "lines"] += n_lines
+            counts[name, "words"] += n_words
+        for scope in [(series, movie), (series, ALL), (ALL, ALL)]:
+            per_scope.setdefault(scope, Counter()).update(counts)
+        movie_rows.append({
+            "series": series,
+            "movie": movie,
+            "speeches": sum(n for n, _ in shard["characters"].values()),
+            "words": sum(w for _, w in shard["characters"].values()),
+            "scenes": shard["scenes"],
+            "characters": len(shard["characters"]),
+        })
+
+    CHARACTERS_OUT.parent.mkdir(parents=True, exist_ok=True)
+    with CHARACTERS_OUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(["series", "movie", "character", "lines", "words", "pct_lines"])
+        for (series, movie), counts in per_scope.items():
+            names = sorted({name for name, _ in counts}, key=lambda n: (-counts[n, "lines"], n))
+            total = sum(counts[n, "lines"] for n in names)
+            for name in names:
+                writer.writerow([series, movie, name, counts[name, "lines"], counts[name, "words"],
+                                 f"{100 * counts[name, 'lines'] / total:.2f}"])
+
+    with MOVIES_OUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.DictWriter(f_out, fieldnames=["series", "movie", "speeches", "words", "scenes", "characters"])
+        writer.writeheader()
+        writer.writerows(movie_rows)
+
+    print(f"Merged {len(movie_rows)} shards → {CHARACTERS_OUT}, {MOVIES_OUT}")
+    for series in dict.fromkeys(r["series"] for r in movie_rows):
+        rows = [r for r in movie_rows if r["series"] == series]
+        counts = per_scope[series, ALL]
+        top = sorted({n for n, _ in counts}, key=lambda n: (-counts[n, "lines"], n))[:5]
+        print(f"  {series}: {len(rows)} movies, {sum(r['speeches'] for r in rows)} speeches, "
+              f"{sum(r['words'] for r in rows)} words; most lines: {', '.join(top)}")
+
+
+def main():
+    # one worker per shard, then merge
+    with ProcessPoolExecutor(max_workers=min(len(MOVIES), os.cpu_count() or 1)) as pool:
+        shards = list(pool.map(shard_stats, MOVIES))
+    merge_stats(shards)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+1-4 gram counts and collocations over the whole parsed corpus, overall,
+per movie and per character.
+
+Counting streams the all-character TSVs line by line (n-grams never cross
+a line). Lines come as token ids of the shared tokenizer (the "ngram"
+preset of Dataset_prep/tokenization.py) and every n-gram is counted
+once per scope it belongs to ("all", "movie:<movie>",
+"character:<character>"). When the in-memory counter reaches SPILL_AT
+entries it is written to disk as a sorted run; at the end the runs are
+merged with heapq.merge and only n-grams seen at least MIN_COUNT times are
+kept, so memory is bounded by SPILL_AT plus the (much smaller) set of
+frequent n-grams, however big the corpus is.
+
+Scores for an n-gram (n >= 2) within its scope:
+- PMI: log2 of its probability over the product of its words' probabilities
+- G2 (log-likelihood ratio) of the 2x2 table "first n-1 words" x "last
+  word"; for bigrams this is Dunning's G2
+
+    python src/Analysis/ngram_stats.py
+"""
+from collections import Counter
+from pathlib import Path
+import csv
+import heapq
+import math
+import sys
+import tempfile
+import time
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.corpus import iter_corpus
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+OUTPUT = Path("data/processed/processed_speeches/ngram_collocations.csv")
+
+MAX_N = 4
+MIN_COUNT = 3          # n-grams rarer than this are dropped at merge time
+SPILL_AT = 500_000     # in-memory (scope, n-gram) entries before a sorted run is written
+TOP_PER_SCOPE = 20     # rows per (scope, n) in the output
+
+
+class NgramCounter:
+    """Spill-to-disk counter of (scope, n-gram) pairs; n-grams are tuples of word ids."""
+
+    def __init__(self, words, max_n=MAX_N, spill_at=SPILL_AT, tmp_dir=None):
+        self.words = words  # id -> word (the shared vocabulary)
+        self.max_n = max_n
+        self.spill_at = spill_at
+        self.scopes = {}
+        self.counts = Counter()
+        # exact, small: words per scope and n-gram positions per (scope, n)
+        self.unigrams = Counter()
+        self.positions = Counter()
+        self._tmp = tempfile.TemporaryDirectory(dir=tmp_dir, prefix="ngrams_")
+        self.runs = []
+
+    def scope_id(self, scope):
+        return self.scopes.setdefault(scope, len(self.scopes))
+
+    def add(self, ids, scopes):
+        ids = tuple(ids)
+        scope_ids = [self.scope_id(s) for s in scopes]
+        for s in scope_ids:
+            for w in ids:
+                self.unigrams[s, w] += 1
+        for n in range(2, self.max_n + 1):
+            grams = [ids[i:i + n] for i in range(len(ids) - n + 1)]
+            if not grams:
+                break
+            for s in scope_ids:
+                self.positions[s, n] += len(grams)
+                for g in grams:
+                    self.counts[s, g] += 1
+        if len(self.counts) >= self.spill_at:
+            self.spill()
+
+    @staticmethod
+    def _key(scope_id, gram):
+        return f"{scope_id}\t{' '.join(map(str, gram))}"
+
+    def spill(self):
+        if not self.counts:
+            return
+        path = Path(self._tmp.name) / f"run_{len(self.runs):04d}.tsv"
+        lines = sorted(f"{self._key(s, g)}\t{c}\n" for (s, g), c in self.counts.items())
+        with path.open("w", encoding="utf-8") as f:
+            f.writelines(lines)
+        self.runs.append(path)
+        self.counts = Counter()
+
+    def frequent(self, min_count=MIN_COUNT):
+        """{(scope_id, gram): count} for n-grams (n >= 2) seen at least min_count times."""
+        self.spill()
+        files = [p.open("r", encoding="utf-8") for p in self.runs]
+        try:
+            # runs are sorted by "scope \t ids", so equal keys come out next to each other
+            merged = heapq.merge(*files, key=lambda line: line.rsplit("\t", 1)[0])
+            result = {}
+            current, total = None, 0
+            for line in merged:
+                key, count = line.rsplit("\t", 1)
+                if key != current:
+                    if current is not None and total >= min_count:
+                        result[self._parse(current)] = total
+                    current, total = key, 0
+                total += int(count)
+            if current is not None and total >= min_count:
+                result[self._parse(current)] = total
+            return result
+        finally:
+            for f in files:
+                f.close()
+
+    @staticmethod
+    def _parse(key):
+        scope, ids = key.split("\t")
+        return int(scope), tuple(int(i) for i in ids.split())
+
+    def close(self):
+        self._tmp.cleanup()
+
+
+def g2(o11, r1, c1, n):
+    """Log-likelihood ratio of a 2x2 table given cell (1,1), its row and column totals and n."""
+    cells = [(o11, r1 * c1), (r1 - o11, r1 * (n - c1)), (c1 - o11, (n - r1) * c1),
+             (n - r1 - c1 + o11, (n - r1) * (n - c1))]
+    total = 0.0
+    for observed, expected_num in cells:
+        if observed > 0 and expected_num > 0:
+            total += observed * math.log(observed * n / expected_num)
+    return 2 * total
+
+
+def score(counter, frequent):
+    """Rows scope, n, ngram, count, pmi, g2 for every frequent n-gram (n >= 2)."""
+    scope_names = {i: s for s, i in counter.scopes.items()}
+    scope_tokens = Counter()
+    for (s, _), c in counter.unigrams.items():
+        scope_tokens[s] += c
+
+    rows = []
+    for (s, gram), count in frequent.items():
+        n = len(gram)
+        total = counter.positions[s, n]
+        n_tokens = scope_tokens[s]
+        prefix = gram[:-1]
+        prefix_count = counter.unigrams[s, prefix[0]] if len(prefix) == 1 else frequent.get((s, prefix), count)
+        last_count = counter.unigrams[s, gram[-1]]
+
+        pmi = math.log2(count / total) - sum(math.log2(counter.unigrams[s, w] / n_tokens) for w in gram)
+        rows.append({
+            "scope": scope_names[s],
+            "n": n,
+            "ngram": " ".join(counter.words[w] for w in gram),
+            "count": count,
+            "pmi": round(pmi, 3),
+            "g2": round(g2(count, prefix_count, last_count, total), 3),
+        })
+    return rows
+
+
+def top_rows(rows, counter, top=TOP_PER_SCOPE):
+    """Top G2 collocations per (scope, n), skipping all-stopword n-grams, plus top content words."""
+    grouped = {}
+    for row in rows:
+        if all(w in ENGLISH_STOP_WORDS for w in row["ngram"].split()):
+            continue
+        grouped.setdefault((row["scope"], row["n"]), []).append(row)
+
+    out = []
+    scope_names = {i: s for s, i in counter.scopes.items()}
+    words_by_scope = {}
+    for (s, w), c in counter.unigrams.items():
+        if c >= MIN_COUNT and counter.words[w] not in ENGLISH_STOP_WORDS:
+            words_by_scope.setdefault(s, []).append((c, counter.words[w]))
+    for s, words in words_by_scope.items():
+        for c, word in heapq.nlargest(top, words):
+            out.append({"scope": scope_names[s], "n": 1, "ngram": word, "count": c, "pmi": "", "g2": ""})
+
+    for key in grouped:
+        out.extend(heapq.nlargest(top, grouped[key], key=lambda r: (r["g2"], r["count"])))
+    order = {name: i for i, name in enumerate(counter.scopes)}
+    out.sort(key=lambda r: (order[r["scope"]], r["n"]))
+    return out
+
+
+def count_corpus(rows, **counter_kwargs):
+    tokenizer = get_tokenizer("ngram")
+    counter = NgramCounter(tokenizer.vocab.tokens, **counter_kwargs)
+    n_lines = 0
+    for movie, character, _, text in rows:
+        ids = tokenizer.ids(text)
+        if ids:
+            counter.add(ids, ("all", f"movie:{movie}", f"character:{character}"))
+            n_lines += 1
+    save_cache()
+    return counter, n_lines
+
+
+def main():
+    start = time.perf_counter()
+    counter, n_lines = count_corpus(iter_corpus())
+    try:
+        frequent = counter.frequent()
+        rows = top_rows(score(counter, frequent), counter)
+    finally:
+        counter.close()
+
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.DictWriter(f_out, fieldnames=["scope", "n", "ngram", "count", "pmi", "g2"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Counted 1-{MAX_N} grams of {n_lines} lines in {len(counter.scopes)} scopes "
+          f"({len(counter.runs)} sorted runs, {len(frequent)} n-grams seen >= {MIN_COUNT} times) "
+          f"in {time.perf_counter() - start:.1f}s → {OUTPUT}")
+
+    for n in range(2, MAX_N + 1):
+        best = [r for r in rows if r["scope"] == "all" and r["n"] == n][:8]
+        print(f"\nTop {n}-grams overall (G2):")
+        for r in best:
+            print(f"  {r['ngram']:<32} {r['count']:5d}  pmi {r['pmi']:6.2f}  g2 {r['g2']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
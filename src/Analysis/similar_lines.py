@@ -0,0 +1,210 @@
+"""
+"Which lines are most like this one?" over every parsed speech.
+
+Lines are TF-IDF vectors (the features of analyze_topics.py, fitted on the
+whole corpus). The index is random-projection LSH for cosine similarity:
+N_TABLES tables, each hashing a line to the signs of n_bits random
+projections. A query looks up its own bucket in every table plus the
+buckets one bit away on its least certain bits (multi-probe), and only
+those candidates are scored exactly. Buckets are stored as sorted code
+arrays, so a lookup is a binary search.
+
+n_bits grows with the corpus (log2 of lines / BUCKET_SIZE), which keeps
+the candidate set - and the query time - roughly constant: a few
+milliseconds at 5k lines and at a few hundred thousand.
+
+    python src/Analysis/similar_lines.py "Happiness can be found even in the darkest of times"
+    python src/Analysis/similar_lines.py --line prisoner_azkaban 134 -k 5
+    python src/Analysis/similar_lines.py --benchmark
+"""
+from pathlib import Path
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Analysis.analyze_topics import build_vectorizer
+from Dataset_prep.corpus import iter_corpus
+from Dataset_prep.tokenization import save_cache
+
+N_TABLES = 16
+BUCKET_SIZE = 128  # aimed-for lines per bucket; sets n_bits
+PROBES = 2         # extra buckets per table, one bit flipped each
+TOP_K = 10
+SEED = 42
+BUILD_CHUNK = 50_000
+
+
+def bits_for(n_lines, bucket_size=BUCKET_SIZE):
+    return int(min(24, max(4, round(math.log2(max(n_lines, 1) / bucket_size)))))
+
+
+class LSHIndex:
+    """Random-hyperplane LSH over the rows of an L2-normalised sparse matrix."""
+
+    def __init__(self, vectors, n_tables=N_TABLES, n_bits=None, seed=SEED):
+        self.vectors = sparse.csr_matrix(vectors, dtype=np.float32)
+        n, dim = self.vectors.shape
+        self.n_tables = n_tables
+        self.n_bits = n_bits or bits_for(n)
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((dim, n_tables * self.n_bits)).astype(np.float32)
+        self.weights = (1 << np.arange(self.n_bits)).astype(np.int64)
+
+        # codes (tables, lines), built in chunks so the projection stays small
+        codes = np.empty((n_tables, n), dtype=np.int64)
+        for start in range(0, n, BUILD_CHUNK):
+            block = self.vectors[start:start + BUILD_CHUNK]
+            codes[:, start:start + block.shape[0]] = self._codes(self._project(block)).T
+        self.order = np.argsort(codes, axis=1, kind="stable")
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=1)
+
+    def _project(self, vectors):
+        # -> (rows, tables, bits)
+        proj = np.asarray(vectors @ self.planes)
+        return proj.reshape(-1, self.n_tables, self.n_bits)
+
+    def _codes(self, proj):
+        return (proj > 0).astype(np.int64) @ self.weights
+
+    def candidates(self, query, probes=PROBES):
+        """Row ids sharing a bucket with `query` (1 x dim) in any table."""
+        proj = self._project(query)[0]                      # (tables, bits)
+        codes = self._codes(proj)
+        # flip the bits closest to their hyperplane first
+        flips = np.argsort(np.abs(proj), axis=1)[:, :probes]
+        probe_codes = np.concatenate([codes[:, None], codes[:, None] ^ self.weights[flips]], axis=1)
+
+        found = []
+        for t in range(self.n_tables):
+            row = self.sorted_codes[t]
+            lo = np.searchsorted(row, probe_codes[t], side="left")
+            hi = np.searchsorted(row, probe_codes[t], side="right")
+            found.extend(self.order[t, a:b] for a, b in zip(lo, hi) if b > a)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, query, k=TOP_K, probes=PROBES, exclude=None):
+        """-> (row ids, cosine similarities), best first."""
+        ids = self.candidates(query, probes)
+        if exclude is not None:
+            ids = ids[ids != exclude]
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        scores = np.asarray((self.vectors[ids] @ query.T).todense()).ravel()
+        top = top_k(scores, k)
+        return ids[top], scores[top]
+
+
+def top_k(scores, k):
+    # indices of the k largest scores, best first
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class SimilarLines:
+    """Corpus + vectorizer + index; query by free text or by an existing line."""
+
+    def __init__(self, rows=None, **index_kwargs):
+        self.rows = list(rows if rows is not None else iter_corpus())
+        self.vectorizer = build_vectorizer()
+        vectors = self.vectorizer.fit_transform([r[3] for r in self.rows])
+        self.index = LSHIndex(vectors, **index_kwargs)
+        self.position = {(r[0], r[2]): i for i, r in enumerate(self.rows)}
+
+    def vector(self, text):
+        return sparse.csr_matrix(self.vectorizer.transform([text]), dtype=np.float32)
+
+    def similar_to_text(self, text, k=TOP_K):
+        ids, scores = self.index.query(self.vector(text), k)
+        return [(float(s), self.rows[i]) for i, s in zip(ids, scores)]
+
+    def similar_to_line(self, movie, speech_id, k=TOP_K):
+        i = self.position[(movie, str(speech_id))]
+        ids, scores = self.index.query(self.index.vectors[i], k, exclude=i)
+        return self.rows[i], [(float(s), self.rows[j]) for j, s in zip(ids, scores)]
+
+
+def benchmark(finder, n_queries=200, k=TOP_K, seed=SEED):
+    """Recall@k and time per query of the index against brute-force cosine."""
+    vectors = finder.index.vectors
+    nonempty = np.flatnonzero(np.diff(vectors.indptr) > 0)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(nonempty, size=min(n_queries, len(nonempty)), replace=False)
+
+    start = time.perf_counter()
+    results = [finder.index.query(vectors[q], k, exclude=q) for q in queries]
+    ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    # brute force one query at a time, like a user would call it
+    start = time.perf_counter()
+    for q in queries:
+        top_k(np.asarray((vectors @ vectors[q].T).todense()).ravel(), k + 1)
+    brute_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    exact = np.asarray((vectors @ vectors[queries].T).todense()).T   # (queries, lines)
+    exact[np.arange(len(queries)), queries] = -np.inf
+    kth = [np.sort(row)[-k] for row in exact]
+
+    # ties at the k-th score count as hits
+    recall = np.mean([
+        min(k, int((scores >= threshold - 1e-6).sum())) / k
+        for (_, scores), threshold in zip(results, kth)
+    ])
+    n_candidates = np.mean([len(finder.index.candidates(vectors[q])) for q in queries])
+    return {
+        "lines": vectors.shape[0],
+        "n_bits": finder.index.n_bits,
+        f"recall@{k}": recall,
+        "candidates": n_candidates,
+        "ann_ms": ann_ms,
+        "brute_ms": brute_ms,
+    }
+
+
+def print_hits(hits):
+    for score, (movie, character, speech_id, text) in hits:
+        print(f"  {score:.3f}  {movie:<24} {character:<12} #{speech_id:<5} {text[:80]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lines most similar to a text or to a parsed line.")
+    parser.add_argument("text", nargs="?", help="free text to search for")
+    parser.add_argument("--line", nargs=2, metavar=("MOVIE", "SPEECH_ID"), help="use an existing line as the query")
+    parser.add_argument("-k", type=int, default=TOP_K)
+    parser.add_argument("--benchmark", action="store_true", help="recall and speed against brute force")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    finder = SimilarLines()
+    save_cache()
+    print(f"Indexed {len(finder.rows)} lines ({finder.index.n_tables} tables x {finder.index.n_bits} bits) "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    if args.benchmark:
+        for key, value in benchmark(finder, k=args.k).items():
+            print(f"  {key:<12} {value:.3f}" if isinstance(value, float) else f"  {key:<12} {value}")
+        return
+
+    start = time.perf_counter()
+    if args.line:
+        query, hits = finder.similar_to_line(*args.line, k=args.k)
+        print(f"\n{query[1]}: {query[3]}")
+    elif args.text:
+        hits = finder.similar_to_text(args.text, k=args.k)
+    else:
+        parser.error("give a text, --line MOVIE SPEECH_ID or --benchmark")
+    print(f"\nTop {len(hits)} ({(time.perf_counter() - start) * 1000:.1f} ms):")
+    print_hits(hits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Train a topic classifier on the annotated lines and label the rest of the corpus.
+
+Features are the TF-IDF features of analyze_topics.py, the model is a
+multinomial logistic regression over the seven labels (its class
+probabilities give a confidence per line). The corpus is every line of
+the all-character TSVs; it is streamed in batches, each batch is turned
+into a sparse matrix and scored in a worker process, and rows are written
+as batches come back (in order), so memory stays flat however big the
+corpus is.
+
+Lines that are in the annotation dataset keep their human label
+(label_source = "human", confidence 1.0). They are matched on movie,
+character and text (text_normalization.match_text), never on speech_id:
+the annotated speech ids come from an older parse.
+
+A speech can hold several sentences on different topics, so main_sentences()
+also scores every sentence on its own (TF-IDF features of the sentence,
+same model). The sentences come from the sentence_starts offsets that
+parse_dialogue.py stores next to the TSVs (see corpus.py), nothing is
+segmented again.
+
+    python src/Analysis/topic_classifier.py
+    python src/Analysis/topic_classifier.py --sentences
+"""
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from pathlib import Path
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.pipeline import make_pipeline
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Analysis.analyze_topics import build_vectorizer
+from Dataset_prep.annotation_store import read_annotation_frame
+from Dataset_prep.corpus import iter_corpus, iter_sentences
+from Dataset_prep.text_normalization import match_text
+
+DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
+OUTPUT = Path("data/processed/processed_speeches/topic_predictions_all_lines.csv")
+
+OUTPUT_FIELDS = ["movie", "character", "speech_id", "text", "annotation_label", "confidence", "label_source"]
+
+SENTENCES_OUTPUT = Path("data/processed/processed_speeches/topic_predictions_sentences.csv")
+SENTENCE_FIELDS = ["movie", "character", "speech_id", "sentence", "start", "end", "text", "annotation_label",
+                   "confidence"]
+
+BATCH_SIZE = 2000
+N_JOBS = None  # worker processes (None = all cores)
+
+
+def train(df):
+    """Fit vectorizer + classifier on the annotated lines; prints 5-fold CV accuracy."""
+    texts = df["text"].astype(str)
+    labels = df["annotation_label"].astype(str).str.strip()
+
+    model = make_pipeline(build_vectorizer(), LogisticRegression(C=3, max_iter=2000))
+    folds = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    scores = cross_val_score(model, texts, labels, cv=folds)
+    print(f"5-fold accuracy: {scores.mean():.3f} ± {scores.std():.3f} "
+          f"(majority class: {labels.value_counts(normalize=True).iloc[0]:.3f})")
+
+    model.fit(texts, labels)
+    return model
+
+
+def batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# the model is sent to every worker once, not with every batch
+_model = None
+
+
+def _init_worker(model):
+    global _model
+    _model = model
+
+
+def score_batch(texts):
+    # texts -> (labels, confidences); the vectorizer yields one sparse matrix per batch
+    pipeline = _model
+    features = pipeline[:-1].transform(texts)
+    proba = pipeline[-1].predict_proba(features)
+    best = proba.argmax(axis=1)
+    return pipeline[-1].classes_[best].tolist(), proba[np.arange(len(best)), best].tolist()
+
+
+def scored_batches(model, rows, n_jobs=N_JOBS):
+    """
+    Yield (batch, labels, confidences) in corpus order, a few batches in flight
+    at a time. The text to score is item 3 of each row.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(model,)) as pool:
+        pending = deque()
+        for batch in batches(rows):
+            pending.append((batch, pool.submit(score_batch, [r[3] for r in batch])))
+            if len(pending) >= 2 * n_jobs:
+                batch, future = pending.popleft()
+                yield (batch, *future.result())
+        while pending:
+            batch, future = pending.popleft()
+            yield (batch, *future.result())
+
+
+def main():
+    df = read_annotation_frame(DATA_PATH)  # includes pending label/text fixes
+    print(f"Training on {len(df)} annotated lines")
+    model = train(df)
+
+    human = {
+        (movie, character, match_text(text)): label.strip()
+        for movie, character, text, label in zip(
+            df["movie"], df["character"], df["text"], df["annotation_label"].astype(str)
+        )
+    }
+
+    start = time.perf_counter()
+    total = n_human = 0
+    counts = {}
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(OUTPUT_FIELDS)
+        for batch, labels, confidences in scored_batches(model, iter_corpus()):
+            for (movie, character, speech_id, text), label, confidence in zip(batch, labels, confidences):
+                known = human.get((movie, character, match_text(text)))
+                if known is not None:
+                    label, confidence, source = known, 1.0, "human"
+                    n_human += 1
+                else:
+                    source = "predicted"
+                writer.writerow([movie, character, speech_id, text, label, f"{confidence:.4f}", source])
+                counts[label] = counts.get(label, 0) + 1
+            total += len(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {total} lines ({n_human} with a human label) in {elapsed:.1f}s → {OUTPUT}")
+    for label, count in sorted(counts.items(), key=lambda x: -x[1]):
+        print(f"  {label:<15} {count}")
+
+
+def main_sentences():
+    df = read_annotation_frame(DATA_PATH)  # includes pending label/text fixes
+    print(f"Training on {len(df)} annotated lines")
+    model = train(df)
+
+    start = time.perf_counter()
+    total = 0
+    topics_by_speech = {}
+    SENTENCES_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with SENTENCES_OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(SENTENCE_FIELDS)
+        for batch, labels, confidences in scored_batches(model, iter_sentences()):
+            for (movie, character, speech_id, text, k, s, e), label, confidence in zip(batch, labels, confidences):
+                writer.writerow([movie, character, speech_id, k, s, e, text, label, f"{confidence:.4f}"])
+                topics_by_speech.setdefault((movie, speech_id), set()).add(label)
+            total += len(batch)
+
+    mixed = sum(1 for topics in topics_by_speech.values() if len(topics) > 1)
+    print(f"Scored {total} sentences of {len(topics_by_speech)} lines in {time.perf_counter() - start:.1f}s "
+          f"→ {SENTENCES_OUTPUT}")
+    print(f"{mixed} lines ({100 * mixed / max(len(topics_by_speech), 1):.1f}%) have sentences with different topics")
+
+
+if __name__ == "__main__":
+    if "--sentences" in sys.argv[1:]:
+        main_sentences()
+    else:
+        main()
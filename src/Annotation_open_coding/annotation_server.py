@@ -0,0 +1,357 @@
+"""
+Local annotation server: annotators label lines in the browser instead of
+editing the CSV from build_annotation_dataset.py in a spreadsheet.
+
+The lines and the labels live in SQLite (WAL mode). Each label is one
+row per (annotation_id, annotator), saved with a single upsert, so
+several annotators can work at the same time without overwriting each
+other's file. The final CSV is exported on demand.
+
+The server is plain asyncio (no web framework). All database work runs on
+one worker thread with its own connection, so the event loop never blocks
+on SQLite and writes are serialized.
+
+    python src/Annotation_open_coding/annotation_server.py --import data/processed/processed_speeches/annotation_dataset_RHD.csv
+    python src/Annotation_open_coding/annotation_server.py            # http://127.0.0.1:8765
+    python src/Annotation_open_coding/annotation_server.py --export out.csv [--annotator NAME]
+
+API (JSON):
+    GET  /lines?after=<annotation_id>&limit=50[&annotator=NAME&unlabelled=1&character=RON&movie=...]
+    POST /labels   {"annotation_id": 12, "annotator": "NAME", "label": "Magic"}
+    GET  /stats
+    GET  /export[?annotator=NAME]   (CSV)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sqlite3
+import time
+
+DB_PATH = Path("data/processed/processed_speeches/annotations.sqlite3")
+HOST = "127.0.0.1"
+PORT = 8765
+
+LABELS = ["Danger", "Duty", "Informative", "Magic", "Mockery", "Relationship", "Storyline"]
+FIELDNAMES = ["annotation_id", "movie", "character", "speech_id", "text", "annotation_label"]
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BODY = 64 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    annotation_id INTEGER PRIMARY KEY,
+    movie TEXT, character TEXT, speech_id TEXT, text TEXT
+);
+CREATE TABLE IF NOT EXISTS labels (
+    annotation_id INTEGER NOT NULL REFERENCES lines(annotation_id),
+    annotator TEXT NOT NULL,
+    label TEXT NOT NULL,
+    updated_ns INTEGER NOT NULL,
+    PRIMARY KEY (annotation_id, annotator)
+);
+CREATE INDEX IF NOT EXISTS lines_character ON lines(character, annotation_id);
+"""
+
+
+class AnnotationDB:
+    """SQLite access; every method runs on the single database thread."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.conn = None
+        self.executor.submit(self._open).result()
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def run(self, method, *args):
+        """Call a method on the database thread (blocking); see call() for asyncio."""
+        return self.executor.submit(method, *args).result()
+
+    async def call(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, method, *args)
+
+    def close(self):
+        self.executor.submit(self.conn.close).result()
+        self.executor.shutdown()
+
+    # ---------- queries (database thread) ----------
+
+    def import_csv(self, path, annotator="import"):
+        # lines are added once; labels already in the file are kept under `annotator`
+        now = time.time_ns()
+        n_lines = n_labels = 0
+        with Path(path).open("r", encoding="utf-8", newline="") as f, self.conn:
+            for row in csv.DictReader(f):
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO lines VALUES (?, ?, ?, ?, ?)",
+                    (int(row["annotation_id"]), row["movie"], row["character"], row["speech_id"], row["text"]),
+                )
+                n_lines += cur.rowcount
+                label = (row.get("annotation_label") or "").strip()
+                if label:
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO labels VALUES (?, ?, ?, ?)",
+                        (int(row["annotation_id"]), annotator, label, now),
+                    )
+                    n_labels += 1
+        return n_lines, n_labels
+
+    def page(self, after=0, limit=PAGE_SIZE, annotator=None, unlabelled=False, character=None, movie=None):
+        # keyset paging on annotation_id: every page is an index range scan
+        sql = ["SELECT l.*, lab.label FROM lines l",
+               "LEFT JOIN labels lab ON lab.annotation_id = l.annotation_id AND lab.annotator = ?",
+               "WHERE l.annotation_id > ?"]
+        params = [annotator or "", after]
+        if unlabelled:
+            sql.append("AND lab.label IS NULL")
+        if character:
+            sql.append("AND l.character = ?")
+            params.append(character)
+        if movie:
+            sql.append("AND l.movie = ?")
+            params.append(movie)
+        sql.append("ORDER BY l.annotation_id LIMIT ?")
+        params.append(limit)
+        rows = [dict(r) for r in self.conn.execute(" ".join(sql), params)]
+        return {"lines": rows, "next_after": rows[-1]["annotation_id"] if len(rows) == limit else None}
+
+    def set_label(self, annotation_id, annotator, label):
+        # one-row upsert; 0 if there is no such line
+        if self.conn.execute("SELECT 1 FROM lines WHERE annotation_id = ?", (annotation_id,)).fetchone() is None:
+            return 0
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO labels VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (annotation_id, annotator) DO UPDATE SET label = excluded.label, "
+                "updated_ns = excluded.updated_ns",
+                (annotation_id, annotator, label, time.time_ns()),
+            )
+        return 1
+
+    def stats(self):
+        total = self.conn.execute("SELECT COUNT(*) FROM lines").fetchone()[0]
+        per_annotator = {
+            r["annotator"]: r["n"]
+            for r in self.conn.execute("SELECT annotator, COUNT(*) AS n FROM labels GROUP BY annotator")
+        }
+        labelled = self.conn.execute("SELECT COUNT(DISTINCT annotation_id) FROM labels").fetchone()[0]
+        return {"lines": total, "labelled": labelled, "per_annotator": per_annotator}
+
+    def export_rows(self, annotator=None):
+        """Master-format rows; without an annotator every line gets its most recent label."""
+        if annotator:
+            query = ("SELECT l.*, lab.label AS annotation_label FROM lines l LEFT JOIN labels lab "
+                     "ON lab.annotation_id = l.annotation_id AND lab.annotator = ? ORDER BY l.annotation_id")
+            params = (annotator,)
+        else:
+            query = ("SELECT l.*, latest.label AS annotation_label FROM lines l LEFT JOIN ("
+                     "  SELECT annotation_id, label, ROW_NUMBER() OVER ("
+                     "    PARTITION BY annotation_id ORDER BY updated_ns DESC) AS rn FROM labels"
+                     ") latest ON latest.annotation_id = l.annotation_id AND latest.rn = 1 "
+                     "ORDER BY l.annotation_id")
+            params = ()
+        return [{k: (r[k] if r[k] is not None else "") for k in FIELDNAMES} for r in self.conn.execute(query, params)]
+
+    def export_csv(self, annotator=None):
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=FIELDNAMES, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(self.export_rows(annotator))
+        return buf.getvalue()
+
+
+# ---------- HTTP ----------
+
+PAGE = """<!doctype html>
+<meta charset="utf-8"><title>Annotation</title>
+<style>body{font-family:sans-serif;max-width:50em;margin:2em auto} button{margin:.2em}</style>
+<p>Annotator: <input id="who"> <span id="stats"></span></p>
+<p id="meta"></p><blockquote id="text">Enter your name to start.</blockquote>
+<p id="buttons"></p>
+<script>
+const LABELS = %s;
+let current = null;
+const who = document.getElementById("who");
+who.value = localStorage.getItem("annotator") || "";
+async function next() {
+  localStorage.setItem("annotator", who.value);
+  if (!who.value) return;
+  const page = await (await fetch(`/lines?limit=1&unlabelled=1&annotator=${encodeURIComponent(who.value)}`)).json();
+  current = page.lines[0] || null;
+  document.getElementById("meta").textContent = current ? `#${current.annotation_id} ${current.movie} - ${current.character}` : "";
+  document.getElementById("text").textContent = current ? current.text : "Nothing left to label.";
+  const s = await (await fetch("/stats")).json();
+  document.getElementById("stats").textContent = `${s.per_annotator[who.value] || 0} / ${s.lines} labelled`;
+}
+async function label(l) {
+  if (!current) return;
+  await fetch("/labels", {method: "POST", body: JSON.stringify(
+    {annotation_id: current.annotation_id, annotator: who.value, label: l})});
+  next();
+}
+document.getElementById("buttons").innerHTML = LABELS.map(l => `<button onclick="label('${l}')">${l}</button>`).join("");
+who.onchange = next;
+next();
+</script>
+""" % json.dumps(LABELS)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def respond(writer, status, body, content_type="application/json"):
+    if not isinstance(body, (bytes, str)):
+        body = json.dumps(body)
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n")
+    writer.write(head.encode("ascii") + body)
+
+
+async def read_request(reader):
+    request_line = (await reader.readline()).decode("latin1").strip()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin1")
+        if line in ("\r\n", "\n", ""):
+            break
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise HTTPError(413, "body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, body
+
+
+def int_param(query, name, default):
+    try:
+        return int(query.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+async def route(db, method, target, body):
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    param = lambda name: (query.get(name) or [None])[0]
+
+    if url.path == "/" and method == "GET":
+        return 200, PAGE, "text/html"
+
+    if url.path == "/lines" and method == "GET":
+        limit = min(max(int_param(query, "limit", PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        page = await db.call(
+            db.page, int_param(query, "after", 0), limit, param("annotator"),
+            param("unlabelled") in ("1", "true"), param("character"), param("movie"),
+        )
+        return 200, page, "application/json"
+
+    if url.path == "/labels" and method == "POST":
+        try:
+            data = json.loads(body or b"{}")
+            annotation_id = int(data["annotation_id"])
+            annotator = str(data["annotator"]).strip()
+            label = str(data["label"]).strip()
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, "expected JSON with annotation_id, annotator, label")
+        if not annotator:
+            raise HTTPError(400, "annotator is empty")
+        if label not in LABELS:
+            raise HTTPError(400, f"label must be one of {LABELS}")
+        if not await db.call(db.set_label, annotation_id, annotator, label):
+            raise HTTPError(404, f"no line {annotation_id}")
+        return 200, {"ok": True}, "application/json"
+
+    if url.path == "/stats" and method == "GET":
+        return 200, await db.call(db.stats), "application/json"
+
+    if url.path == "/export" and method == "GET":
+        return 200, await db.call(db.export_csv, param("annotator")), "text/csv"
+
+    if url.path in ("/", "/lines", "/labels", "/stats", "/export"):
+        raise HTTPError(405, f"{method} not allowed on {url.path}")
+    raise HTTPError(404, f"no route {url.path}")
+
+
+async def handle(db, reader, writer):
+    try:
+        request = await read_request(reader)
+        if request is not None:
+            status, body, content_type = await route(db, *request)
+            respond(writer, status, body, content_type)
+    except HTTPError as e:
+        respond(writer, e.status, {"error": str(e)})
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(db, host=HOST, port=PORT):
+    server = await asyncio.start_server(lambda r, w: handle(db, r, w), host, port)
+    print(f"Annotation server on http://{host}:{port}  (database {db.path}, Ctrl+C to stop)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local annotation server backed by SQLite.")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--import", dest="import_csv", type=Path, help="add the lines (and labels) of an annotation CSV")
+    parser.add_argument("--export", type=Path, help="write the labelled CSV and exit")
+    parser.add_argument("--annotator", help="with --export: only this annotator's labels")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    db = AnnotationDB(args.db)
+    try:
+        if args.import_csv:
+            n_lines, n_labels = db.run(db.import_csv, args.import_csv)
+            print(f"Imported {n_lines} new lines and {n_labels} labels from {args.import_csv}")
+        if args.export:
+            args.export.parent.mkdir(parents=True, exist_ok=True)
+            args.export.write_text(db.run(db.export_csv, args.annotator), encoding="utf-8")
+            print(f"Exported {db.run(db.stats)['lines']} lines → {args.export}")
+        if not (args.import_csv or args.export):
+            asyncio.run(serve(db, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
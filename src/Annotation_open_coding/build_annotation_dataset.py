@@ -3,19 +3,18 @@ import csv
 import random
 import math
 from collections import defaultdict, Counter
+import sys
 
-INPUT = Path(
-    "data/processed/processed_speeches/cleaned_non_trivial_RHD/final_chars_speeches_non_trivial_RHD_normalized.csv"
-)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS, read_partitions
+
+# reads the per-character partitions written by Dataset_prep/character_partitions.py
 OUTPUT = Path(
     "data/processed/processed_speeches/annotation_dataset_RHD.csv"
 )
 
-TARGET_RON = 300
-TARGET_HERMIONE = 300
-CHAR_RON = "RON"
-CHAR_HERMIONE = "HERMIONE"
-CHAR_DUMBLEDORE = "DUMBLEDORE"
+TARGET_PER_CHARACTER = 300  # stratified sample size for each sampled character
+TAKE_ALL = {"DUMBLEDORE"}   # characters whose lines are all annotated
 
 random.seed(42)  # reproducible
 
@@ -46,7 +45,7 @@ def largest_remainder_quota(total_size, counts_dict):
 
 def stratified_sample_by_movie(char_rows, target_n):
     """
-    char_rows: list of rows (all for a single character).
+    char_rows: list of rows (all for a single character), SpeechRow views or dicts.
     target_n: desired sample size (e.g. 300).
     Stratify by movie proportionally, then sample randomly within each movie.
     """
@@ -76,11 +75,13 @@ def stratified_sample_by_movie(char_rows, target_n):
             # we want more than or equal to available rows: take all, nothing leftover
             sampled.extend(rows_m)
         else:
-            # sample q, leftover goes to pool
-            chosen = random.sample(rows_m, q)
-            sampled.extend(chosen)
+            # sample q, leftover goes to pool; positions, not rows, so dicts
+            # (unhashable) work too and the draw is the same as sampling the rows
+            picked = random.sample(range(len(rows_m)), q)
+            sampled.extend(rows_m[j] for j in picked)
 
-            remaining = [r for r in rows_m if r not in chosen]
+            picked_set = set(picked)
+            remaining = [r for j, r in enumerate(rows_m) if j not in picked_set]
             leftover_pool.extend(remaining)
 
     # if we undershot the target (because some movies had fewer rows than their quota),
@@ -97,56 +98,46 @@ def stratified_sample_by_movie(char_rows, target_n):
     return sampled
 
 def main():
-    rows = []
-
-    with INPUT.open("r", encoding="utf-8", errors="ignore") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append({
-                "movie": (row.get("movie") or "").strip(),
-                "character": (row.get("character") or "").strip(),
-                "speech_id": (row.get("speech_id") or "").strip(),
-                "text": (row.get("text") or "").strip(),
-            })
-
-    # split by character
-    dumbledore_rows = [r for r in rows if r["character"] == CHAR_DUMBLEDORE]
-    ron_rows = [r for r in rows if r["character"] == CHAR_RON]
-    hermione_rows = [r for r in rows if r["character"] == CHAR_HERMIONE]
-
-    print(f"Dumbledore total lines: {len(dumbledore_rows)}")
-    print(f"Ron total lines: {len(ron_rows)}")
-    print(f"Hermione total lines: {len(hermione_rows)}")
-
-    # stratified sampling for Ron and Hermione
-    ron_sample = stratified_sample_by_movie(ron_rows, TARGET_RON)
-    hermione_sample = stratified_sample_by_movie(hermione_rows, TARGET_HERMIONE)
-
-    print(f"Ron sampled: {len(ron_sample)}")
-    print(f"Hermione sampled: {len(hermione_sample)}")
-
-    # build final annotation set: all Dumbledore + sampled Ron + sampled Hermione
-    final_rows = []
-
-    # keep grouped by character (Dumbledore, then Ron, then Hermione)
-    for r in dumbledore_rows:
-        final_rows.append(r)
-    for r in ron_sample:
-        final_rows.append(r)
-    for r in hermione_sample:
-        final_rows.append(r)
+    # only the target characters' partition files are read
+    rows = read_partitions(TARGET_CHARACTERS)
+
+    # split by character (one pass over the character codes)
+    by_char = rows.group_indices("character")
+    rows_per_char = {c: [rows[i] for i in by_char.get(c, [])] for c in TARGET_CHARACTERS}
+
+    for char, char_rows in rows_per_char.items():
+        print(f"{char.title()} total lines: {len(char_rows)}")
+
+    # stratified sampling for everyone not in TAKE_ALL (in TARGET_CHARACTERS order, so the seed
+    # gives the same sample as before)
+    samples = {}
+    for char in TARGET_CHARACTERS:
+        if char in TAKE_ALL:
+            samples[char] = rows_per_char[char]
+        else:
+            samples[char] = stratified_sample_by_movie(rows_per_char[char], TARGET_PER_CHARACTER)
+            print(f"{char.title()} sampled: {len(samples[char])}")
 
-    # assign annotation_id
-    for idx, r in enumerate(final_rows, start=1):
-        r["annotation_id"] = idx
-        r["annotation_label"] = ""  # empty column for you to fill in manually
+    # build final annotation set, grouped by character: TAKE_ALL characters first
+    # (Dumbledore), then the sampled ones (Ron, then Hermione)
+    final_rows = []
+    ordered = [c for c in TARGET_CHARACTERS if c in TAKE_ALL] + \
+              [c for c in TARGET_CHARACTERS if c not in TAKE_ALL]
+    for char in ordered:
+        final_rows.extend(samples[char])
 
     OUTPUT.parent.mkdir(parents=True, exist_ok=True)
     with OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
         fieldnames = ["annotation_id", "movie", "character", "speech_id", "text", "annotation_label"]
         writer = csv.DictWriter(f_out, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(final_rows)
+
+        # assign annotation_id while writing (rows are views, nothing is copied before this)
+        for idx, r in enumerate(final_rows, start=1):
+            out = r.to_dict()
+            out["annotation_id"] = idx
+            out["annotation_label"] = ""  # empty column for you to fill in manually
+            writer.writerow(out)
 
     print(f"Annotation dataset written to: {OUTPUT}")
     print(f"Total rows in annotation file: {len(final_rows)}")
@@ -3,12 +3,17 @@ import csv
 import random
 import math
 from collections import Counter, defaultdict
+import sys
 
-INPUT = Path("data/processed/processed_speeches/final_chars_speeches_non_trivial_RHD.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+
+# not the partitions: the movie strata of this sample are the movie names before normalize_movie_names_RDH.py
+# ("phoenix" and "the_order_phoenix" apart), as in the checked-in sample
+INPUT = Path("data/processed/processed_speeches/cleaned_non_trivial_RHD/final_chars_speeches_non_trivial_RHD.csv")
 OUTPUT = Path("data/processed/processed_speeches/open_coding_sample_RHD_100.csv")
 
 TOTAL_SAMPLE_SIZE = 100
-TARGET_CHARACTERS = {"RON", "HERMIONE", "DUMBLEDORE"}
 
 random.seed(42)  # reproducible sampling
 
@@ -0,0 +1,153 @@
+"""
+Pick the next batch of lines to annotate (active learning).
+
+build_annotation_dataset.py samples lines at random. Once part of the data
+is labelled, the labels show where the model is unsure: this script trains
+the topic classifier of Analysis/topic_classifier.py on the annotated
+lines, scores every unlabelled line of the target characters and picks
+BATCH_SIZE lines that are
+
+- uncertain: the SHORTLIST_FACTOR * BATCH_SIZE lines with the highest
+  entropy of the predicted topic distribution become candidates
+- diverse: greedy k-center over the candidates' TF-IDF vectors picks, one
+  at a time, the candidate farthest (cosine) from everything labelled or
+  already picked, weighted by its uncertainty
+
+The labelled lines are summarised by MiniBatchKMeans centroids instead of
+being compared one by one, and each candidate keeps a running minimum
+distance, so a batch costs BATCH_SIZE sparse products over the shortlist
+however large the labelled set or the pool gets.
+
+    python src/Annotation_open_coding/select_annotation_batch.py
+"""
+from pathlib import Path
+import csv
+import sys
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Analysis.topic_classifier import train
+from Dataset_prep.annotation_store import read_annotation_frame
+from Dataset_prep.character_partitions import TARGET_CHARACTERS, read_partitions
+from Dataset_prep.text_normalization import match_text
+
+DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
+OUTPUT = Path("data/processed/processed_speeches/annotation_batch_next.csv")
+
+BATCH_SIZE = 100
+SHORTLIST_FACTOR = 10    # candidates = the most uncertain BATCH_SIZE * SHORTLIST_FACTOR lines
+N_CENTROIDS = 50         # MiniBatchKMeans summary of the labelled lines
+SEED = 42
+
+
+def entropy(proba):
+    """Normalised entropy of each row (0 = certain, 1 = uniform)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = -np.where(proba > 0, proba * np.log(proba), 0.0).sum(axis=1)
+    return h / np.log(proba.shape[1]) if proba.shape[1] > 1 else h
+
+
+def labelled_centroids(features, n_centroids=N_CENTROIDS, seed=SEED):
+    # unit-length centroids of the labelled lines' TF-IDF vectors
+    k = min(n_centroids, features.shape[0])
+    if k == 0:
+        return None
+    kmeans = MiniBatchKMeans(n_clusters=k, batch_size=1024, n_init=3, random_state=seed)
+    kmeans.fit(features)
+    return normalize(kmeans.cluster_centers_)
+
+
+def k_center_greedy(features, weights, batch_size, centers=None):
+    """
+    Greedy k-center on L2-normalised sparse rows: repeatedly take the row
+    with the largest (distance to the nearest center) * weight, then make it
+    a center. Returns the chosen row indices in pick order.
+    """
+    n = features.shape[0]
+    if centers is None:
+        min_dist = np.ones(n)
+    else:
+        min_dist = 1 - np.asarray(features @ centers.T).max(axis=1)
+    min_dist = np.clip(min_dist, 0, None)
+
+    chosen = []
+    available = np.ones(n, dtype=bool)
+    for _ in range(min(batch_size, n)):
+        score = np.where(available, min_dist * weights, -1)
+        best = int(score.argmax())
+        chosen.append(best)
+        available[best] = False
+        dist = 1 - np.asarray((features @ features[best].T).todense()).ravel()
+        np.minimum(min_dist, dist, out=min_dist)
+    return chosen
+
+
+def select_batch(model, pool_texts, labelled_texts, batch_size=BATCH_SIZE):
+    """
+    -> (indices into pool_texts in pick order, predicted labels, uncertainty)
+    for the whole pool.
+    """
+    vectorizer, classifier = model[:-1], model[-1]
+    pool = vectorizer.transform(pool_texts)
+    proba = classifier.predict_proba(pool)
+    uncertainty = entropy(proba)
+    predicted = classifier.classes_[proba.argmax(axis=1)]
+
+    shortlist = np.argsort(-uncertainty, kind="stable")[:batch_size * SHORTLIST_FACTOR]
+    centers = labelled_centroids(vectorizer.transform(labelled_texts))
+    picked = k_center_greedy(pool[shortlist], uncertainty[shortlist], batch_size, centers)
+    return shortlist[picked], predicted, uncertainty
+
+
+def main():
+    df = read_annotation_frame(DATA_PATH)  # includes pending label/text fixes
+    print(f"Training on {len(df)} annotated lines")
+    model = train(df)
+
+    # a line is labelled if its text is (as in topic_classifier; speech ids move when a script is parsed
+    # differently) or its speech_id is: remove_weird_characters.py and the annotators edited some labelled texts
+    labelled_text = set(zip(df["movie"], df["character"], (match_text(t) for t in df["text"])))
+    labelled_id = set(zip(df["movie"], df["character"], df["speech_id"].astype(str)))
+    rows = read_partitions(TARGET_CHARACTERS)
+    pool = [
+        r for r in rows
+        if (r["movie"], r["character"], match_text(r["text"])) not in labelled_text
+        and (r["movie"], r["character"], r["speech_id"]) not in labelled_id
+    ]
+    print(f"Unlabelled pool: {len(pool)} of {len(rows)} lines")
+    if not pool:
+        return
+
+    picked, predicted, uncertainty = select_batch(
+        model, [r["text"] for r in pool], df["text"].astype(str).tolist()
+    )
+
+    next_id = int(df["annotation_id"].max()) + 1 if len(df) else 1
+    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+    with OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
+        fieldnames = ["annotation_id", "movie", "character", "speech_id", "text", "annotation_label",
+                      "predicted_label", "uncertainty"]
+        writer = csv.DictWriter(f_out, fieldnames=fieldnames)
+        writer.writeheader()
+        for annotation_id, i in enumerate(picked, start=next_id):
+            out = pool[i].to_dict()
+            out["annotation_id"] = annotation_id
+            out["annotation_label"] = ""  # to fill in manually
+            out["predicted_label"] = predicted[i]
+            out["uncertainty"] = f"{uncertainty[i]:.4f}"
+            writer.writerow(out)
+
+    per_char = {}
+    for i in picked:
+        per_char[pool[i]["character"]] = per_char.get(pool[i]["character"], 0) + 1
+    print(f"Selected {len(picked)} lines (mean uncertainty {uncertainty[picked].mean():.3f}, "
+          f"pool {uncertainty.mean():.3f}) → {OUTPUT}")
+    for char, count in per_char.items():
+        print(f"  {char.title():<12} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+from pathlib import Path
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+import argparse
+import csv
+import re
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import clean_cue, get_resolver
+from Dataset_prep.parse_dialogue import parse_script
+
+SCRIPTS_DIR = Path("data/processed/scripts_in_text")
+OUTPUT_DIR = Path("data/processed/processed_speeches/script_alignment")
+
+# movies we have more than one usable version of (old version, new version)
+# ("Harry Potter and the Order of the Phoenix - Release.txt" is unreadable PDF
+# glyph codes and parses to no speeches, so phoenix has only one)
+DEFAULT_PAIRS = {
+    "sorcerer_s_stone": (
+        SCRIPTS_DIR / "harry-potter-and-the-sorcerers-stone-2001.txt",
+        SCRIPTS_DIR / "HARRY_POTTER_AND_THE_SORCERER_S_STONE.txt",
+    ),
+}
+
+BAND = 25              # max distance from the gap diagonal the banded diff looks at
+CHANGED_RATIO = 0.6    # text similarity for two same-speaker lines to count as "changed"
+
+
+def normalize(text: str) -> str:
+    # compare on letters/digits only, so OCR punctuation noise doesn't break anchors
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def speaker(speech) -> str:
+    # canonical name, so "PROFESSOR MCGONAGALL" in one version and "MCGONAGALL" in the other are one speaker
+    return get_resolver().canonical_name(speech["character_id"]) or clean_cue(speech["character"])
+
+
+def line_keys(speeches):
+    return [(speaker(s), normalize(s["text"])) for s in speeches]
+
+
+def similar(a, b) -> bool:
+    # same speaker and close enough text; the quick ratios are cheap upper bounds
+    if a[0] != b[0]:
+        return False
+    matcher = SequenceMatcher(None, a[1], b[1], autojunk=False)
+    return (
+        matcher.real_quick_ratio() >= CHANGED_RATIO
+        and matcher.quick_ratio() >= CHANGED_RATIO
+        and matcher.ratio() >= CHANGED_RATIO
+    )
+
+
+def longest_increasing_anchors(pairs):
+    """
+    pairs: (i, j) sorted by i. Returns the longest subsequence with increasing j
+    (patience sorting, O(k log k)).
+    """
+    tails, tails_idx, prev = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tails_idx.append(k)
+        else:
+            tails[pos] = j
+            tails_idx[pos] = k
+        prev[k] = tails_idx[pos - 1] if pos > 0 else None
+
+    chain = []
+    k = tails_idx[-1] if tails_idx else None
+    while k is not None:
+        chain.append(pairs[k])
+        k = prev[k]
+    return chain[::-1]
+
+
+def unique_anchors(a_keys, b_keys, a_lo, a_hi, b_lo, b_hi):
+    # lines that occur exactly once on each side of the gap
+    a_count = Counter(a_keys[a_lo:a_hi])
+    b_pos = {}
+    b_count = Counter(b_keys[b_lo:b_hi])
+    for j in range(b_lo, b_hi):
+        if b_count[b_keys[j]] == 1:
+            b_pos[b_keys[j]] = j
+
+    pairs = [
+        (i, b_pos[a_keys[i]])
+        for i in range(a_lo, a_hi)
+        if a_count[a_keys[i]] == 1 and a_keys[i] in b_pos
+    ]
+    return longest_increasing_anchors(pairs)
+
+
+def banded_diff(a_keys, b_keys, a_lo, a_hi, b_lo, b_hi):
+    """
+    Align a gap with no unique anchors left. Only cells within BAND of the
+    gap diagonal are filled, so the cost is O((n + m) * BAND) instead of O(n * m).
+    Returns ("equal" | "changed" | "removed" | "added", i or None, j or None).
+    """
+    n, m = a_hi - a_lo, b_hi - b_lo
+    if n == 0 or m == 0:
+        return [("removed", a_lo + i, None) for i in range(n)] + \
+               [("added", None, b_lo + j) for j in range(m)]
+
+    # cell (i, j) is in the band when |i * m - j * n| <= width, so row i only visits
+    # j from ceil((i * m - width) / n) to floor((i * m + width) / n)
+    width = BAND * max(n, m)
+
+    # score[i, j] = most matched lines aligning a[:i] with b[:j]; missing cells are -inf
+    score = {(0, 0): 0}
+    back = {}
+    for i in range(n + 1):
+        j_lo = max(0, -((width - i * m) // n))
+        j_hi = min(m, (i * m + width) // n)
+        for j in range(j_lo, j_hi + 1):
+            if (i, j) == (0, 0):
+                continue
+            best, move = None, None
+            if i > 0 and (i - 1, j) in score:
+                best, move = score[(i - 1, j)], "removed"
+            if j > 0 and (i, j - 1) in score and (best is None or score[(i, j - 1)] > best):
+                best, move = score[(i, j - 1)], "added"
+            if i > 0 and j > 0 and (i - 1, j - 1) in score:
+                a_key, b_key = a_keys[a_lo + i - 1], b_keys[b_lo + j - 1]
+                if a_key == b_key or similar(a_key, b_key):
+                    if best is None or score[(i - 1, j - 1)] + 1 > best:
+                        best = score[(i - 1, j - 1)] + 1
+                        move = "equal" if a_key == b_key else "changed"
+            if best is not None:
+                score[(i, j)] = best
+                back[(i, j)] = move
+
+    ops = []
+    i, j = n, m
+    while (i, j) != (0, 0):
+        move = back[(i, j)]
+        if move == "removed":
+            i -= 1
+            ops.append(("removed", a_lo + i, None))
+        elif move == "added":
+            j -= 1
+            ops.append(("added", None, b_lo + j))
+        else:
+            i, j = i - 1, j - 1
+            ops.append((move, a_lo + i, b_lo + j))
+    return ops[::-1]
+
+
+def align(a_keys, b_keys, a_lo=0, a_hi=None, b_lo=0, b_hi=None):
+    """
+    Patience-style alignment: anchor on lines unique to both sides, recurse
+    into the gaps between anchors, and fall back to a banded diff once a gap
+    has no unique lines.
+    """
+    a_hi = len(a_keys) if a_hi is None else a_hi
+    b_hi = len(b_keys) if b_hi is None else b_hi
+
+    # common prefix / suffix are free
+    ops = []
+    while a_lo < a_hi and b_lo < b_hi and a_keys[a_lo] == b_keys[b_lo]:
+        ops.append(("equal", a_lo, b_lo))
+        a_lo, b_lo = a_lo + 1, b_lo + 1
+    suffix = []
+    while a_lo < a_hi and b_lo < b_hi and a_keys[a_hi - 1] == b_keys[b_hi - 1]:
+        a_hi, b_hi = a_hi - 1, b_hi - 1
+        suffix.append(("equal", a_hi, b_hi))
+
+    anchors = unique_anchors(a_keys, b_keys, a_lo, a_hi, b_lo, b_hi)
+    if not anchors:
+        ops.extend(banded_diff(a_keys, b_keys, a_lo, a_hi, b_lo, b_hi))
+    else:
+        i0, j0 = a_lo, b_lo
+        for i, j in anchors:
+            ops.extend(align(a_keys, b_keys, i0, i, j0, j))
+            ops.append(("equal", i, j))
+            i0, j0 = i + 1, j + 1
+        ops.extend(align(a_keys, b_keys, i0, a_hi, j0, b_hi))
+
+    ops.extend(suffix[::-1])
+    return ops
+
+
+def compare_scripts(old_path: Path, new_path: Path):
+    old = parse_script(old_path)
+    new = parse_script(new_path)
+    ops = align(line_keys(old), line_keys(new))
+    return old, new, ops
+
+
+def summarize(old, new, ops):
+    per_char = defaultdict(Counter)
+    for op, i, j in ops:
+        per_char[speaker(old[i] if i is not None else new[j])][op] += 1
+    return per_char
+
+
+def write_outputs(name, old, new, ops, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    detail_path = out_dir / f"{name}_alignment.tsv"
+    with detail_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["op", "character", "old_speech_id", "new_speech_id", "old_text", "new_text"])
+        for op, i, j in ops:
+            if op == "equal":
+                continue
+            a = old[i] if i is not None else None
+            b = new[j] if j is not None else None
+            writer.writerow([
+                op,
+                speaker(a or b),
+                a["speech_id"] if a else "",
+                b["speech_id"] if b else "",
+                a["text"] if a else "",
+                b["text"] if b else "",
+            ])
+
+    summary_path = out_dir / f"{name}_summary.tsv"
+    per_char = summarize(old, new, ops)
+    with summary_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["character", "equal", "changed", "removed", "added"])
+        for character, counts in sorted(per_char.items(), key=lambda x: -sum(x[1].values())):
+            writer.writerow([character] + [counts[op] for op in ("equal", "changed", "removed", "added")])
+
+    return detail_path, summary_path, per_char
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align two versions of the same movie script.")
+    parser.add_argument("old", nargs="?", type=Path, help="older script .txt")
+    parser.add_argument("new", nargs="?", type=Path, help="newer script .txt")
+    parser.add_argument("--name", help="output file prefix (default: stem of the new script)")
+    parser.add_argument("--out-dir", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    if args.old and args.new:
+        pairs = {args.name or args.new.stem: (args.old, args.new)}
+    else:
+        pairs = DEFAULT_PAIRS
+
+    for name, (old_path, new_path) in pairs.items():
+        old, new, ops = compare_scripts(old_path, new_path)
+        if not old or not new:
+            # an empty side would report every line of the other as removed / added
+            empty = old_path if not old else new_path
+            print(f"\n{name}: skipped, no speeches parsed from {empty.name}", file=sys.stderr)
+            continue
+        totals = Counter(op for op, _, _ in ops)
+        print(f"\n{name}: {len(old)} vs {len(new)} speeches")
+        print(f"  {old_path.name}  →  {new_path.name}")
+        print("  " + ", ".join(f"{op} {totals[op]}" for op in ("equal", "changed", "removed", "added")))
+
+        detail_path, summary_path, per_char = write_outputs(name, old, new, ops, args.out_dir)
+        top = sorted(per_char.items(), key=lambda x: -sum(x[1].values()))[:8]
+        for character, counts in top:
+            print(f"  {character:<25} =" + f"{counts['equal']:<5} ~{counts['changed']:<5} -{counts['removed']:<5} +{counts['added']}")
+        print(f"  Saved → {detail_path}")
+        print(f"  Saved → {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Safe edits of the labelled annotation dataset.
+
+The master CSV is never rewritten in place. Fixes (label remaps, text
+clean-ups, ...) are appended as patch sets to a change log next to it:
+
+    annotation_dataset_RHD_final.csv             # master
+    annotation_dataset_RHD_final.changes.jsonl   # one patch set per line
+
+A patch set is one JSON line {"txn", "time", "note", "changes": [...]}
+where every change sets one field of one annotation_id to a new value. A
+line that was only half written (crash) is ignored, so a patch set is
+either fully applied or not at all, and applying a set twice is harmless.
+
+Once the log is long enough it is compacted: the merged rows go to a temp
+file in the same folder, which then replaces the master with an atomic
+rename, and the log is removed. A crash at any point leaves
+either the old master + log or the new master (+ a log whose changes are
+already in it).
+
+Anything that reads the dataset should go through read_annotations() /
+read_annotation_frame() so pending changes are seen. iter_annotation_frames()
+does the same in chunks of CHUNK_SIZE rows for files that don't fit in
+memory (set ANNOTATION_CHUNK_SIZE in the environment to switch the
+analysis scripts to it).
+"""
+from pathlib import Path
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+
+MASTER = Path("data/processed/processed_speeches/annotation_dataset_RHD_final.csv")
+KEY = "annotation_id"
+
+# compact once the log holds this many changes
+COMPACT_EVERY = 500
+
+# rows per chunk for iter_annotation_frames (None = the whole file as one frame)
+CHUNK_SIZE = int(os.environ.get("ANNOTATION_CHUNK_SIZE") or 0) or None
+
+
+def changes_path(master=MASTER):
+    master = Path(master)
+    return master.with_name(master.stem + ".changes.jsonl")
+
+
+def read_master(master=MASTER):
+    with Path(master).open("r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def read_change_log(master=MASTER):
+    # complete patch sets only; a torn last line from a crash is skipped
+    path = changes_path(master)
+    if not path.exists():
+        return []
+
+    patch_sets = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break
+            try:
+                patch_sets.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return patch_sets
+
+
+def apply_changes(rows, patch_sets):
+    by_id = {row[KEY]: row for row in rows}
+    for patch in patch_sets:
+        for change in patch["changes"]:
+            row = by_id.get(change["id"])
+            if row is not None:
+                row[change["field"]] = change["new"]
+    return rows
+
+
+def read_annotations(master=MASTER):
+    """(fieldnames, rows) with every logged change applied."""
+    fieldnames, rows = read_master(master)
+    return fieldnames, apply_changes(rows, read_change_log(master))
+
+
+def read_annotation_frame(master=MASTER, **read_csv_kwargs):
+    # same dtypes as pd.read_csv on the master, pending changes included
+    import pandas as pd
+
+    if not read_change_log(master):
+        return pd.read_csv(master, encoding="utf-8", **read_csv_kwargs)
+
+    fieldnames, rows = read_annotations(master)
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+    buf.seek(0)
+    return pd.read_csv(buf, **read_csv_kwargs)
+
+
+def iter_annotation_frames(master=MASTER, chunk_size=CHUNK_SIZE, **read_csv_kwargs):
+    """
+    The dataset as DataFrames of at most chunk_size rows, pending changes
+    included. With chunk_size=None it is one frame from read_annotation_frame().
+    """
+    import pandas as pd
+
+    if chunk_size is None:
+        yield read_annotation_frame(master, **read_csv_kwargs)
+        return
+
+    patch_sets = read_change_log(master)
+    if not patch_sets:
+        yield from pd.read_csv(master, encoding="utf-8", chunksize=chunk_size, **read_csv_kwargs)
+        return
+
+    # stream rows through the csv module, patch them, let pandas parse each chunk
+    with Path(master).open("r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = [row for _, row in zip(range(chunk_size), reader)]
+            if not rows:
+                break
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            writer.writerows(apply_changes(rows, patch_sets))
+            buf.seek(0)
+            yield pd.read_csv(buf, **read_csv_kwargs)
+
+
+def _fsync_dir(path):
+    # make the rename itself durable (not possible on every platform)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path, write):
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    _fsync_dir(path.parent)
+
+
+class AnnotationStore:
+    """
+    Collects field changes and commits them as one patch set:
+
+        store = AnnotationStore()
+        for row in store.rows():
+            if row["annotation_label"] == "Infromative":
+                store.set(row, "annotation_label", "Informative")
+        store.commit("fix misspelled label")
+
+    Changes that don't change anything are dropped, so rerunning a fix
+    writes nothing.
+    """
+
+    def __init__(self, master=MASTER, compact_every=COMPACT_EVERY):
+        self.master = Path(master)
+        self.compact_every = compact_every
+        self.fieldnames, self._rows = read_annotations(self.master)
+        self.pending = []
+
+    def rows(self):
+        return self._rows
+
+    def set(self, row, field, value):
+        if field not in self.fieldnames or field == KEY:
+            raise KeyError(f"cannot set field {field!r}")
+        if row[field] == value:
+            return False
+        self.pending.append({"id": row[KEY], "field": field, "old": row[field], "new": value})
+        row[field] = value
+        return True
+
+    def commit(self, note=""):
+        """Append the pending changes as one patch set. Returns how many were logged."""
+        if not self.pending:
+            return 0
+
+        patch = {
+            "txn": f"{time.time_ns():x}",
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "note": note,
+            "changes": self.pending,
+        }
+        line = json.dumps(patch, ensure_ascii=False) + "\n"
+
+        log = changes_path(self.master)
+        with log.open("a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+        count = len(self.pending)
+        self.pending = []
+
+        if sum(len(p["changes"]) for p in read_change_log(self.master)) >= self.compact_every:
+            self.compact()
+        return count
+
+    def compact(self):
+        """Fold the change log into the master file (atomic rename), then reset the log."""
+        fieldnames, rows = read_annotations(self.master)
+
+        def write_rows(f):
+            # "\n" like the pandas-written original
+            writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+
+        _atomic_write(self.master, write_rows)
+        # replaying the old log on the new master is a no-op, so a crash here is safe
+        log = changes_path(self.master)
+        if log.exists():
+            log.unlink()
+        self._rows = rows
+
+
+def main():
+    # show what is pending, fold it in
+    log = read_change_log()
+    print(f"{MASTER}: {sum(len(p['changes']) for p in log)} pending changes in {len(log)} patch sets")
+    for patch in log:
+        print(f"  {patch['time']}  {len(patch['changes']):4d}  {patch['note']}")
+    if log:
+        AnnotationStore().compact()
+        print("Compacted into the master file.")
+
+
+if __name__ == "__main__":
+    main()
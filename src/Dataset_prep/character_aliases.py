@@ -0,0 +1,234 @@
+from collections import defaultdict
+import re
+
+# canonical character -> other cue spellings seen in the scripts
+# no bare first names or surnames here: TOM is also the Leaky Cauldron innkeeper,
+# MALFOY would swallow MR. MALFOY once titles are stripped
+CANONICAL_CHARACTERS = {
+    "HARRY": ["HARRY POTTER", "OLDER HARRY", "YOUNG HARRY"],
+    "RON": ["RON WEASLEY", "RONALD WEASLEY", "OLDER RON"],
+    "HERMIONE": ["HERMIONE GRANGER", "OLDER HERMIONE"],
+    "DUMBLEDORE": ["ALBUS DUMBLEDORE", "PROFESSOR DUMBLEDORE"],
+    "VOLDEMORT": ["LORD VOLDEMORT", "YOU-KNOW-WHO"],
+    "TOM RIDDLE": ["YOUNG TOM RIDDLE"],
+    "SNAPE": ["SEVERUS SNAPE", "PROFESSOR SNAPE"],
+    "HAGRID": ["RUBEUS HAGRID", "YOUNG HAGRID"],
+    "MCGONAGALL": ["PROFESSOR MCGONAGALL", "MINERVA MCGONAGALL"],
+    "LUPIN": ["PROFESSOR LUPIN", "REMUS LUPIN"],
+    "SIRIUS": ["SIRIUS BLACK"],
+    "DRACO": ["DRACO MALFOY"],
+    "LUCIUS": ["LUCIUS MALFOY"],
+    "NARCISSA": ["NARCISSA MALFOY"],
+    "BELLATRIX": ["BELLATRIX LESTRANGE"],
+    "GINNY": ["GINNY WEASLEY"],
+    "FRED": ["FRED WEASLEY"],
+    "GEORGE": ["GEORGE WEASLEY"],
+    "PERCY": ["PERCY WEASLEY"],
+    "ARTHUR WEASLEY": ["MR. WEASLEY"],
+    "MOLLY WEASLEY": ["MRS. WEASLEY"],
+    "NEVILLE": ["NEVILLE LONGBOTTOM"],
+    "LUNA": ["LUNA LOVEGOOD"],
+    "SLUGHORN": ["HORACE SLUGHORN", "PROFESSOR SLUGHORN"],
+    "UMBRIDGE": ["DOLORES UMBRIDGE", "PROFESSOR UMBRIDGE"],
+    "FUDGE": ["CORNELIUS FUDGE"],
+    "LOCKHART": ["GILDEROY LOCKHART", "PROFESSOR LOCKHART"],
+    "TRELAWNEY": ["PROFESSOR TRELAWNEY", "SYBILL TRELAWNEY"],
+    "MOODY": ["MADEYE MOODY", "MAD-EYE MOODY", "ALASTOR MOODY"],
+    "PETTIGREW": ["PETER PETTIGREW", "WORMTAIL"],
+    "DOBBY": [],
+    "KREACHER": [],
+    "CEDRIC": ["CEDRIC DIGGORY"],
+    "CHO": ["CHO CHANG"],
+    "DUDLEY": ["DUDLEY DURSLEY"],
+    "VERNON": ["UNCLE VERNON", "VERNON DURSLEY"],
+    "PETUNIA": ["AUNT PETUNIA", "PETUNIA DURSLEY", "PETUNIA EVANS"],
+    "ALBUS POTTER": ["ALBUS SEVERUS", "ALBUS SEVERUS POTTER"],
+}
+
+# character ids are written to the parse outputs: never renumber or reuse one,
+# a new character gets the next free id
+CHARACTER_IDS = {
+    "HARRY": 1,
+    "RON": 2,
+    "HERMIONE": 3,
+    "DUMBLEDORE": 4,
+    "VOLDEMORT": 5,
+    "TOM RIDDLE": 6,
+    "SNAPE": 7,
+    "HAGRID": 8,
+    "MCGONAGALL": 9,
+    "LUPIN": 10,
+    "SIRIUS": 11,
+    "DRACO": 12,
+    "LUCIUS": 13,
+    "NARCISSA": 14,
+    "BELLATRIX": 15,
+    "GINNY": 16,
+    "FRED": 17,
+    "GEORGE": 18,
+    "PERCY": 19,
+    "ARTHUR WEASLEY": 20,
+    "MOLLY WEASLEY": 21,
+    "NEVILLE": 22,
+    "LUNA": 23,
+    "SLUGHORN": 24,
+    "UMBRIDGE": 25,
+    "FUDGE": 26,
+    "LOCKHART": 27,
+    "TRELAWNEY": 28,
+    "MOODY": 29,
+    "PETTIGREW": 30,
+    "DOBBY": 31,
+    "KREACHER": 32,
+    "CEDRIC": 33,
+    "CHO": 34,
+    "DUDLEY": 35,
+    "VERNON": 36,
+    "PETUNIA": 37,
+    "ALBUS POTTER": 38,
+}
+
+UNKNOWN_ID = 0
+
+# bits of a cue that never change who is speaking
+CUE_EXTENSION_RE = re.compile(r"\s*\((?:V\.O\.|O\.S\.|O\.C\.|CONT'D|CONT’D|CONTD)\)\s*$")
+PARENTHETICAL_RE = re.compile(r"\(.*?\)|\(.*$")
+TITLES = {"PROFESSOR", "MR.", "MRS.", "MR", "MRS", "MADAM", "MADAME", "LORD", "SIR", "YOUNG", "OLDER"}
+
+FUZZY_THRESHOLD = 0.7  # Dice coefficient on character trigrams (VOLDEMONT ~ VOLDEMORT = 0.7)
+
+
+def strip_cue_extension(cue: str) -> str:
+    # "DUMBLEDORE (V.O.)" -> "DUMBLEDORE"
+    return CUE_EXTENSION_RE.sub("", cue)
+
+
+def clean_cue(cue: str) -> str:
+    # upper case, no parentheticals, no trailing dots ("RON." -> "RON"), single spaces
+    cue = PARENTHETICAL_RE.sub(" ", cue.upper())
+    cue = cue.replace("’", "'")
+    return " ".join(cue.split()).strip(" .*:")
+
+
+def trigrams(name: str):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CharacterResolver:
+    """
+    Maps raw speaker cues to canonical character ids.
+
+    Lookup order: exact alias, alias without titles (PROFESSOR, MR., ...),
+    then fuzzy match through a trigram index over aliases with the same
+    number of words (catches OCR typos like VOLDEMONT / DUMBLEDOR). Results are cached per raw cue, so a
+    whole script costs one resolution per distinct speaker.
+    """
+
+    def __init__(self, canonical=CANONICAL_CHARACTERS, ids=CHARACTER_IDS, threshold=FUZZY_THRESHOLD):
+        missing = [name for name in canonical if name not in ids]
+        if missing:
+            raise ValueError(f"no character id for {missing}, add them to CHARACTER_IDS")
+        self.names = {ids[name]: name for name in canonical}
+        self.ids = {name: ids[name] for name in canonical}
+        self.threshold = threshold
+        self.alias_to_id = {}
+        for name, aliases in canonical.items():
+            for alias in [name] + aliases:
+                self.alias_to_id[clean_cue(alias)] = ids[name]
+
+        # trigram -> aliases containing it (prebuilt once)
+        self.alias_trigrams = {}
+        self.index = defaultdict(set)
+        for alias in self.alias_to_id:
+            grams = trigrams(alias)
+            self.alias_trigrams[alias] = grams
+            for g in grams:
+                self.index[g].add(alias)
+
+        self._cache = {}
+
+    def canonical_name(self, character_id: int) -> str:
+        return self.names.get(character_id, "")
+
+    def id_of(self, canonical_name: str) -> int:
+        return self.ids[canonical_name]
+
+    def fuzzy(self, cue: str):
+        grams = trigrams(cue)
+        shared = defaultdict(int)
+        for g in grams:
+            for alias in self.index.get(g, ()):
+                shared[alias] += 1
+
+        best, best_score = None, 0.0
+        n_words = len(cue.split())
+        for alias, common in shared.items():
+            # a bare first name or surname is not a typo of the full name
+            if len(alias.split()) != n_words:
+                continue
+            score = 2 * common / (len(grams) + len(self.alias_trigrams[alias]))
+            if score > best_score:
+                best, best_score = alias, score
+
+        if best is not None and best_score >= self.threshold:
+            return self.alias_to_id[best]
+        return UNKNOWN_ID
+
+    def resolve(self, raw_cue: str) -> int:
+        cached = self._cache.get(raw_cue)
+        if cached is not None:
+            return cached
+
+        cue = clean_cue(raw_cue)
+        character_id = self.alias_to_id.get(cue)
+
+        if character_id is None:
+            words = [w for w in cue.split() if w not in TITLES]
+            character_id = self.alias_to_id.get(" ".join(words))
+
+        if character_id is None and cue:
+            character_id = self.fuzzy(cue)
+
+        character_id = character_id or UNKNOWN_ID
+        self._cache[raw_cue] = character_id
+        return character_id
+
+
+_default = None
+
+
+def get_resolver() -> CharacterResolver:
+    global _default
+    if _default is None:
+        _default = CharacterResolver()
+    return _default
+
+
+def character_id(raw_cue: str) -> int:
+    return get_resolver().resolve(raw_cue)
+
+
+def canonical_id(canonical_name: str) -> int:
+    return get_resolver().id_of(canonical_name)
+
+
+if __name__ == "__main__":
+    # quick look at how every cue in the parsed TSVs resolves
+    from pathlib import Path
+    import csv
+    from collections import Counter
+
+    cues = Counter()
+    # series other than Harry Potter are in a subfolder each
+    for tsv_path in Path("data/processed/processed_speeches/processed_speeches_all_chars").rglob("*.tsv"):
+        with tsv_path.open("r", encoding="utf-8", errors="ignore") as f:
+            # texts are written unquoted, a leading " is part of the text
+            for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                cues[(row.get("character") or "").strip()] += 1
+
+    resolver = get_resolver()
+    for cue, count in cues.most_common():
+        cid = resolver.resolve(cue)
+        if cid != UNKNOWN_ID and clean_cue(cue) != resolver.canonical_name(cid):
+            print(f"{cue!r:35} ({count:4d}) → {resolver.canonical_name(cid)}")
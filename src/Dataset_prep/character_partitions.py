@@ -0,0 +1,108 @@
+from pathlib import Path
+from contextlib import ExitStack
+import csv
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import get_resolver
+from Dataset_prep.normalize_movie_names_RDH import NAME_MAP
+from Dataset_prep.speech_table import SpeechTable, FIELDNAMES
+
+# the cleaned Ron / Hermione / Dumbledore speeches the annotation sample was drawn from (checked in);
+# rows keep this file's order inside each partition, so the seeded sample is the same as drawn from the file
+INPUT = Path("data/processed/processed_speeches/cleaned_non_trivial_RHD/final_chars_speeches_non_trivial_RHD_normalized.csv")
+PARTITION_DIR = Path("data/processed/processed_speeches/partitions")
+
+# the characters the project studies; samplers and charts import this instead of
+# keeping their own copy (order = order used in charts)
+TARGET_CHARACTERS = ["RON", "HERMIONE", "DUMBLEDORE"]
+
+# None writes a partition for every canonical character; speakers that don't
+# resolve to one go to OTHER
+PARTITION_CHARACTERS = None
+OTHER = "_OTHER"
+
+
+def partition_path(character, part_dir=PARTITION_DIR):
+    return Path(part_dir) / f"{character.replace(' ', '_')}.csv"
+
+
+def partition_speeches(input_csv=INPUT, part_dir=PARTITION_DIR, characters=PARTITION_CHARACTERS):
+    """
+    Stream the speech CSV once and append every row to the file of its
+    canonical character. Movie names are normalized and characters are
+    written under their canonical name; columns beyond the four
+    (duplicate_of, ...) are copied as they are. Partition files of characters
+    that got no rows this time are deleted. Returns {character: rows written}.
+    """
+    resolver = get_resolver()
+    part_dir = Path(part_dir)
+    part_dir.mkdir(parents=True, exist_ok=True)
+
+    counts = {}
+    with ExitStack() as stack:
+        writers = {}
+
+        f_in = stack.enter_context(Path(input_csv).open("r", encoding="utf-8", errors="ignore"))
+        reader = csv.DictReader(f_in)
+        extra = [name for name in reader.fieldnames or [] if name not in FIELDNAMES]
+        for row in reader:
+            raw_character = (row.get("character") or "").strip()
+            name = resolver.canonical_name(resolver.resolve(raw_character)) or OTHER
+            if characters is not None and name not in characters:
+                continue
+
+            writer = writers.get(name)
+            if writer is None:
+                f_out = stack.enter_context(
+                    partition_path(name, part_dir).open("w", encoding="utf-8", newline="")
+                )
+                writer = csv.DictWriter(f_out, fieldnames=FIELDNAMES + extra)
+                writer.writeheader()
+                writers[name] = writer
+                counts[name] = 0
+
+            movie = (row.get("movie") or "").strip()
+            writer.writerow({
+                "movie": NAME_MAP.get(movie, movie),
+                # unknown speakers keep their raw cue
+                "character": name if name != OTHER else raw_character,
+                "speech_id": (row.get("speech_id") or "").strip(),
+                "text": (row.get("text") or "").strip(),
+                **{name: (row.get(name) or "").strip() for name in extra},
+            })
+            counts[name] += 1
+
+    # a character that dropped out (PARTITION_CHARACTERS changed, input changed) must not leave its old file
+    written = {partition_path(name, part_dir) for name in counts}
+    for path in part_dir.glob("*.csv"):
+        if path not in written:
+            path.unlink()
+    return counts
+
+
+def read_partitions(characters=TARGET_CHARACTERS, part_dir=PARTITION_DIR, skip_duplicates=True):
+    # only the requested partition files are opened; rows come back grouped by character
+    table = SpeechTable()
+    for character in characters:
+        path = partition_path(character, part_dir)
+        if path.exists():
+            SpeechTable.read_csv(path, table=table)
+        else:
+            print(f"Warning: no partition for {character} ({path}), run character_partitions.py first")
+    if skip_duplicates and "duplicate_of" in table.extra:
+        # dedup_near_duplicates.py in flag mode: keep the originals only, so no sample holds a line twice
+        table = table.filter(lambda r: not r["duplicate_of"])
+    return table
+
+
+def main():
+    counts = partition_speeches()
+    print(f"Partitioned {sum(counts.values())} speeches from {INPUT} into {len(counts)} files:")
+    for name, count in sorted(counts.items(), key=lambda x: -x[1]):
+        print(f"  {name:<20} {count}")
+    print(f"→ {PARTITION_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,39 @@
 from pathlib import Path
-import csv
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import canonical_id
+from Dataset_prep.corpus import read_speeches
+from Dataset_prep.parse_dialogue import MOVIES, movie_paths
+from Dataset_prep.speech_table import SpeechTable
 
-INPUT_DIR = Path("data/processed/processed_speeches/processed_speeches_all_chars")
 OUTPUT_CSV = Path("data/processed/processed_speeches/dumbledore_all_movies.csv")
 
+DUMBLEDORE_ID = canonical_id("DUMBLEDORE")
+
 def main():
-    rows = []
+    rows = SpeechTable()
 
-    # loop over all .tsv files with all characters
-    for tsv_path in INPUT_DIR.glob("*.tsv"):
+    # the all-characters TSV of every movie of the corpus manifest (series shards included)
+    for movie in MOVIES:
+        _, tsv_path, _ = movie_paths(movie)
         movie_name = tsv_path.stem  # use file name as movie id
 
-        with tsv_path.open("r", encoding="utf-8") as f:
-            reader = csv.DictReader(f, delimiter="\t")
-            for row in reader:
-                char_raw = row.get("character", "")
-                char_upper = char_raw.upper()
-
-                # keep any character that contains DUMBLEDORE
-                if "DUMBLEDORE" in char_upper:
-                    rows.append({
-                        "movie": movie_name,
-                        "character": char_raw,
-                        "speech_id": row.get("speech_id", ""),
-                        "text": row.get("text", "").replace("\n", " ").strip(),
-                    })
+        # character_id as written by parse_dialogue, or resolved from the cue (see corpus.py)
+        for row in read_speeches(movie):
+            char_raw = row.get("character", "")
+
+            # keep every cue that resolves to Dumbledore (ALBUS DUMBLEDORE, typos ...)
+            if row["character_id"] == DUMBLEDORE_ID:
+                rows.append(
+                    movie_name,
+                    char_raw,
+                    row.get("speech_id", ""),
+                    row.get("text", "").replace("\n", " ").strip(),
+                )
 
     # write combined CSV
-    OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    with OUTPUT_CSV.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["movie", "character", "speech_id", "text"])
-        writer.writeheader()
-        writer.writerows(rows)
+    rows.write_csv(OUTPUT_CSV)
 
     print(f"Collected {len(rows)} Dumbledore speeches into {OUTPUT_CSV}")
 
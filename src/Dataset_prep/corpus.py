@@ -0,0 +1,84 @@
+"""
+The parsed corpus: every speech of the all-characters TSVs with its metadata.
+
+parse_dialogue.py writes the TSVs as character / speech_id / text (the
+format the cleaned files and the annotation dataset were made from) and
+the character_id, scene_id and sentence_starts of each speech to a
+separate file per movie (META_DIR). read_speeches() joins the two on
+speech_id. Without a metadata file, or with one older than its TSV (the
+TSV was edited or parsed again without it), character_id is resolved
+from the cue and scene_id / sentence_starts are left empty.
+
+iter_corpus() / iter_sentences() stream the lines / sentences of every
+movie with canonical character names (concordance, similar_lines,
+ngram_stats, topic_classifier). Only csv and the light Dataset_prep
+modules are imported, so the CLI tools that search the corpus start fast.
+"""
+from pathlib import Path
+import csv
+import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import character_id, get_resolver
+from Dataset_prep.parse_dialogue import MOVIES, meta_path, movie_paths
+from Dataset_prep.sentences import spans_from_starts
+
+META_FIELDS = ["character_id", "scene_id", "sentence_starts"]
+
+
+def read_meta(movie):
+    """{speech_id: metadata row} of a movie, empty if there is no up-to-date metadata file."""
+    _, all_chars_tsv, _ = movie_paths(movie)
+    path = meta_path(movie)
+    if not path.exists() or os.stat(path).st_mtime < os.stat(all_chars_tsv).st_mtime:
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        return {row["speech_id"]: row for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE)}
+
+
+def read_speeches(movie):
+    """Rows of a movie's all-characters TSV with character_id (int), scene_id and sentence_starts added."""
+    _, all_chars_tsv, _ = movie_paths(movie)
+    meta = read_meta(movie)
+    with Path(all_chars_tsv).open("r", encoding="utf-8", errors="ignore") as f:
+        # texts are written unquoted, a leading " is part of the text
+        for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            extra = meta.get((row.get("speech_id") or "").strip())
+            if extra is None:
+                # resolved once per distinct cue, the resolver caches
+                row["character_id"] = character_id(row.get("character") or "")
+                row["scene_id"] = row["sentence_starts"] = ""
+            else:
+                row.update({key: extra[key] for key in META_FIELDS})
+                row["character_id"] = int(row["character_id"])
+            yield row
+
+
+def _iter_rows():
+    # (movie, canonical character, speech_id, TSV row) for every parsed line with text
+    resolver = get_resolver()
+    for movie in MOVIES:
+        for row in read_speeches(movie):
+            if not (row.get("text") or "").strip():
+                continue
+            raw = (row.get("character") or "").strip()
+            character = resolver.canonical_name(row["character_id"]) or raw
+            yield movie, character, (row.get("speech_id") or "").strip(), row
+
+
+def iter_corpus():
+    """(movie, canonical character, speech_id, text) for every parsed line, file by file."""
+    for movie, character, speech_id, row in _iter_rows():
+        yield movie, character, speech_id, row["text"].strip()
+
+
+def iter_sentences():
+    """
+    (movie, canonical character, speech_id, sentence, sentence number, start, end)
+    for every sentence of every parsed line; start / end are offsets into the line's text.
+    """
+    for movie, character, speech_id, row in _iter_rows():
+        text = row["text"]
+        for k, (start, end) in enumerate(spans_from_starts(text, row.get("sentence_starts")), start=1):
+            yield movie, character, speech_id, text[start:end], k, start, end
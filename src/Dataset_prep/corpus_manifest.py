@@ -0,0 +1,101 @@
+"""
+Which series and movies make up the corpus.
+
+By default the corpus is the eight Harry Potter films below. To add a
+franchise, write a manifest to MANIFEST_PATH (start from the current one
+with `python src/Dataset_prep/corpus_manifest.py --write`) and list its
+movies:
+
+    {"series": {
+        "harry_potter": {"dir": "", "movies": {"goblet_of_fire": {"script": "goblet-of-fire.txt", ...}}},
+        "star_wars": {"movies": {"a_new_hope": {"script": "star_wars/a_new_hope.txt"}}}
+    }}
+
+Per movie only "script" (relative to the scripts folder) is required;
+"all_stem" / "four_stem" name the parsed TSVs (default: the movie id and
+"<movie>_four_chars"). Every series is one shard folder ("dir", default:
+the series id) under each output folder, so its intermediate files never
+mix with another series'. Harry Potter keeps "" (the top folder) and its
+old file stems, which the manually cleaned files and the annotation set
+are named after. Movie ids must be unique across series.
+"""
+from collections import namedtuple
+from pathlib import Path
+import json
+import sys
+
+MANIFEST_PATH = Path("data/corpus_manifest.json")
+
+# series, movie id, script file, shard folder, stem of the all-characters TSV, stem of the four-characters TSV
+Movie = namedtuple("Movie", ["series", "movie", "script", "shard", "all_stem", "four_stem"])
+
+HARRY_POTTER = {
+    "dir": "",
+    "movies": {
+        "sorcerer_s_stone": {"script": "HARRY_POTTER_AND_THE_SORCERER_S_STONE.txt", "all_stem": "sorcerer_s_stone_all_characters", "four_stem": "sorcerer_s_stone_four_chars"},
+        "chamber_of_secrets": {"script": "harry-potter-and-the-chamber-of-secrets-2002.txt", "all_stem": "chamber_of_secrets_speeches", "four_stem": "chamber_of_secrets_four_chars"},
+        "prisoner_azkaban": {"script": "Harry Potter and the Prisoner of Azkaban - Screenplay.txt", "all_stem": "prisoner_azkaban_all_speeches", "four_stem": "prisoner_azkaban_four_chars"},
+        "goblet_of_fire": {"script": "goblet-of-fire.txt", "all_stem": "goblet_of_fire_all_speeches", "four_stem": "goblet_of_fire_four_chars"},
+        "the_order_phoenix": {"script": "Harry_Potter_and_The_Order_Phoenix.txt", "all_stem": "the_order_phoenix", "four_stem": "phoenix_four_chars"},
+        "half_blood_prince": {"script": "Harry Potter and the Half-Blood Prince - Screenplay.txt", "all_stem": "half_blood_prince_all_speeches", "four_stem": "half_blood_prince_four_chars"},
+        "deathly_hallows_part1": {"script": "Harry Potter and the Deathly Hallows: Part 1 - Production - Cherry Revision - Jun 11 2010.txt", "all_stem": "deathly_hallows_part1_all_speeches", "four_stem": "deathly_hallows_part1_four_chars"},
+        "deathly_hallows_part2": {"script": "Harry Potter and the Deathly Hallows: Part 2 - Draft - Dec 14 2010.txt", "all_stem": "deathly_hallows_part2_all_speeches", "four_stem": "deathly_hallows_part2_four_chars"},
+    },
+}
+DEFAULT_MANIFEST = {"series": {"harry_potter": HARRY_POTTER}}
+
+
+def read_manifest(path=MANIFEST_PATH):
+    path = Path(path)
+    if not path.exists():
+        return DEFAULT_MANIFEST
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_movies(path=MANIFEST_PATH):
+    """{movie id: Movie} in manifest order."""
+    movies = {}
+    for series, spec in read_manifest(path)["series"].items():
+        shard = spec.get("dir", series)
+        for movie, entry in spec["movies"].items():
+            if movie in movies:
+                raise ValueError(f"movie {movie!r} is listed in both {movies[movie].series!r} and {series!r}")
+            movies[movie] = Movie(
+                series, movie, entry["script"], shard,
+                entry.get("all_stem", movie), entry.get("four_stem", f"{movie}_four_chars"),
+            )
+    return movies
+
+
+def movie_name_map(movies):
+    """File stem -> movie id, for tables whose movie column still holds a TSV stem."""
+    names = {}
+    for m in movies.values():
+        for stem in (m.all_stem, m.four_stem.replace("_four_chars", "")):
+            if stem != m.movie:
+                names[stem] = m.movie
+    return names
+
+
+def main():
+    movies = load_movies()
+    source = MANIFEST_PATH if MANIFEST_PATH.exists() else "built-in default"
+    print(f"Corpus ({source}): {len(movies)} movies")
+    for series in dict.fromkeys(m.series for m in movies.values()):
+        print(f"  {series}: {', '.join(m.movie for m in movies.values() if m.series == series)}")
+
+    if "--write" in sys.argv[1:]:
+        if MANIFEST_PATH.exists():
+            print(f"{MANIFEST_PATH} already exists, not overwritten")
+            return
+        manifest = read_manifest()
+        MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with MANIFEST_PATH.open("w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Wrote {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
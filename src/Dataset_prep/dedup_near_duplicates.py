@@ -0,0 +1,176 @@
+from pathlib import Path
+import csv
+import sys
+import zlib
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.speech_table import SpeechTable
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+INPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_cleaned.csv")
+OUTPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_dedup.csv")
+REPORT_CSV = Path("data/processed/processed_speeches/near_duplicates_report.csv")
+
+# "flag" keeps near-duplicates and fills a duplicate_of column (carried into the partitions; read_partitions
+# leaves flagged rows out of the samples), "drop" removes them, labelled lines included
+MODE = "flag"
+
+SHINGLE_SIZE = 3      # word 3-grams
+MIN_TOKENS = 8        # short lines ("Harry!", "Yes, sir.") repeat legitimately, never flag them
+NUM_PERM = 128        # minhash signature length
+BANDS = 16            # 16 bands x 8 rows -> pairs above ~0.7 Jaccard become candidates
+THRESHOLD = 0.8       # exact Jaccard a candidate pair needs to count as a duplicate
+SEED = 42
+
+PRIME = 4_294_967_291     # largest prime below 2^32: a * x + b stays below 2^64, nothing wraps
+CHUNK_SHINGLES = 16_384   # (NUM_PERM x shingles) uint64 matrix per chunk: 16 MB
+MAX_BUCKET = 50           # bigger LSH buckets are paired with their first document only, not all pairs
+
+
+def tokenize(text: str):
+    return get_tokenizer("dedup").tokens(text)
+
+
+def shingles(text: str):
+    # set of hashed word k-grams, None if the line is too short to judge
+    words = tokenize(text)
+    if len(words) < MIN_TOKENS:
+        return None
+    grams = (" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1))
+    return {zlib.crc32(g.encode("utf-8")) for g in grams}
+
+
+def minhash_signatures(shingle_sets):
+    """
+    Signatures for all sets at once: (len(shingle_sets), NUM_PERM) uint64.
+    Uses h_i(x) = (a_i * x + b_i) mod p on every shingle, then a min per
+    document with np.minimum.reduceat, so there is no Python loop per permutation.
+    """
+    rng = np.random.default_rng(SEED)
+    a = rng.integers(1, PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+    b = rng.integers(0, PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+
+    signatures = np.empty((len(shingle_sets), NUM_PERM), dtype=np.uint64)
+
+    start = 0
+    while start < len(shingle_sets):
+        # take documents until the chunk holds about CHUNK_SHINGLES shingles
+        end, size = start, 0
+        while end < len(shingle_sets) and (size == 0 or size + len(shingle_sets[end]) <= CHUNK_SHINGLES):
+            size += len(shingle_sets[end])
+            end += 1
+
+        chunk = shingle_sets[start:end]
+        values = np.fromiter((h for s in chunk for h in s), dtype=np.uint64, count=size) % np.uint64(PRIME)
+        lengths = np.fromiter((len(s) for s in chunk), dtype=np.int64, count=len(chunk))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+        # a, b, x < p < 2^32, so the uint64 products are exact
+        hashed = (a * values[None, :] + b) % np.uint64(PRIME)
+        signatures[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+
+    return signatures
+
+
+def lsh_candidate_pairs(signatures):
+    # documents sharing any full band land in the same bucket
+    rows_per_band = NUM_PERM // BANDS
+    pairs = set()
+    for band in range(BANDS):
+        block = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+        buckets = {}
+        for doc, key in enumerate(block):
+            buckets.setdefault(key.tobytes(), []).append(doc)
+        for docs in buckets.values():
+            if len(docs) < 2:
+                continue
+            if len(docs) > MAX_BUCKET:
+                # a crowded band (boilerplate lines): linear in the bucket, union-find still joins the cluster
+                pairs.update((docs[0], doc) for doc in docs[1:])
+                continue
+            for i in range(len(docs)):
+                for j in range(i + 1, len(docs)):
+                    pairs.add((docs[i], docs[j]))
+    return pairs
+
+
+def find_near_duplicates(texts):
+    """
+    Returns {row index: index of the row it duplicates}, plus the verified
+    pairs with their Jaccard similarity. The earliest row of each cluster is
+    kept as the original.
+    """
+    sets = [shingles(t) for t in texts]
+    candidates = [i for i, s in enumerate(sets) if s]
+    if len(candidates) < 2:
+        return {}, []
+
+    signatures = minhash_signatures([sets[i] for i in candidates])
+
+    # union-find over verified pairs
+    parent = list(range(len(candidates)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    verified = []
+    for i, j in sorted(lsh_candidate_pairs(signatures)):
+        s_i, s_j = sets[candidates[i]], sets[candidates[j]]
+        jaccard = len(s_i & s_j) / len(s_i | s_j)
+        if jaccard >= THRESHOLD:
+            verified.append((candidates[i], candidates[j], jaccard))
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                # smaller index wins, so the first occurrence stays the original
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    duplicate_of = {}
+    for k, row in enumerate(candidates):
+        root = find(k)
+        if root != k:
+            duplicate_of[row] = candidates[root]
+
+    return duplicate_of, verified
+
+
+def main():
+    rows = SpeechTable.read_csv(INPUT_CSV)
+    print(f"Loaded {len(rows)} speeches from {INPUT_CSV}")
+
+    duplicate_of, pairs = find_near_duplicates(list(rows.texts()))
+    save_cache()
+
+    def label(i):
+        return f"{rows[i].movie}:{rows[i].speech_id}"
+
+    REPORT_CSV.parent.mkdir(parents=True, exist_ok=True)
+    with REPORT_CSV.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["kept", "duplicate", "character", "jaccard", "kept_text", "duplicate_text"])
+        for i, j, jaccard in pairs:
+            writer.writerow([label(i), label(j), rows[j].character, f"{jaccard:.3f}", rows[i].text, rows[j].text])
+
+    if MODE == "flag":
+        # an extra column of the table, so read_csv / take / write_csv keep it down to the partitions;
+        # with nothing flagged the file keeps the columns of INPUT_CSV
+        if duplicate_of:
+            rows.extra["duplicate_of"] = [label(duplicate_of[i]) if i in duplicate_of else "" for i in range(len(rows))]
+        rows.write_csv(OUTPUT_CSV)
+    else:
+        kept = rows.take([i for i in range(len(rows)) if i not in duplicate_of])
+        kept.write_csv(OUTPUT_CSV)
+
+    cross_movie = sum(1 for i, j, _ in pairs if rows[i].movie != rows[j].movie)
+    print(f"Near-duplicate pairs: {len(pairs)} ({cross_movie} across movies)")
+    print(f"{'Flagged' if MODE == 'flag' else 'Dropped'} {len(duplicate_of)} speeches → {OUTPUT_CSV}")
+    print(f"Pair report → {REPORT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
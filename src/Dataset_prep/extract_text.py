@@ -15,6 +15,13 @@ def pdf_to_text(pdf_path):
                 text += page_text + "\n"
     return text
 
+def extract_pdf(pdf_path, out_path):
+    """Write the text of one PDF to out_path."""
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(pdf_to_text(pdf_path), encoding="utf-8")
+    print(f"Saved -> {out_path}")
+
 def main():
     print(f"RAW_DIR  = {RAW_DIR.resolve()}")
     print(f"OUT_DIR  = {OUT_DIR.resolve()}")
@@ -26,10 +33,7 @@ def main():
 
     for pdf_file in pdf_files:
         print(f"Processing: {pdf_file.name}")
-        text = pdf_to_text(pdf_file)
-        out_path = OUT_DIR / f"{pdf_file.stem}.txt"
-        out_path.write_text(text, encoding="utf-8")
-        print(f"Saved -> {out_path}")
+        extract_pdf(pdf_file, OUT_DIR / f"{pdf_file.stem}.txt")
 
     print("done")
 
@@ -1,8 +1,11 @@
 from pathlib import Path
-import csv
-import re
+import sys
 
-INPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_cleaned.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.speech_table import SpeechTable
+from Dataset_prep.tokenization import get_tokenizer, save_cache
+
+INPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_dedup.csv")  # from dedup_near_duplicates.py
 OUTPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_non_trivial.csv")
 
 # Very small whitelist of "strong" words (you can add/remove)
@@ -30,9 +33,9 @@ IMPORTANT_TERMS = {
 }
 
 
-def tokenize(text: str):
-    # simple word tokenizer: letters + apostrophes
-    return re.findall(r"[A-Za-z']+", text)
+def token_ids(text: str):
+    # simple word tokenizer: letters + apostrophes (the "words" preset, cached ids)
+    return get_tokenizer("words").ids(text)
 
 
 def has_spell(words):
@@ -44,13 +47,17 @@ def contains_important_term(words):
 
 
 def is_non_trivial(text: str) -> bool:
-    words = tokenize(text)
-    word_count = len(words)
+    ids = token_ids(text)
+    word_count = len(ids)
 
     # keep everything with 3+ words
     if word_count >= 3:
         return True
 
+    # only the short lines need their words as strings
+    vocab = get_tokenizer("words").vocab.tokens
+    words = [vocab[i] for i in ids]
+
     # for very short lines, keep only if they contain a spell or proper noun
     if has_spell(words):
         return True
@@ -63,27 +70,10 @@ def is_non_trivial(text: str) -> bool:
 
 
 def main():
-    kept_rows = []
-
-    with INPUT_CSV.open("r", encoding="utf-8", errors="ignore") as f_in:
-        reader = csv.DictReader(f_in)
-        fieldnames = reader.fieldnames or ["movie", "character", "speech_id", "text"]
-
-        for row in reader:
-            text = (row.get("text") or "").strip()
-            if is_non_trivial(text):
-                kept_rows.append({
-                    "movie": (row.get("movie") or "").strip(),
-                    "character": (row.get("character") or "").strip(),
-                    "speech_id": (row.get("speech_id") or "").strip(),
-                    "text": text,
-                })
-
-    OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    with OUTPUT_CSV.open("w", encoding="utf-8", newline="") as f_out:
-        writer = csv.DictWriter(f_out, fieldnames=["movie", "character", "speech_id", "text"])
-        writer.writeheader()
-        writer.writerows(kept_rows)
+    rows = SpeechTable.read_csv(INPUT_CSV)
+    kept_rows = rows.filter(lambda r: is_non_trivial(r.text))
+    kept_rows.write_csv(OUTPUT_CSV)
+    save_cache()
 
     print(f"Kept {len(kept_rows)} non-trivial speeches → {OUTPUT_CSV}")
 
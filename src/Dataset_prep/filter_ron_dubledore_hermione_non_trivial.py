@@ -1,31 +1,23 @@
 from pathlib import Path
-import csv
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import canonical_id
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+from Dataset_prep.speech_table import SpeechTable
 
 INPUT = Path("data/processed/processed_speeches/final_chars_speeches_non_trivial.csv")
 OUTPUT = Path("data/processed/processed_speeches/final_chars_speeches_non_trivial_RHD.csv")
 
-TARGET = {"RON", "HERMIONE", "DUMBLEDORE"}
+TARGET_IDS = {canonical_id(name) for name in TARGET_CHARACTERS}
 
 def main():
-    kept = []
-
-    with INPUT.open("r", encoding="utf-8", errors="ignore") as f_in:
-        reader = csv.DictReader(f_in)
-        for row in reader:
-            character = (row.get("character") or "").strip()
-            if character in TARGET:
-                kept.append({
-                    "movie": row.get("movie", "").strip(),
-                    "character": character,
-                    "speech_id": row.get("speech_id", "").strip(),
-                    "text": row.get("text", "").strip(),
-                })
+    rows = SpeechTable.read_csv(INPUT)
+    kept = rows.filter_character_ids(TARGET_IDS)
 
-    OUTPUT.parent.mkdir(parents=True, exist_ok=True)
-    with OUTPUT.open("w", encoding="utf-8", newline="") as f_out:
-        writer = csv.DictWriter(f_out, fieldnames=["movie", "character", "speech_id", "text"])
-        writer.writeheader()
-        writer.writerows(kept)
+    # write canonical names so e.g. "ALBUS DUMBLEDORE" ends up as DUMBLEDORE downstream
+    kept.canonicalize_characters()
+    kept.write_csv(OUTPUT)
 
     print(f"Saved {len(kept)} lines → {OUTPUT}")
 
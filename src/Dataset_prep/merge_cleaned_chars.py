@@ -1,5 +1,9 @@
 from pathlib import Path
 import csv
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.speech_table import SpeechTable
 
 # Folder with manually cleaned files
 MANUAL_DIR = Path("data/processed/processed_speeches/manually-clean")
@@ -10,59 +14,52 @@ DUMBLEDORE_CSV = MANUAL_DIR / "dumbledore_all_movies_manual_clean.csv"
 # Final merged output
 OUTPUT_CSV = Path("data/processed/processed_speeches/final_chars_speeches_cleaned.csv")
 
-FIELDNAMES = ["movie", "character", "speech_id", "text"]
+# movies in the order of the checked-in final_chars_speeches_cleaned.csv (glob order differs between
+# file systems); files not listed here follow, sorted
+MOVIE_ORDER = ["goblet_of_fire", "half_blood_prince", "prisoner_azkaban", "phoenix", "sorcerer_s_stone",
+               "deathly_hallows_part2", "chamber_of_secrets", "deathly_hallows_part1"]
+
+# ASCII-fold the texts (smart quotes, mojibake, PDF debris); off, the texts stay as the annotators saw them
+NORMALIZE_TEXT = False
+
 
+def manual_files():
+    # only the *_four_chars.tsv files (other characters); series other than
+    # Harry Potter keep theirs in a subfolder per series (see corpus_manifest.py)
+    paths = sorted([*MANUAL_DIR.glob("*_four_chars.tsv"), *MANUAL_DIR.glob("*/*_four_chars.tsv")])
+    rank = {f"{movie}_four_chars.tsv": i for i, movie in enumerate(MOVIE_ORDER)}
+    return sorted(paths, key=lambda p: (p.parent != MANUAL_DIR or p.name not in rank, rank.get(p.name, 0)))
 
-def collect_from_manual_dir():
-    rows = []
 
-    # only the *_four_chars.tsv files (other characters)
-    for tsv_path in MANUAL_DIR.glob("*_four_chars.tsv"):
+def collect_from_manual_dir(table):
+    for tsv_path in manual_files():
         movie_raw = tsv_path.stem              # e.g. "half_blood_prince_four_chars"
         movie_name = movie_raw.replace("_four_chars", "")  # "half_blood_prince"
+        # unlike the parse outputs these were saved from a spreadsheet, so they are quoted ("he ""loved"" you")
+        SpeechTable.read_csv(tsv_path, delimiter="\t", movie=movie_name, table=table, quoting=csv.QUOTE_MINIMAL)
 
-        with tsv_path.open("r", encoding="utf-8", errors="ignore") as f:
-            reader = csv.DictReader(f, delimiter="\t")
-            for row in reader:
-                rows.append({
-                    "movie": movie_name,
-                    "character": row.get("character", "").strip(),
-                    "speech_id": row.get("speech_id", "").strip(),
-                    "text": row.get("text", "").strip(),
-                })
-
-    return rows
-
-
-def collect_dumbledore():
-    rows = []
-    with DUMBLEDORE_CSV.open("r", encoding="utf-8", errors="ignore") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append({
-                "movie": row.get("movie", "").strip(),
-                "character": row.get("character", "").strip(),
-                "speech_id": row.get("speech_id", "").strip(),
-                "text": row.get("text", "").strip(),
-            })
-    return rows
+    return table
+
+
+def collect_dumbledore(table):
+    return SpeechTable.read_csv(DUMBLEDORE_CSV, table=table)
 
 
 def main():
-    all_rows = []
+    all_rows = SpeechTable()
 
     # 1) all other cleaned characters (from TSVs)
-    all_rows.extend(collect_from_manual_dir())
+    collect_from_manual_dir(all_rows)
 
     # 2) add Dumbledore (from CSV)
-    all_rows.extend(collect_dumbledore())
+    collect_dumbledore(all_rows)
+
+    # 3) smart quotes / mojibake / PDF debris -> ASCII, every movie
+    if NORMALIZE_TEXT:
+        all_rows.normalize_texts()
 
     # write final merged CSV
-    OUTPUT_CSV.parent.mkdir(parents=True, exist_ok=True)
-    with OUTPUT_CSV.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerows(all_rows)
+    all_rows.write_csv(OUTPUT_CSV)
 
     print(f"Wrote {len(all_rows)} rows to {OUTPUT_CSV}")
 
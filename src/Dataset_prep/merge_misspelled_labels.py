@@ -1,29 +1,37 @@
-import pandas as pd
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.annotation_store import AnnotationStore, MASTER
+
+# wrong spelling -> correct label
+LABEL_FIXES = {
+    "Infromative": "Informative",
+}
 
-INPUT = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
-OUTPUT = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
 
 def main():
     print("Loading dataset...")
-    df = pd.read_csv(INPUT, encoding="utf-8")
+    store = AnnotationStore()
 
     # Count before fixing
-    before = (df["annotation_label"] == "Infromative").sum()
-    print(f"Found {before} occurrences of 'Infromative'")
+    for wrong in LABEL_FIXES:
+        before = sum(row["annotation_label"] == wrong for row in store.rows())
+        print(f"Found {before} occurrences of '{wrong}'")
 
-    # Replace incorrect spelling
-    df["annotation_label"] = df["annotation_label"].replace({
-        "Infromative": "Informative"
-    })
+    # Replace incorrect spelling (only the changed rows are logged)
+    for row in store.rows():
+        label = row["annotation_label"]
+        if label in LABEL_FIXES:
+            store.set(row, "annotation_label", LABEL_FIXES[label])
 
     # Count after fixing
-    after = (df["annotation_label"] == "Infromative").sum()
+    after = sum(row["annotation_label"] in LABEL_FIXES for row in store.rows())
     print(f"After correction: {after} remaining")
 
-    # Save cleaned file (overwrite)
-    df.to_csv(OUTPUT, index=False, encoding="utf-8")
-    print("\n✅ Saved corrected dataset to:")
-    print("   ", OUTPUT)
+    changed = store.commit("merge misspelled labels")
+    print(f"\n✅ Logged {changed} label fixes for:")
+    print("   ", MASTER)
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,58 @@
+from collections import Counter
 from pathlib import Path
+import json
 import re
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import canonical_id, character_id, get_resolver, strip_cue_extension
+from Dataset_prep.corpus_manifest import load_movies
+from Dataset_prep.sentences import encode_starts, sentence_spans
+from Dataset_prep.tokenization import get_tokenizer, save_cache
 
 # configurations
-MOVIE_FILE = Path("data/processed/harry-potter-and-the-sorcerers-stone-2001.txt")
-OUTPUT_ALL = Path("data/processed/sorcerers_stone_speeches.tsv")
-OUTPUT_FOUR = Path("data/processed/sorcerers_stone_four_chars.tsv")
+SCRIPTS_DIR = Path("data/processed/scripts_in_text")
+OUTPUT_ALL_DIR = Path("data/processed/processed_speeches/processed_speeches_all_chars")
+OUTPUT_FOUR_DIR = Path("data/processed/processed_speeches/prcoessed_speeches_four_chars")
+QUALITY_DIR = Path("data/processed/processed_speeches/parse_quality")
+# character_id / scene_id / sentence_starts of every speech, next to (not in) the TSVs: the TSVs stay
+# character / speech_id / text, as checked in and as the cleaned files were edited from
+META_DIR = Path("data/processed/processed_speeches/speech_meta")
+
+# movie -> Movie(series, movie, script, shard, all stem, four stem), from the corpus manifest
+# (the Harry Potter films unless data/corpus_manifest.json lists more)
+MOVIES = load_movies()
+# the labelled data is keyed on speech_id as parsed with RESOLVE_CUES off: turning it on renumbers the corpus
+# off: cues are taken as written and the four-characters file keeps exactly CHARACTERS_OF_INTEREST
+# on: cue extensions like (V.O.) / (CONT'D) are accepted and stripped, and the four-characters file is
+#     selected by canonical id (cue variants and OCR typos like VOLDEMONT)
+RESOLVE_CUES = False
 CHARACTERS_OF_INTEREST = {"RON", "HERMIONE", "VOLDEMORT", "SNAPE", "VOLDEMONT"}
+CHARACTER_IDS_OF_INTEREST = {canonical_id(name) for name in ("RON", "HERMIONE", "VOLDEMORT", "SNAPE")}
 FIRST_SECOND_PRONOUNS = {"i", "im", "ive", "id", "we", "were", "you", "youre", "youll", "youve", "us", "my", "our"}
 THIRD_PRONOUNS = {"he", "she", "they", "him", "her", "them", "his", "hers", "their", "theirs"}
 SCENE_HEADER_RE = re.compile(r'^\d+\s+(INT\.|EXT\.)\b')
+# start of a new scene for scene_id: numbered or not (goblet of fire has no scene numbers)
+SCENE_START_RE = re.compile(r'^(?:\d+[A-Z]?\s+)?(?:INT|EXT)[./]')
+# the heuristics of action_rule(), in the order they are tried
+ACTION_RULES = ("scene_heading", "continued", "parenthetical", "speaker_verb", "other_character",
+                "long_narrative", "third_person")
+# words of camera / editing directions that sometimes end up looking like a cue
+SCREEN_WORDS = {"ANGLE", "CLOSE", "CLOSEUP", "SHOT", "SHOTS", "VIEW", "POV", "CUT", "FADE", "DISSOLVE", "TITLE",
+                "CREDITS", "END", "SUPER", "INSERT", "MONTAGE", "LATER", "CONTINUOUS", "MORE", "SERIES",
+                "FLASHBACK", "INTERCUT", "WIDE", "REVERSE", "BACK"}
+
 
 
+def cue_name(line: str) -> str:
+    # extensions like (V.O.) / (CONT'D) don't change who is speaking (only with RESOLVE_CUES)
+    line = line.strip()
+    return strip_cue_extension(line) if RESOLVE_CUES else line
+
 
 def is_character_cue(line: str) -> bool:
     # a character cue line is mostly uppercase letters/spaces, short-ish, and not clearly a header or comment.
-    line = line.strip()
+    line = cue_name(line)
 
     if not line:
         return False
@@ -58,7 +96,7 @@ def build_canonical_names(lines):
     # form all lines, collect character cues and simple title case variant for use in action line
     names = set()
     for raw in lines:
-        line = raw.strip()
+        line = cue_name(raw)
         if is_character_cue(line):
             names.add(line) # full cue NARCISSA MALFOY
             first = line.split()[0]
@@ -68,12 +106,13 @@ def build_canonical_names(lines):
 
 # if there is pronouns or indications that this is spoken at the first or second person likely not stage directions
 def has_first_or_second_person(line:str) -> bool:
-    words = re.findall(r"[A-Za-z']+", line.lower())
+    # uncached: raw script lines are seen once, caching them only grows token_cache.pkl
+    words = get_tokenizer("words").tokenize(line.lower())
     return any(w in FIRST_SECOND_PRONOUNS for w in words)
 
 #if there are third pronouns without first or second pronouns probably indicate that this is stage instructions
 def has_third_person_only(line:str) -> bool:
-    words = re.findall(r"[A-Za-z']+", line.lower())
+    words = get_tokenizer("words").tokenize(line.lower())
     if not words:
         return False
     has_third = any(w in THIRD_PRONOUNS for w in words)
@@ -84,30 +123,31 @@ def looks_like_new_cue(line: str) -> bool:
     # we reuse character cue logic for non-current speakers
     return is_character_cue(line)
 
-def is_action_line(line: str, current_speaker: str, canonical_names: set) -> bool:
+def action_rule(line: str, current_speaker: str, canonical_names: set):
+    # name of the heuristic that makes this an action line (one of ACTION_RULES), None for dialogue
 
     line = line.strip()
     if not line:
-        return False
+        return None
     
     #if there is int or ext in the line
     if "INT." in line or "EXT." in line:
-        return True
+        return "scene_heading"
     #scene headers and contined markers
     if SCENE_HEADER_RE.match(line):
-        return True
+        return "scene_heading"
     if line.startswith(("INT.", "EXT.")):
-        return True
+        return "scene_heading"
     if "CONTINUED" in line and any(ch.isdigit()for ch in line):
-        return True
+        return "continued"
 
     #stage directions in parentheses
     if line.startswith("("):
-        return True
+        return "parenthetical"
     
     tokens = line.split()
     if not tokens:
-        return False
+        return None
     
     first = tokens[0]
     first_upper = first.upper()
@@ -118,7 +158,7 @@ def is_action_line(line: str, current_speaker: str, canonical_names: set) -> boo
         if len(tokens) >=2:
             second = tokens[1]
             if second and second[0].islower():
-                return True
+                return "speaker_verb"
     
     #if there is a name other than speaker and there is no comma after it probably stage directions
     if (first in canonical_names or first_upper in canonical_names) and (current_speaker is None or first_upper != current_speaker):
@@ -126,26 +166,55 @@ def is_action_line(line: str, current_speaker: str, canonical_names: set) -> boo
             second = tokens[1]
             if second != ",":
                 #example bill doesnt smile, or bellatrix walks away ...
-                return True
+                return "other_character"
     #long narratives, mentions a character but no I/you 
     if len(tokens) >15 and not has_first_or_second_person(line):
         if any(name in line for name in canonical_names):
-            return True
+            return "long_narrative"
     # third person narrative, third person pronouns without any first or second pronouns, so no I YOU US, OUR ...
     if has_third_person_only(line):
-        return True
+        return "third_person"
 
     #if it has I/You bias toward speech
     if has_first_or_second_person(line):
-        return False
+        return None
     
     #default we treat as speech we might cleanup later
-    return False
+    return None
+
+def is_action_line(line: str, current_speaker: str, canonical_names: set) -> bool:
+    return action_rule(line, current_speaker, canonical_names) is not None
+
+
+def suspicious_cues(cues: Counter, spoken: Counter):
+    # [cue, times used as a cue, reason] for speaker names that look like a misparse
+    suspicious = []
+    for cue, count in sorted(cues.items()):
+        words = cue.replace(".", " ").split()
+        if any(w in SCREEN_WORDS for w in words):
+            reason = "screen direction"
+        elif SCENE_START_RE.match(cue):
+            reason = "scene heading"
+        elif sum(len(w) for w in words) <= 2:
+            reason = "too short"
+        elif cue.endswith(".") and not character_id(cue):
+            reason = "end of an action sentence"
+        elif not spoken[cue]:
+            reason = "never speaks"
+        elif count == 1 and not character_id(cue):
+            reason = "unknown, used once"
+        else:
+            continue
+        suspicious.append([cue, count, reason])
+    return suspicious
 
 
-def parse_script(path: Path):
+def parse_script(path: Path, metrics=None):
     #parse a single script text file into speech acts
     # each speech act is one character + merged dialogue lines.
+    # character_id is the canonical id of the cue (0 if not a known character), resolved once per cue
+    # scene_id counts INT./EXT. headers (0 = before the first one)
+    # if a dict is given as metrics, the parse quality counts of this pass are put in it (see quality_metrics)
 
     text = path.read_text(encoding="utf-8", errors="ignore")
     lines = [l.strip("\n") for l in text.splitlines()]
@@ -156,10 +225,22 @@ def parse_script(path: Path):
     current_speaker = None
     current_buffer = []
     speech_id = 0
+    scene_id = 0
+    speech_scene = 0  # scene of the cue the buffer belongs to
     in_action_block = False
 
+    # parse quality counts, non-blank lines only
+    cues = Counter()
+    rules = Counter()
+    n_lines = dialogue_lines = skipped_lines = 0
+
     for raw_line in lines:
         line = raw_line.strip()
+        n_lines += bool(line)
+
+        # scene headers only move the counter; the line itself is handled as before
+        if SCENE_START_RE.match(line):
+            scene_id += 1
 
         #New character cue line
         if is_character_cue(line):
@@ -169,12 +250,16 @@ def parse_script(path: Path):
                 speech_id +=1
                 speeches.append({
                     "character": current_speaker,
+                    "character_id": character_id(current_speaker),
                     "speech_id": speech_id,
-                    "text": " ".join(current_buffer).strip()
+                    "text": " ".join(current_buffer).strip(),
+                    "scene_id": speech_scene,
                 })
                 current_buffer = []
 
-            current_speaker = line # eg "HERMIONE", "RON", "VOLDEMORT"
+            current_speaker = cue_name(line) # eg "HERMIONE", "RON", "VOLDEMORT"
+            speech_scene = scene_id
+            cues[current_speaker] += 1
             continue 
         
         # if we dont have a speaker yet, ignore
@@ -183,16 +268,21 @@ def parse_script(path: Path):
         
         #if we in an action block we skip until the next cue
         if in_action_block:
+            skipped_lines += bool(line)
             continue
 
         #end of speech if action line
-        if is_action_line(line,current_speaker, canonical_names):
+        rule = action_rule(line, current_speaker, canonical_names)
+        if rule is not None:
+            rules[rule] += 1
             if current_buffer:
                 speech_id += 1
                 speeches.append({
                     "character": current_speaker,
+                    "character_id": character_id(current_speaker),
                     "speech_id": speech_id,
-                    "text": " ".join(current_buffer).strip()
+                    "text": " ".join(current_buffer).strip(),
+                    "scene_id": speech_scene,
                 })
                 current_buffer = []
             in_action_block = True
@@ -200,47 +290,148 @@ def parse_script(path: Path):
   
         #otherwise we treat as dialogue: append to current buffer
         current_buffer.append(line)
+        dialogue_lines += bool(line)
 
     # we flush the last speech
     if current_speaker and current_buffer:
         speech_id +=1
         speeches.append({
             "character": current_speaker,
+            "character_id": character_id(current_speaker),
             "speech_id": speech_id,
-            "text": " ".join(current_buffer).strip()
+            "text": " ".join(current_buffer).strip(),
+            "scene_id": speech_scene,
         })
-    
+
+    if metrics is not None:
+        metrics.update(quality_metrics(n_lines, cues, rules, dialogue_lines, skipped_lines, speeches))
     return speeches
 
+
+def quality_metrics(n_lines, cues, rules, dialogue_lines, skipped_lines, speeches):
+    # a cue starts at most one speech, so cues - speeches is the number of cues with no dialogue after them
+    # action shares are over the lines that were classified (dialogue or action), not the skipped ones
+    classified = dialogue_lines + sum(rules.values())
+    return {
+        "lines": n_lines,
+        "cues": sum(cues.values()),
+        "speakers": len(cues),
+        "cue_density": round(sum(cues.values()) / max(n_lines, 1), 4),
+        "speeches": len(speeches),
+        "empty_cues": sum(cues.values()) - len(speeches),
+        "dialogue_lines": dialogue_lines,
+        "action_lines": {rule: rules[rule] for rule in ACTION_RULES},
+        "action_share": {rule: round(rules[rule] / max(classified, 1), 4) for rule in ACTION_RULES},
+        "skipped_lines": skipped_lines,
+        "suspicious_cues": suspicious_cues(cues, Counter(s["character"] for s in speeches)),
+    }
+
+def line_ending(path: Path) -> str:
+    # line ending of the file about to be replaced: some checked-in TSVs were saved on Windows (\r\n)
+    try:
+        with path.open("rb") as f:
+            return "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+    except FileNotFoundError:
+        return "\n"
+
+
 def write_tsv(path: Path, rows):
-    with path.open("w", encoding="utf-8") as f:
+    with path.open("w", encoding="utf-8", newline=line_ending(path)) as f:
         f.write("character\tspeech_id\ttext\n")
         for r in rows:
             text = r["text"].replace("\t", " ").replace("\n", " ")
             f.write(f"{r['character']}\t{r['speech_id']}\t{text}\n")
 
 
-def main():
-    print(f"Parsing: {MOVIE_FILE}")
-    speeches = parse_script(MOVIE_FILE)
+def write_meta(path: Path, rows):
+    # one row per speech of the all-characters TSV, joined on speech_id (see corpus.py)
+    # sentence_starts: where each sentence of the text starts (see sentences.py), so nothing downstream re-segments
+    with path.open("w", encoding="utf-8") as f:
+        f.write("speech_id\tcharacter_id\tscene_id\tsentence_starts\n")
+        for r in rows:
+            text = r["text"].replace("\t", " ").replace("\n", " ")
+            starts = encode_starts(sentence_spans(text))
+            f.write(f"{r['speech_id']}\t{r['character_id']}\t{r['scene_id']}\t{starts}\n")
+
+
+def four_characters(speeches):
+    # the speeches that go in the four-characters file
+    if RESOLVE_CUES:
+        return [s for s in speeches if s["character_id"] in CHARACTER_IDS_OF_INTEREST]
+    return [s for s in speeches if s["character"] in CHARACTERS_OF_INTEREST]
+
+
+def movie_paths(movie):
+    # (script, all-characters TSV, four-characters TSV) for a movie in MOVIES; outputs are sharded per series
+    m = MOVIES[movie]
+    return (SCRIPTS_DIR / m.script, OUTPUT_ALL_DIR / m.shard / f"{m.all_stem}.tsv",
+            OUTPUT_FOUR_DIR / m.shard / f"{m.four_stem}.tsv")
+
+
+def quality_path(movie):
+    # parse quality metrics of a movie, next to the other per-series shards
+    m = MOVIES[movie]
+    return QUALITY_DIR / m.shard / f"{m.movie}.json"
+
+
+def meta_path(movie):
+    # speech metadata of a movie, sharded like the TSVs
+    m = MOVIES[movie]
+    return META_DIR / m.shard / f"{m.movie}.tsv"
+
+
+def parse_movie(movie_file: Path, output_all: Path, output_four: Path, output_quality: Path = None,
+                output_meta: Path = None, verbose=False):
+    print(f"Parsing: {movie_file}")
+    metrics = {}
+    speeches = parse_script(Path(movie_file), metrics)
     print(f"Total speech acts found: {len(speeches)}")
+    print(f"Cue density: {metrics['cue_density']:.3f} cues per line, {metrics['empty_cues']} cues without dialogue, "
+          f"{len(metrics['suspicious_cues'])} suspicious speaker names")
+
+    if output_quality:
+        Path(output_quality).parent.mkdir(parents=True, exist_ok=True)
+        with Path(output_quality).open("w", encoding="utf-8") as f:
+            json.dump({"script": str(movie_file), **metrics}, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        print(f"Saved parse quality metrics → {output_quality}")
 
     # Save ALL speeches (all characters)
-    write_tsv(OUTPUT_ALL, speeches)
-    print(f"Saved ALL speeches → {OUTPUT_ALL}")
+    Path(output_all).parent.mkdir(parents=True, exist_ok=True)
+    write_tsv(Path(output_all), speeches)
+    print(f"Saved ALL speeches → {output_all}")
+
+    if output_meta:
+        Path(output_meta).parent.mkdir(parents=True, exist_ok=True)
+        write_meta(Path(output_meta), speeches)
+        print(f"Saved speech metadata → {output_meta}")
 
     # Show which character names we actually found (for debugging)
-    unique_chars = sorted({s["character"] for s in speeches})
-    print("Characters detected:")
-    for name in unique_chars:
-        print("  ", name)
+    if verbose:
+        unique_chars = sorted({s["character"] for s in speeches})
+        print("Characters detected:")
+        for name in unique_chars:
+            print("  ", name)
 
     # Filter to your 4 characters of interest
-    filtered = [s for s in speeches if s["character"] in CHARACTERS_OF_INTEREST]
-    print(f"Speech acts for target characters ({CHARACTERS_OF_INTEREST}): {len(filtered)}")
+    filtered = four_characters(speeches)
+    if RESOLVE_CUES:
+        target_names = sorted(get_resolver().canonical_name(cid) for cid in CHARACTER_IDS_OF_INTEREST)
+    else:
+        target_names = sorted(CHARACTERS_OF_INTEREST)
+    print(f"Speech acts for target characters ({target_names}): {len(filtered)}")
+
+    Path(output_four).parent.mkdir(parents=True, exist_ok=True)
+    write_tsv(Path(output_four), filtered)
+    print(f"Saved target characters' speeches → {output_four}")
+    save_cache()
+    return speeches
 
-    write_tsv(OUTPUT_FOUR, filtered)
-    print(f"Saved target characters' speeches → {OUTPUT_FOUR}")
+
+def main():
+    for movie in MOVIES:
+        parse_movie(*movie_paths(movie), quality_path(movie), meta_path(movie))
+        print()
 
 
 if __name__ == "__main__":
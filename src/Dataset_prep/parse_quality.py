@@ -0,0 +1,211 @@
+"""
+How well parse_dialogue.py tells speech from action, script by script.
+
+parse_movie() already writes the metrics of each parse, counted in the same
+pass, to parse_dialogue.QUALITY_DIR/<series>/<movie>.json:
+
+- cue density: character cues per non-blank line
+- cues with no dialogue after them, and speaker names that look like a
+  misparse (screen directions, scene headings, the end of an action line)
+- the share of the classified lines each action rule took (ACTION_RULES)
+
+This script puts them in one table and checks the parse against the
+hand-cleaned files: each movie's four-characters TSV is aligned with its
+manually-clean counterpart (difflib over (character, text); the speech ids
+of the cleaned files come from an older parse, so they can't be used), and
+every row pair is one of
+
+- same       unchanged by hand
+- trimmed    the cleaned text is part of the parsed one (action glued onto the speech)
+- edited     the same speech, otherwise changed
+- character  the same text, another speaker
+- dropped    parsed as speech, removed by hand (action or noise read as dialogue)
+- missing    kept by hand, not in the parse (dialogue read as action, or a missed cue)
+
+    python src/Dataset_prep/parse_quality.py             # the parse outputs on disk → QUALITY_OUT, DIFF_OUT, CUES_OUT
+    python src/Dataset_prep/parse_quality.py --reparse   # parse every script again in memory, print only
+                                                         # (to try a change to the heuristics without rebuilding)
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+import csv
+import json
+import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.parse_dialogue import (
+    ACTION_RULES, MOVIES, four_characters, movie_paths, parse_script, quality_path,
+)
+from Dataset_prep.text_normalization import match_text
+
+SPEECHES = Path("data/processed/processed_speeches")
+MANUAL_DIR = SPEECHES / "manually-clean"
+QUALITY_OUT = SPEECHES / "parse_quality.csv"
+DIFF_OUT = SPEECHES / "parse_manual_diff.csv"
+CUES_OUT = SPEECHES / "parse_suspicious_cues.csv"
+
+KINDS = ("same", "trimmed", "edited", "character", "dropped", "missing")
+SIMILAR = 0.6  # difflib ratio above which two texts are the same speech, edited
+
+
+def manual_path(movie):
+    m = MOVIES[movie]
+    return MANUAL_DIR / m.shard / f"{m.four_stem}.tsv"
+
+
+def read_tsv(path, quoted=False):
+    with Path(path).open("r", encoding="utf-8", errors="ignore") as f:
+        # parse_dialogue writes texts unquoted; the cleaned files went through a spreadsheet and are quoted
+        return list(csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_MINIMAL if quoted else csv.QUOTE_NONE))
+
+
+def _same_speech(parsed, manual):
+    return bool(manual) and (manual in parsed or parsed in manual or SequenceMatcher(None, parsed, manual).ratio() >= SIMILAR)
+
+
+def _kind(parsed, manual):
+    # parsed / manual are (character, normalized text) and the same speech
+    if parsed[1] == manual[1]:
+        return "character"
+    if manual[1] in parsed[1]:
+        return "trimmed"
+    return "edited"
+
+
+def align(parsed, manual):
+    """[(kind, parsed row or None, manual row or None), ...] in script order."""
+    # match_text: ASCII quotes / apostrophes (the cleaned files have mojibake), no wrapping quotes
+    a = [((r.get("character") or "").strip(), match_text(r.get("text"))) for r in parsed]
+    b = [((r.get("character") or "").strip(), match_text(r.get("text"))) for r in manual]
+    pairs = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            pairs += [("same", parsed[i], manual[j]) for i, j in zip(range(i1, i2), range(j1, j2))]
+            continue
+        # inside a changed block, pair every cleaned row with the next parsed row of the same speech
+        i = i1
+        for j in range(j1, j2):
+            k = next((k for k in range(i, i2) if _same_speech(a[k][1], b[j][1])), None)
+            if k is None:
+                pairs.append(("missing", None, manual[j]))
+                continue
+            pairs += [("dropped", parsed[x], None) for x in range(i, k)]
+            pairs.append((_kind(a[k], b[j]), parsed[k], manual[j]))
+            i = k + 1
+        pairs += [("dropped", parsed[x], None) for x in range(i, i2)]
+    return pairs
+
+
+def check_movie(movie, reparse=False):
+    """(metrics of the parse, aligned rows against the cleaned file or None if there is none)."""
+    script, _, out_four = movie_paths(movie)
+    if not reparse and not quality_path(movie).exists():
+        # the outputs on disk were written before parse_movie() saved metrics (or never)
+        print(f"{movie}: no {quality_path(movie)}, run parse_dialogue.py first; parsing {script.name} again for now")
+        reparse = True
+    if reparse:
+        metrics = {}
+        parsed = four_characters(parse_script(script, metrics))
+    else:
+        with quality_path(movie).open("r", encoding="utf-8") as f:
+            metrics = json.load(f)
+        parsed = read_tsv(out_four)
+
+    manual = manual_path(movie)
+    pairs = align(parsed, read_tsv(manual, quoted=True)) if manual.exists() else None
+    return metrics, pairs
+
+
+def _check_reparsed(movie):
+    return check_movie(movie, reparse=True)
+
+
+def summary_row(movie, metrics, pairs):
+    row = {
+        "series": MOVIES[movie].series,
+        "movie": movie,
+        **{key: metrics[key] for key in ("lines", "cues", "speakers", "cue_density", "speeches",
+                                         "empty_cues", "dialogue_lines", "skipped_lines")},
+        **{f"action_{rule}": metrics["action_share"][rule] for rule in ACTION_RULES},
+        "suspicious_cues": len(metrics["suspicious_cues"]),
+    }
+    if pairs is not None:
+        kinds = Counter(kind for kind, _, _ in pairs)
+        n_parsed = sum(1 for _, p, _ in pairs if p is not None)
+        n_manual = sum(1 for _, _, m in pairs if m is not None)
+        matched = n_manual - kinds["missing"]
+        row.update({
+            "parsed_rows": n_parsed,
+            "manual_rows": n_manual,
+            **{kind: kinds[kind] for kind in KINDS},
+            # share of parsed rows kept by hand / of hand-cleaned rows the parse found
+            "precision": round(matched / max(n_parsed, 1), 4),
+            "recall": round(matched / max(n_manual, 1), 4),
+        })
+    return row
+
+
+def print_report(rows):
+    print(f"{'movie':<24} {'cues/line':>9} {'empty':>6} {'susp':>5}  "
+          + " ".join(f"{rule[:10]:>10}" for rule in ACTION_RULES)
+          + f"  {'prec':>5} {'recall':>6}  " + " ".join(f"{kind:>9}" for kind in KINDS[1:]))
+    for row in rows:
+        line = (f"{row['movie']:<24} {row['cue_density']:>9.3f} {row['empty_cues']:>6} {row['suspicious_cues']:>5}  "
+                + " ".join(f"{row[f'action_{rule}']:>10.3f}" for rule in ACTION_RULES))
+        if "precision" in row:
+            line += f"  {row['precision']:>5.3f} {row['recall']:>6.3f}  " + " ".join(f"{row[k]:>9}" for k in KINDS[1:])
+        print(line)
+
+
+def write_outputs(rows, diffs, cues):
+    fields = list(dict.fromkeys(key for row in rows for key in row))
+    QUALITY_OUT.parent.mkdir(parents=True, exist_ok=True)
+    with QUALITY_OUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.DictWriter(f_out, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    with DIFF_OUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(["movie", "kind", "parsed_speech_id", "parsed_character", "parsed_text",
+                         "manual_speech_id", "manual_character", "manual_text"])
+        for movie, kind, p, m in diffs:
+            p, m = p or {}, m or {}
+            writer.writerow([movie, kind, p.get("speech_id", ""), p.get("character", ""), p.get("text", ""),
+                             m.get("speech_id", ""), m.get("character", ""), m.get("text", "")])
+
+    with CUES_OUT.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(["movie", "cue", "count", "reason"])
+        writer.writerows(cues)
+
+    print(f"Saved → {QUALITY_OUT}, {DIFF_OUT} ({len(diffs)} differences), {CUES_OUT} ({len(cues)} cues)")
+
+
+def main():
+    reparse = "--reparse" in sys.argv[1:]
+    if reparse:
+        # one worker per script, the parse is the expensive part
+        with ProcessPoolExecutor(max_workers=min(len(MOVIES), os.cpu_count() or 1)) as pool:
+            results = list(pool.map(_check_reparsed, MOVIES))
+    else:
+        results = [check_movie(movie) for movie in MOVIES]
+
+    rows, diffs, cues = [], [], []
+    for movie, (metrics, pairs) in zip(MOVIES, results):
+        rows.append(summary_row(movie, metrics, pairs))
+        diffs += [(movie, kind, p, m) for kind, p, m in (pairs or []) if kind != "same"]
+        cues += [[movie, *cue] for cue in metrics["suspicious_cues"]]
+
+    print_report(rows)
+    reasons = Counter(reason for *_, reason in cues)
+    print(f"\nSuspicious speaker names: {', '.join(f'{n} {reason}' for reason, n in reasons.most_common())}")
+    if not reparse:
+        write_outputs(rows, diffs, cues)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,26 @@
-import pandas as pd
+from pathlib import Path
+import sys
 
-INPUT = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
-OUTPUT = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
-
-def strip_non_ascii(s: str) -> str:
-    if not isinstance(s, str):
-        s = str(s)
-    # keep ONLY ASCII characters
-    return "".join(ch for ch in s if ord(ch) < 128)
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.annotation_store import AnnotationStore, MASTER
+from Dataset_prep.text_normalization import normalize_texts
 
 def main():
     print("Loading annotation dataset...")
-    df = pd.read_csv(INPUT, encoding="latin1")
-
-    # Clean RON *and* DUMBLEDORE for Half-Blood Prince
-    mask = (
-        (df["movie"] == "half_blood_prince") &
-        (df["character"].isin(["RON", "DUMBLEDORE"]))
-    )
+    store = AnnotationStore()
+    rows = store.rows()
 
-    print(f"Rows to clean (RON + DUMBLEDORE in HBP): {mask.sum()}")
+    # every movie and character: smart quotes, mojibake ("â€™") and PDF debris
+    # become their ASCII form instead of being deleted
+    print(f"Rows to normalize: {len(rows)}")
+    cleaned = normalize_texts(row["text"] for row in rows)
 
-    # Clean only those rows
-    df.loc[mask, "text"] = df.loc[mask, "text"].apply(strip_non_ascii)
+    for row, text in zip(rows, cleaned):
+        store.set(row, "text", text)
 
-    # Save
-    df.to_csv(OUTPUT, index=False, encoding="utf-8")
-    print("\n✅ Saved cleaned dataset to:")
-    print("   ", OUTPUT)
+    changed = store.commit("normalize text to ASCII")
+    print(f"\n✅ Logged {changed} cleaned texts for:")
+    print("   ", MASTER)
     print("Done.")
 
 if __name__ == "__main__":
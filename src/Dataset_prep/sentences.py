@@ -0,0 +1,110 @@
+"""
+Rule-based sentence segmentation of speech texts.
+
+A speech act is all the dialogue lines of one cue joined together, so it
+can hold several sentences. A sentence ends at . ! or ? (plus closing
+quotes / brackets) followed by whitespace and an upper-case letter, a
+digit or an opening quote, except after
+
+- a known abbreviation: "Mr. Weasley", "Prof. McGonagall", "St. Mungo's"
+- a single capital initial: "J. K. Rowling" (not "I.")
+- an ellipsis: "I... I don't know" is one hesitant sentence
+
+Everything is precompiled: one regex finds the candidate boundaries, one
+regex (anchored at the candidate) tells abbreviations apart, so a text is
+segmented in one pass over it.
+
+Sentences are stored as the start offsets of each sentence in the text
+("0,14,37"). parse_dialogue.py writes them as the sentence_starts column
+of the speech metadata (see corpus.py), so later stages get the sentences of a parsed speech with
+spans_from_starts() instead of segmenting again.
+
+    python src/Dataset_prep/sentences.py            # segmentation stats over the parsed corpus
+    python src/Dataset_prep/sentences.py "Text."    # segment one text
+"""
+from pathlib import Path
+import csv
+import re
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+
+ABBREVIATIONS = [
+    "mr", "mrs", "ms", "mme", "dr", "prof", "st", "mt", "jr", "sr", "vs", "etc",
+    "lt", "col", "capt", "sgt", "gen", "gov", "rev", "hon", "fr",
+    "inc", "ltd", "co", "dept", "approx", "ave", "rd", "e.g", "i.e",
+]
+
+# terminator run, closing quotes / brackets, then whitespace before something that can start a sentence
+BOUNDARY_RE = re.compile(r"""([.!?…]+)["'’”)\]]*(?=\s+["'‘“(\[]?[A-Z0-9])""")
+# the word before a "." that doesn't end a sentence: an abbreviation or a capital initial
+NO_BREAK_RE = re.compile(
+    r"(?:\b(?:%s)|(?<![\w.])[A-HJ-Z])\.\Z" % "|".join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)),
+    re.IGNORECASE,
+)
+SPACE_RE = re.compile(r"\s*")
+
+
+def sentence_spans(text):
+    """[(start, end), ...] of the sentences of text, whitespace between them left out."""
+    spans = []
+    start = SPACE_RE.match(text).end()
+    for m in BOUNDARY_RE.finditer(text, start):
+        stop = m.group(1)
+        if ".." in stop or "…" in stop:
+            continue  # ellipsis: a pause, not an end
+        # the abbreviation test only looks at the few characters before the dot
+        if stop == "." and NO_BREAK_RE.search(text, max(start, m.start(1) - 8), m.end(1)):
+            continue
+        spans.append((start, m.end()))
+        start = SPACE_RE.match(text, m.end()).end()
+    end = len(text.rstrip())
+    if start < end:
+        spans.append((start, end))
+    return spans
+
+
+def split_sentences(text):
+    return [text[s:e] for s, e in sentence_spans(text)]
+
+
+def encode_starts(spans):
+    """Start offsets as stored in the sentence_starts column."""
+    return ",".join(str(s) for s, _ in spans)
+
+
+def spans_from_starts(text, starts):
+    """Spans back from a sentence_starts value; an empty / missing value segments the text."""
+    if not starts:
+        return sentence_spans(text)
+    offsets = [int(s) for s in starts.split(",")]
+    ends = offsets[1:] + [len(text)]
+    return [(s, s + len(text[s:e].rstrip())) for s, e in zip(offsets, ends)]
+
+
+def main():
+    args = sys.argv[1:]
+    if args:
+        for k, sentence in enumerate(split_sentences(" ".join(args)), start=1):
+            print(f"{k:3d}  {sentence}")
+        return
+
+    from Dataset_prep.parse_dialogue import MOVIES, movie_paths
+
+    texts = []
+    for movie in MOVIES:
+        _, all_chars_tsv, _ = movie_paths(movie)
+        with Path(all_chars_tsv).open("r", encoding="utf-8", errors="ignore") as f:
+            texts += [row.get("text") or "" for row in csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE)]
+
+    start = time.perf_counter()
+    counts = [len(sentence_spans(t)) for t in texts]
+    elapsed = time.perf_counter() - start
+    multi = sum(1 for c in counts if c > 1)
+    print(f"{len(texts)} speeches, {sum(counts)} sentences in {elapsed * 1000:.0f} ms; "
+          f"{multi} speeches ({100 * multi / max(len(texts), 1):.1f}%) have more than one sentence")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+from pathlib import Path
+from array import array
+import csv
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_aliases import get_resolver
+
+FIELDNAMES = ["movie", "character", "speech_id", "text"]
+MISSING_ID = -1  # speech_id was empty in the source file
+
+
+class SpeechRow:
+    """
+    Lightweight view of one row of a SpeechTable.
+    Supports row["movie"] style access so it can be used where the old
+    four-key dicts were used, without copying anything.
+    """
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def movie(self):
+        return self.table.movie_names[self.table.movie_codes[self.index]]
+
+    @property
+    def character(self):
+        return self.table.character_names[self.table.character_codes[self.index]]
+
+    @property
+    def character_id(self):
+        return self.table.character_name_ids[self.table.character_codes[self.index]]
+
+    @property
+    def speech_id(self):
+        # MISSING_ID for an empty or non-numeric id; row["speech_id"] has the raw string
+        return self.table.speech_ids[self.index]
+
+    @property
+    def text(self):
+        return self.table.text_at(self.index)
+
+    def __getitem__(self, key):
+        if key == "speech_id":
+            # same string form as the CSV, so writers produce identical files
+            sid = self.speech_id
+            if sid == MISSING_ID:
+                return self.table.raw_speech_ids.get(self.index, "")
+            return str(sid)
+        if key in ("movie", "character", "text"):
+            return getattr(self, key)
+        if key in self.table.extra:
+            return self.table.extra[key][self.index]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self, fieldnames=FIELDNAMES):
+        return {name: self[name] for name in fieldnames}
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, SpeechRow)
+            and self.table is other.table
+            and self.index == other.index
+        )
+
+    def __hash__(self):
+        return hash((id(self.table), self.index))
+
+    def __repr__(self):
+        return f"SpeechRow({self.to_dict()!r})"
+
+
+class SpeechTable:
+    """
+    Column store for speeches (movie, character, speech_id, text).
+
+    - movie / character are interned: each row stores a small integer code
+    - each distinct character name is resolved to a canonical character id
+      once, when it is interned (see character_aliases.py)
+    - speech_id is stored as an integer; the few ids int() doesn't round-trip
+      ("12a", "-3", "007") keep their string in raw_speech_ids {row index: id}
+    - all texts live in one utf-8 buffer, row i is buffer[offsets[i]:offsets[i+1]]
+
+    A row costs ~20 bytes plus its text instead of a dict with four string
+    objects (~500 bytes for a typical line).
+
+    Columns of a CSV beyond the four (duplicate_of from dedup's flag mode,
+    ...) are kept as plain string lists in extra, carried by take() and
+    extend() and written back by write_csv().
+    """
+
+    def __init__(self):
+        self.movie_names = []
+        self.character_names = []
+        self.character_name_ids = []  # canonical id per interned character name
+        self._movie_lookup = {}
+        self._character_lookup = {}
+
+        self.movie_codes = array("I")
+        self.character_codes = array("I")
+        self.speech_ids = array("q")
+        self.offsets = array("Q", [0])
+        self.buffer = bytearray()
+        self.extra = {}  # column name -> [str per row]
+        self.raw_speech_ids = {}  # row index -> non-numeric speech_id, as read
+
+    # ---------- building ----------
+
+    def _intern(self, value, names, lookup):
+        code = lookup.get(value)
+        if code is None:
+            code = len(names)
+            names.append(value)
+            lookup[value] = code
+        return code
+
+    def movie_code(self, movie):
+        return self._intern(movie, self.movie_names, self._movie_lookup)
+
+    def character_code(self, character):
+        code = self._intern(character, self.character_names, self._character_lookup)
+        if code == len(self.character_name_ids):
+            self.character_name_ids.append(get_resolver().resolve(character))
+        return code
+
+    def _append_extra(self, values):
+        # a column first seen now is "" for the rows before
+        for name in values:
+            if name not in self.extra:
+                self.extra[name] = [""] * len(self)
+        for name, column in self.extra.items():
+            column.append(values.get(name) or "")
+
+    def append(self, movie, character, speech_id, text, extra=None):
+        self._append_extra(extra or {})
+        if isinstance(speech_id, str):
+            # only ids that int() round-trips are stored as ints ("007" and "²" keep their string)
+            if speech_id.isascii() and speech_id.isdigit() and str(int(speech_id)) == speech_id:
+                speech_id = int(speech_id)
+            else:
+                if speech_id:
+                    self.raw_speech_ids[len(self)] = speech_id
+                speech_id = MISSING_ID
+
+        self.movie_codes.append(self.movie_code(movie))
+        self.character_codes.append(self.character_code(character))
+        self.speech_ids.append(speech_id)
+        self.buffer += text.encode("utf-8")
+        self.offsets.append(len(self.buffer))
+
+    def append_row(self, row, movie=None):
+        # row is a csv.DictReader row; every stage strips all four fields
+        self.append(
+            movie if movie is not None else (row.get("movie") or "").strip(),
+            (row.get("character") or "").strip(),
+            (row.get("speech_id") or "").strip(),
+            (row.get("text") or "").strip(),
+            {name: (value or "").strip() for name, value in row.items() if name not in FIELDNAMES and name},
+        )
+
+    def extend(self, other):
+        for r in other:
+            self.append(r.movie, r.character, r["speech_id"], r.text,
+                        {name: column[r.index] for name, column in other.extra.items()})
+
+    @property
+    def fieldnames(self):
+        return FIELDNAMES + list(self.extra)
+
+    # ---------- access ----------
+
+    def __len__(self):
+        return len(self.speech_ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SpeechRow(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield SpeechRow(self, i)
+
+    def text_at(self, index):
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def texts(self):
+        for i in range(len(self)):
+            yield self.text_at(i)
+
+    def group_indices(self, column):
+        """
+        One pass over the code column: {movie or character name: [row indices]}.
+        Groups keep file order.
+        """
+        if column == "movie":
+            codes, names = self.movie_codes, self.movie_names
+        elif column == "character":
+            codes, names = self.character_codes, self.character_names
+        else:
+            raise ValueError(f"cannot group by {column!r}")
+
+        groups = {}
+        for i, code in enumerate(codes):
+            groups.setdefault(names[code], []).append(i)
+        return groups
+
+    def take(self, indices):
+        # new table holding only the given rows (in the given order)
+        indices = list(indices)
+        out = SpeechTable()
+        for i in indices:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            out.movie_codes.append(out.movie_code(self.movie_names[self.movie_codes[i]]))
+            out.character_codes.append(
+                out.character_code(self.character_names[self.character_codes[i]])
+            )
+            if i in self.raw_speech_ids:
+                out.raw_speech_ids[len(out)] = self.raw_speech_ids[i]
+            out.speech_ids.append(self.speech_ids[i])
+            out.buffer += self.buffer[start:end]
+            out.offsets.append(len(out.buffer))
+        out.extra = {name: [column[i] for i in indices] for name, column in self.extra.items()}
+        return out
+
+    def filter(self, predicate):
+        return self.take([r.index for r in self if predicate(r)])
+
+    def filter_character_ids(self, character_ids):
+        # compare integer codes only; names were resolved when they were interned
+        wanted = {
+            code for code, cid in enumerate(self.character_name_ids) if cid in character_ids
+        }
+        return self.take([i for i, code in enumerate(self.character_codes) if code in wanted])
+
+    def _rename(self, names, codes, name_map):
+        # returns (new names, new lookup, new codes); codes are only rewritten
+        # when two names collapse into one
+        new_names = []
+        new_lookup = {}
+        translate = []
+        for name in names:
+            translate.append(self._intern(name_map.get(name, name), new_names, new_lookup))
+
+        if len(new_names) != len(names):
+            codes = array("I", (translate[c] for c in codes))
+        return new_names, new_lookup, codes
+
+    def rename_movies(self, name_map):
+        """
+        Rename movies in place. Only the interned names are touched.
+        """
+        self.movie_names, self._movie_lookup, self.movie_codes = self._rename(
+            self.movie_names, self.movie_codes, name_map
+        )
+
+    def canonicalize_characters(self):
+        # "ALBUS DUMBLEDORE", "DUMBLEDORE (V.O.)" -> "DUMBLEDORE"; unknown speakers keep their name
+        resolver = get_resolver()
+        name_map = {
+            name: resolver.canonical_name(cid)
+            for name, cid in zip(self.character_names, self.character_name_ids)
+            if cid
+        }
+        self.character_names, self._character_lookup, self.character_codes = self._rename(
+            self.character_names, self.character_codes, name_map
+        )
+        self.character_name_ids = [resolver.resolve(name) for name in self.character_names]
+
+    def normalize_texts(self):
+        # ASCII-fold every text in place, one pass over the whole buffer
+        from Dataset_prep.text_normalization import normalize_buffer  # needs numpy
+
+        buffer, self.offsets = normalize_buffer(self.buffer, self.offsets)
+        self.buffer = bytearray(buffer)
+        # folding changes lengths ("…" -> "..."), stored sentence offsets no longer fit;
+        # without them spans_from_starts() segments the text again
+        self.extra.pop("sentence_starts", None)
+
+    def nbytes(self):
+        # payload size of the columns (names and text buffer included)
+        columns = (self.movie_codes, self.character_codes, self.speech_ids, self.offsets)
+        names = sum(len(n) for n in self.movie_names + self.character_names)
+        return sum(c.itemsize * len(c) for c in columns) + len(self.buffer) + names
+
+    # ---------- csv i/o ----------
+
+    @classmethod
+    def read_csv(cls, path, delimiter=",", movie=None, table=None, quoting=csv.QUOTE_MINIMAL):
+        """
+        Read a speech CSV/TSV. If movie is given it is used for every row
+        (the per-movie TSVs have no movie column). Rows are appended to
+        table when one is passed, so several files can share one table.
+        TSVs written by parse_dialogue are unquoted: read them with
+        quoting=csv.QUOTE_NONE, or a text starting with " swallows the rows after it.
+        """
+        table = table if table is not None else cls()
+        with Path(path).open("r", encoding="utf-8", errors="ignore") as f:
+            reader = csv.DictReader(f, delimiter=delimiter, quoting=quoting)
+            for row in reader:
+                table.append_row(row, movie=movie)
+        return table
+
+    def write_csv(self, path, fieldnames=None):
+        # the four columns plus any extra ones, unless fieldnames says otherwise
+        fieldnames = fieldnames or self.fieldnames
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for r in self:
+                writer.writerow({name: r[name] for name in fieldnames})
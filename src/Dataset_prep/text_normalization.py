@@ -0,0 +1,274 @@
+"""
+ASCII normalization of speech text.
+
+Smart quotes, dashes, ligatures, PDF bullets and utf-8 text that was
+decoded as cp1252 somewhere along the way ("â€™" instead of "’") are
+mapped to their plain ASCII equivalents instead of being deleted. Accented
+letters lose their accent (NFKD), anything left without an ASCII form is
+dropped.
+
+Text is normalized one run of non-ASCII characters at a time: mojibake is
+repaired first (the run's characters are turned back into the bytes they
+were misread from and every valid utf-8 sequence among them is decoded, as
+often as it was mangled; "â€™“" -> "’“"), then everything goes through the
+ASCII map. ASCII never takes part in a repair, so a run is normalized the
+same wherever it occurs, and normalize_text() and normalize_buffer() give
+the same result by construction (`python text_normalization.py` checks it
+over the corpus).
+
+The work happens on a whole column at once, as one utf-8 buffer (the
+layout SpeechTable already uses): numpy finds the runs of non-ASCII bytes,
+each *distinct* run is normalized once (a corpus has a handful: ’ “ ” — …
+and some mojibake), and the buffer is stitched back together. ASCII bytes
+are never looked at from Python, and an all-ASCII column costs one
+isascii() check.
+"""
+from array import array
+from pathlib import Path
+import csv
+import re
+import sys
+import unicodedata
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+
+SPEECHES = Path("data/processed/processed_speeches")
+
+# mojibake that can't be undone by re-encoding: 0x9D has no cp1252 character,
+# so the closing quote ” (E2 80 9D) is often already a replacement char
+MOJIBAKE = {
+    "â€\x9d": '"',
+    "â€\ufffd": '"',
+}
+
+# single characters -> ASCII (everything not listed goes through NFKD)
+ASCII_MAP = {
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'", "´": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"',
+    "«": '"', "»": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-", "―": "-", "−": "-",
+    "…": "...",
+    "\xa0": " ", " ": " ", " ": " ", " ": " ", " ": " ",
+    "​": "", "‌": "", "‍": "", "﻿": "", "\xad": "",
+    "ﬀ": "ff", "ﬁ": "fi", "ﬂ": "fl", "ﬃ": "ffi", "ﬄ": "ffl",
+    "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ß": "ss",
+    # PDF extraction debris: bullets, middle dots, boxes, check marks, stray tildes
+    "•": "", "·": "", "■": "", "●": "", "✓": "", "˜": "",
+    "�": "",
+}
+ASCII_TABLE = str.maketrans(ASCII_MAP)
+
+C1_RE = re.compile("[\x80-\x9f]")
+NON_ASCII_RE = re.compile("[^\x00-\x7f]+")
+ESCAPED_RE = re.compile("[\udc80-\udcff]")  # bytes surrogateescape couldn't decode
+
+SEPARATOR = b"\x00"  # joins texts in normalize_texts; never part of a text
+
+
+def _misread_byte(ch):
+    # the byte a cp1252 / latin1 reader turned into ch, None if ch can't come from one
+    for codec in ("cp1252", "latin1"):
+        try:
+            return ch.encode(codec)
+        except UnicodeEncodeError:
+            continue
+    return None
+
+
+def _unescape(m):
+    # a byte that isn't part of a utf-8 sequence goes back to the character it was read as
+    byte = bytes([ord(m.group()) - 0xDC00])
+    try:
+        return byte.decode("cp1252")
+    except UnicodeDecodeError:
+        return byte.decode("latin1")
+
+
+def _decode_misread(text):
+    # one round: decode every valid utf-8 sequence hidden in text, keep everything else
+    out, pending = [], bytearray()
+    for ch in text:
+        byte = _misread_byte(ch)
+        if byte is not None:
+            pending += byte
+            continue
+        if pending:
+            out.append(ESCAPED_RE.sub(_unescape, pending.decode("utf-8", errors="surrogateescape")))
+            pending.clear()
+        out.append(ch)
+    if pending:
+        out.append(ESCAPED_RE.sub(_unescape, pending.decode("utf-8", errors="surrogateescape")))
+    return "".join(out)
+
+
+def repair_mojibake(text: str) -> str:
+    """
+    Undo utf-8 that was decoded as cp1252 / latin1, possibly more than once
+    (the annotation file has cp1252 ellipses that were mangled twice).
+    Only the mangled sequences are decoded; a real "’" or "“" next to them
+    stays as it is.
+    """
+    for bad, good in MOJIBAKE.items():
+        if bad in text:
+            text = text.replace(bad, good)
+
+    for _ in range(3):
+        fixed = _decode_misread(text)
+        if fixed == text:
+            break
+        text = fixed
+
+    # C1 control characters are cp1252 punctuation that was read as latin1
+    return C1_RE.sub(lambda m: bytes([ord(m.group())]).decode("cp1252", errors="ignore"), text)
+
+
+def normalize_run(run: str) -> str:
+    """One run of non-ASCII characters -> its ASCII replacement."""
+    run = repair_mojibake(run)
+    run = run.translate(ASCII_TABLE)
+    if not run.isascii():
+        run = unicodedata.normalize("NFKD", run).encode("ascii", "ignore").decode("ascii")
+    return run
+
+
+def normalize_text(text: str) -> str:
+    """One string, no buffer tricks; the same runs as normalize_buffer()."""
+    if not isinstance(text, str):
+        text = str(text)
+    if text.isascii():
+        return text
+    return NON_ASCII_RE.sub(lambda m: normalize_run(m.group()), text)
+
+
+def match_text(text) -> str:
+    """Key for "is this the same line?": ASCII, single spaces, no wrapping quotes."""
+    return " ".join(normalize_text(text or "").split()).strip(' "')
+
+
+def normalize_buffer(buffer, offsets=None):
+    """
+    Normalize a utf-8 buffer holding many texts back to back.
+
+    offsets (row i = buffer[offsets[i]:offsets[i+1]]) keep runs from
+    crossing row boundaries and are returned shifted to the new buffer.
+    Returns (bytes, offsets).
+    """
+    buffer = bytes(buffer)
+    if buffer.isascii():
+        return buffer, offsets
+
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    is_high = data >= 0x80
+    high = np.flatnonzero(is_high)
+
+    # runs of consecutive non-ASCII bytes (whole characters, since every byte
+    # of a multi-byte utf-8 character is >= 0x80), split at row starts
+    run_start = np.ones(len(high), dtype=bool)
+    run_start[1:] = np.diff(high) != 1
+    if offsets is not None:
+        old = np.asarray(offsets, dtype=np.int64)
+        is_row_start = np.zeros(len(data) + 1, dtype=bool)
+        is_row_start[old] = True
+        run_start |= is_row_start[high]
+    first = np.flatnonzero(run_start)          # index into `high` of each run's first byte
+    starts = high[first]                       # buffer position of each run
+    lengths = np.diff(np.append(first, len(high)))
+
+    # the distinct runs, keyed by their bytes (a hash could give two runs one replacement)
+    distinct = {}
+    which = np.fromiter(
+        (distinct.setdefault(buffer[s:s + n], len(distinct)) for s, n in zip(starts.tolist(), lengths.tolist())),
+        dtype=np.int64, count=len(starts),
+    )
+
+    # only the distinct runs are normalized
+    replacements = [normalize_run(run.decode("utf-8", errors="ignore")).encode("ascii") for run in distinct]
+    rep_lengths = np.array([len(r) for r in replacements], dtype=np.int64)
+    rep_offsets = np.concatenate(([0], np.cumsum(rep_lengths)[:-1]))
+    pool = np.frombuffer(b"".join(replacements) or b"\0", dtype=np.uint8)
+
+    # drop every non-ASCII byte, then insert each run's replacement where the run was
+    run_rep_len = rep_lengths[which]
+    total = int(run_rep_len.sum())
+    run_pos = starts - first                   # run position among the kept ASCII bytes
+    inner = np.arange(total) - np.repeat(np.cumsum(run_rep_len) - run_rep_len, run_rep_len)
+    inserted = pool[np.repeat(rep_offsets[which], run_rep_len) + inner]
+    out = np.insert(data[~is_high], np.repeat(run_pos, run_rep_len), inserted).tobytes()
+
+    if offsets is not None:
+        # a row start moves by what the runs before it lost and gained
+        removed = np.searchsorted(high, old, side="left")
+        added = np.concatenate(([0], np.cumsum(run_rep_len)))[np.searchsorted(starts, old, side="left")]
+        moved = (old - removed + added).tolist()
+        offsets = array(offsets.typecode, moved) if isinstance(offsets, array) else moved
+
+    return out, offsets
+
+
+def normalize_texts(texts):
+    """
+    Normalize a whole column (list, pandas Series, ...) in one pass.
+    Returns a list of the same length.
+    """
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    if not texts:
+        return []
+
+    joined = SEPARATOR.join(t.encode("utf-8") for t in texts)
+    if joined.count(SEPARATOR) != len(texts) - 1:
+        # a text contains the separator itself
+        return [normalize_text(t) for t in texts]
+
+    out, _ = normalize_buffer(joined)
+    return out.decode("ascii").split(SEPARATOR.decode())
+
+
+def corpus_texts():
+    """Every text the pipeline normalizes: parsed TSVs, the cleaned files, the annotation file."""
+    from Dataset_prep.parse_dialogue import MOVIES, movie_paths
+
+    sources = []
+    for movie in MOVIES:
+        _, all_chars_tsv, _ = movie_paths(movie)
+        sources.append((all_chars_tsv, "\t", csv.QUOTE_NONE))  # unquoted texts
+    # the cleaned files went through a spreadsheet and are quoted
+    sources += [(path, "\t", csv.QUOTE_MINIMAL) for path in sorted((SPEECHES / "manually-clean").glob("*.tsv"))]
+    sources += [(path, ",", csv.QUOTE_MINIMAL) for path in sorted((SPEECHES / "manually-clean").glob("*.csv"))]
+    sources.append((SPEECHES / "annotation_dataset_RHD_final.csv", ",", csv.QUOTE_MINIMAL))
+
+    texts = []
+    for path, delimiter, quoting in sources:
+        if not Path(path).exists():
+            continue
+        with Path(path).open("r", encoding="utf-8", errors="ignore") as f:
+            texts += [row.get("text") or "" for row in csv.DictReader(f, delimiter=delimiter, quoting=quoting)]
+    return texts
+
+
+def main():
+    # the buffer paths (normalize_texts, SpeechTable.normalize_texts) must equal normalize_text on every text
+    texts = corpus_texts()
+    expected = [normalize_text(t) for t in texts]
+
+    encoded = [t.encode("utf-8") for t in texts]
+    offsets = array("Q", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    buffer, new_offsets = normalize_buffer(b"".join(encoded), offsets)
+    from_buffer = [buffer[new_offsets[i]:new_offsets[i + 1]].decode("ascii") for i in range(len(texts))]
+
+    mismatches = [
+        (t, e, a, b) for t, e, a, b in zip(texts, expected, normalize_texts(texts), from_buffer) if not e == a == b
+    ]
+    non_ascii = sum(1 for t in texts if not t.isascii())
+    print(f"{len(texts)} texts ({non_ascii} with non-ASCII): {len(mismatches)} differ between normalize_text and the buffer paths")
+    for t, e, a, b in mismatches[:20]:
+        print(f"  {t!r}\n    text:   {e!r}\n    texts:  {a!r}\n    buffer: {b!r}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
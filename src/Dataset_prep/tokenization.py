@@ -0,0 +1,242 @@
+"""
+One tokenizer for every stage, with a persistent cache of token ids.
+
+The stages used to split text each in their own way. Their rules are kept
+as named presets, so every stage still sees exactly the tokens it saw
+before:
+
+    words    [A-Za-z']+, case kept            filter_non_trivial, parse_dialogue
+    dedup    [a-z0-9']+ on lowercase           dedup_near_duplicates
+    split    lowercase, split on space . ,     compute_tf_idf, bootstrap_ci
+    sklearn  sklearn's default token_pattern   analyze_topics, analyze_vocab (+ stop words)
+    ngram    a-z words with inner apostrophes  ngram_stats
+
+All presets share one vocabulary (token -> id, append only, so ids never
+change). A text is tokenized once per preset: the ids are cached under an
+8-byte hash of the text, as compact array('I') rows, and saved to
+CACHE_PATH by save_cache(). The cache is one pickle holding the vocabulary
+and every preset, replaced atomically, so a reader never sees ids from one
+vocabulary with tokens from another.
+
+Stages run in parallel (the workers of pipeline.py), so
+save_cache() never just overwrites the file: under a lock (<cache>.lock) it
+reads what is on disk, adds this process's new tokens to that vocabulary,
+maps its new rows to those ids and writes the union. Ids a process already
+handed out stay valid in that process; only the file is merged.
+"""
+from array import array
+from contextlib import contextmanager
+from hashlib import blake2b
+from pathlib import Path
+import os
+import pickle
+import re
+import tempfile
+
+try:
+    import fcntl  # POSIX only; elsewhere saves are merged without the lock
+except ImportError:
+    fcntl = None
+
+CACHE_PATH = Path("data/processed/token_cache.pkl")
+CACHE_VERSION = 1
+
+# name -> (pattern, lowercase first, character translation applied first)
+PRESETS = {
+    "words": (r"[A-Za-z']+", False, None),
+    "dedup": (r"[a-z0-9']+", True, None),
+    "split": (r"[^\s.,]+", True, None),
+    "sklearn": (r"(?u)\b\w\w+\b", True, None),
+    "ngram": (r"[a-z]+(?:'[a-z]+)*", True, {"’": "'"}),
+}
+
+
+def text_key(text):
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class Vocabulary:
+    def __init__(self, tokens=()):
+        self.tokens = list(tokens)
+        self.ids = {t: i for i, t in enumerate(self.tokens)}
+
+    def id_of(self, token):
+        i = self.ids.get(token)
+        if i is None:
+            i = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+class Tokenizer:
+    """A preset plus its cache: tokenize() splits, ids() / tokens() go through the cache."""
+
+    def __init__(self, name, vocab, pattern, lowercase=False, translate=None, cache=None):
+        self.name = name
+        self.vocab = vocab
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.lowercase = lowercase
+        self.table = str.maketrans(translate) if translate else None
+        self.cache = cache if cache is not None else {}
+        self.added = 0
+
+    @property
+    def signature(self):
+        # cached ids are only reused while the rules are unchanged
+        return self.pattern, self.lowercase, self.table
+
+    def tokenize(self, text):
+        """Uncached: the token strings of one text."""
+        if self.table:
+            text = text.translate(self.table)
+        if self.lowercase:
+            text = text.lower()
+        return self.regex.findall(text)
+
+    def ids(self, text):
+        key = text_key(text)
+        ids = self.cache.get(key)
+        if ids is None:
+            ids = self.cache[key] = array("I", map(self.vocab.id_of, self.tokenize(text)))
+            self.added += 1
+        return ids
+
+    def tokens(self, text):
+        words = self.vocab.tokens
+        return [words[i] for i in self.ids(text)]
+
+    def __call__(self, text):
+        return self.tokens(text)
+
+
+# ---------- shared state + disk cache ----------
+
+_vocab = None
+_stored = {}       # preset -> rows read from disk, until the preset is first used
+_tokenizers = {}
+
+
+def _pack(cache):
+    keys, offsets, ids = array("Q"), array("Q", [0]), array("I")
+    for key, row in cache.items():
+        keys.append(key)
+        ids.extend(row)
+        offsets.append(len(ids))
+    return keys, offsets, ids
+
+
+def _unpack(keys, offsets, ids):
+    return {key: ids[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)}
+
+
+def _read(path):
+    # the cache on disk, or None if there is none (or it is from another version)
+    try:
+        with Path(path).open("rb") as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+        return data
+    return None
+
+
+def _load(path=CACHE_PATH):
+    global _vocab, _stored
+    data = _read(path)
+    _vocab, _stored = (Vocabulary(data["vocab"]), data["presets"]) if data else (Vocabulary(), {})
+
+
+@contextmanager
+def _locked(path):
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_tokenizer(name):
+    """The shared tokenizer of a preset (the disk cache is read on first use)."""
+    tokenizer = _tokenizers.get(name)
+    if tokenizer is None:
+        if _vocab is None:
+            _load()
+        pattern, lowercase, translate = PRESETS[name]
+        tokenizer = Tokenizer(name, _vocab, pattern, lowercase, translate)
+        entry = _stored.pop(name, None)
+        if entry is not None and entry["signature"] == tokenizer.signature:
+            tokenizer.cache = _unpack(*entry["rows"])
+        _tokenizers[name] = tokenizer
+    return tokenizer
+
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _merged(disk):
+    # the cache on disk (None: no file) plus everything this process tokenized
+    vocab = Vocabulary(disk["vocab"]) if disk else Vocabulary()
+    # presets this process never used: as on disk now, or as read if the file is gone
+    presets = dict(disk["presets"]) if disk else dict(_stored)
+
+    # this process's ids -> the file's; the same unless another process saved new tokens first
+    remap = [vocab.id_of(token) for token in _vocab.tokens]
+    same_ids = vocab.tokens[:len(_vocab)] == _vocab.tokens
+
+    for name, tokenizer in _tokenizers.items():
+        entry = presets.get(name)
+        current = entry is not None and entry["signature"] == tokenizer.signature
+        if current and not tokenizer.added:
+            continue  # nothing new, the file has at least what this process read
+        rows = _unpack(*entry["rows"]) if current else {}
+        for key, ids in tokenizer.cache.items():
+            if key not in rows:
+                rows[key] = ids if same_ids else array("I", (remap[i] for i in ids))
+        presets[name] = {"signature": tokenizer.signature, "rows": _pack(rows)}
+    return {"version": CACHE_VERSION, "vocab": vocab.tokens, "presets": presets}
+
+
+def save_cache(path=CACHE_PATH):
+    """Merge the new entries into the cache on disk. Returns True if it was written."""
+    if not any(t.added for t in _tokenizers.values()):
+        return False
+
+    path = Path(path)
+    with _locked(path.with_name(path.name + ".lock")):
+        _write(path, _merged(_read(path)))
+    for tokenizer in _tokenizers.values():
+        tokenizer.added = 0
+    return True
+
+
+def main():
+    # what is in the cache
+    get_tokenizer("words")
+    print(f"{CACHE_PATH}: {len(_vocab)} tokens in the shared vocabulary")
+    for name in PRESETS:
+        rows = len(get_tokenizer(name).cache)
+        print(f"  {name:<8} {rows:7d} texts cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,91 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import sys
+from pathlib import Path
 
-# ---- Load data ----
-df = pd.read_csv("data/processed/processed_speeches/annotation_dataset_RHD_final.csv")
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Analysis.bootstrap_ci import topic_counts, topic_share_ci_from_counts
 
-# Clean label text
-df["annotation_label"] = df["annotation_label"].str.strip()
+DATA_PATH = "data/processed/processed_speeches/annotation_dataset_RHD_final.csv"
+OUTPUT_PATH = "data/processed/processed_speeches/topic_distribution_RHD.png"
+
+# every parsed line, labelled by Analysis/topic_classifier.py (human labels where they exist)
+PREDICTED_PATH = "data/processed/processed_speeches/topic_predictions_all_lines.csv"
+PREDICTED_OUTPUT_PATH = "data/processed/processed_speeches/topic_distribution_RHD_all_lines.png"
 
 # Characters we care about
-characters = ["RON", "HERMIONE", "DUMBLEDORE"]
+characters = TARGET_CHARACTERS
+colors = ["#4C72B0", "#55A868", "#C44E52", "#8172B2", "#CCB974", "#64B5CD"]
 
 # Topic order
 topic_order = ["Danger", "Duty", "Informative", "Magic", "Mockery", "Relationship", "Storyline"]
 
-# ---- Build table: topics x characters = percentage ----
-data = []
 
-for topic in topic_order:
-    row = {"annotation_label": topic}
-    for char in characters:
-        subset_char = df[df["character"] == char]
-        total_char = len(subset_char)
-        if total_char == 0:
-            pct = 0.0
-        else:
-            count_topic = (subset_char["annotation_label"] == topic).sum()
-            pct = 100 * count_topic / total_char
-        row[char] = pct
-    data.append(row)
+def main(data_path=DATA_PATH, output_path=OUTPUT_PATH):
+    # ---- Count (topic, character) pairs ----
+    # one pass over the data in chunks of ANNOTATION_CHUNK_SIZE lines (or all at once),
+    # pending label/text fixes included; the counts of the chunks add up
+    counts = pd.DataFrame(0, index=topic_order, columns=characters)
+    totals = pd.Series(0, index=characters)
+    pairs = 0
+    for chunk in iter_annotation_frames(data_path, usecols=["character", "annotation_label"]):
+        # Clean label text
+        chunk["annotation_label"] = chunk["annotation_label"].str.strip()
+
+        counts += pd.crosstab(chunk["annotation_label"], chunk["character"]).reindex(
+            index=topic_order, columns=characters, fill_value=0)
+        totals += chunk["character"].value_counts().reindex(characters, fill_value=0)
+        pairs = pairs + topic_counts(chunk, characters, topic_order)
+
+    # ---- Build table: topics x characters = percentage ----
+    # divide by each character's total
+    table = (100 * counts / totals.replace(0, np.nan)).fillna(0.0)
+    table = table.rename_axis(index="annotation_label", columns=None).reset_index()
+
+    # ---- Bootstrap 95% intervals for the error bars ----
+    ci = topic_share_ci_from_counts(pairs, characters, topic_order).set_index(["character", "annotation_label"])
+
+    # ---- Plot grouped bar chart ----
+    x = np.arange(len(topic_order))
+    width = 0.75 / len(characters)
 
-table = pd.DataFrame(data)
+    fig, ax = plt.subplots(figsize=(11, 6))
 
-# ---- Plot grouped bar chart ----
-x = np.arange(len(topic_order))
-width = 0.25
+    for k, char in enumerate(characters):
+        offset = (k - (len(characters) - 1) / 2) * width
+        part = ci.loc[char].reindex(topic_order)
+        yerr = [table[char] - part["ci_low"].to_numpy(), part["ci_high"].to_numpy() - table[char]]
+        ax.bar(x + offset, table[char], width, label=char, color=colors[k % len(colors)],
+               yerr=yerr, capsize=2, error_kw={"elinewidth": 0.8})
 
-fig, ax = plt.subplots(figsize=(11, 6))
+    ax.set_xticks(x)
+    ax.set_xticklabels(topic_order, rotation=30, ha="right")
 
-ax.bar(x - width, table["RON"], width, label="RON", color="#4C72B0")
-ax.bar(x, table["HERMIONE"], width, label="HERMIONE", color="#55A868")
-ax.bar(x + width, table["DUMBLEDORE"], width, label="DUMBLEDORE", color="#C44E52")
+    ax.set_ylabel("Percentage of character's lines (%)")
+    ax.set_xlabel("Topic")
+    scope = "" if data_path == DATA_PATH else ", all lines (human + predicted labels)"
+    ax.set_title(f"Topic Distribution per Character (RHD){scope}, 95% bootstrap CI")
+    ax.legend()
 
-ax.set_xticks(x)
-ax.set_xticklabels(topic_order, rotation=30, ha="right")
+    plt.tight_layout()
 
-ax.set_ylabel("Percentage of character's lines (%)")
-ax.set_xlabel("Topic")
-ax.set_title("Topic Distribution per Character (RHD)")
-ax.legend()
+    # ---- SAVE PLOT ----
+    plt.savefig(output_path, dpi=300)
+    plt.close()
 
-plt.tight_layout()
+    print("\nSaved grouped bar chart to:")
+    print("   ", output_path)
 
-# ---- SAVE PLOT ----
-output_path = "data/processed/processed_speeches/topic_distribution_RHD.png"
-plt.savefig(output_path, dpi=300)
-plt.close()
+    # ---- Print the table too ----
+    print("\nPercentage of each character's lines in each topic:\n")
+    print(table.to_string(index=False))
 
-print("\nSaved grouped bar chart to:")
-print("   ", output_path)
 
-# ---- Print the table too ----
-print("\nPercentage of each character's lines in each topic:\n")
-print(table.to_string(index=False))
+if __name__ == "__main__":
+    if "--predicted" in sys.argv[1:]:
+        main(PREDICTED_PATH, PREDICTED_OUTPUT_PATH)
+    else:
+        main()
@@ -0,0 +1,66 @@
+"""
+Saving and parallel rendering of the plots.
+
+- save_figure() writes one figure in several formats from a single render:
+  PNG (raster), SVG (text kept as text, so files stay small) and PDF
+- render_parallel() runs one render function per item in worker processes
+  (each worker draws with the Agg backend, nothing is shown)
+- tile_slices() / downsample() cut a large matrix into fixed-size tiles or
+  shrink it to a fixed-size overview, so a figure never grows with the data
+
+Formats are asked for on the command line of the plotting scripts:
+--svg and --pdf add those formats to the PNG.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+
+import numpy as np
+
+FORMATS = ("png", "svg", "pdf")
+
+
+def requested_formats(argv):
+    """["png"] plus every --svg / --pdf flag in argv."""
+    return ["png"] + [fmt for fmt in FORMATS[1:] if f"--{fmt}" in argv]
+
+
+def save_figure(fig, path, formats=("png",), dpi=200):
+    """Save fig as path with each format's suffix. Returns the written paths."""
+    import matplotlib
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = []
+    for fmt in formats:
+        out = path.with_suffix(f".{fmt}")
+        with matplotlib.rc_context({"svg.fonttype": "none", "pdf.fonttype": 42}):
+            fig.savefig(out, dpi=dpi if fmt == "png" else None, format=fmt)
+        written.append(out)
+    return written
+
+
+def _init_worker():
+    os.environ["MPLBACKEND"] = "Agg"
+
+
+def render_parallel(func, items, jobs=None):
+    """[func(item) for item in items], one item per task on up to `jobs` worker processes."""
+    items = list(items)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(items)))
+    if jobs == 1:
+        return [func(item) for item in items]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        return list(pool.map(func, items))
+
+
+def tile_slices(n, size):
+    """Slices cutting range(n) into pieces of at most size."""
+    return [slice(start, min(start + size, n)) for start in range(0, n, size)]
+
+
+def downsample(mat, max_rows, max_cols):
+    """Block maximum of mat so it has at most max_rows x max_cols cells (a peak stays visible)."""
+    rows = np.linspace(0, mat.shape[0], min(max_rows, mat.shape[0]) + 1).astype(int)[:-1]
+    cols = np.linspace(0, mat.shape[1], min(max_cols, mat.shape[1]) + 1).astype(int)[:-1]
+    return np.maximum.reduceat(np.maximum.reduceat(mat, rows, axis=0), cols, axis=1)
@@ -1,13 +1,66 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
+from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Visualization.export import downsample, render_parallel, requested_formats, save_figure, tile_slices
 
 INPUT = "data/processed/processed_speeches/tfidf_custom_labels.csv"
 OUTPUT = "data/processed/processed_speeches/tfidf_heatmap_all_labels.png"
 
 TOP_K = 10  # top words per label
 
-def main():
+# above this many words / labels the heatmap is split into tiles of this size,
+# and OUTPUT becomes a downsampled overview of OVERVIEW_CELLS cells
+TILE_COLUMNS = 80
+TILE_ROWS = 20
+OVERVIEW_CELLS = (40, 200)
+
+
+def draw(mat, labels, vocab, value_range, title, path, formats):
+    # one heatmap figure; the size follows the (bounded) number of cells
+    fig = plt.figure(figsize=(1.2 * len(vocab), 0.6 * len(labels) + 2))
+
+    vmin, vmax = value_range
+    im = plt.imshow(mat, aspect="auto", cmap="viridis", vmin=vmin, vmax=vmax)
+
+    plt.colorbar(im, label="TF-IDF")
+
+    plt.xticks(ticks=range(len(vocab)), labels=vocab, rotation=90)
+    plt.yticks(ticks=range(len(labels)), labels=labels)
+
+    plt.title(title)
+    plt.tight_layout()
+
+    written = save_figure(fig, path, formats, dpi=200)
+    plt.close(fig)
+    return written
+
+
+def _draw_tile(task):
+    return draw(*task)
+
+
+def draw_overview(mat, vmax, path, formats):
+    # fixed-size picture of the whole matrix, block maxima instead of single words
+    small = downsample(mat, *OVERVIEW_CELLS)
+    fig = plt.figure(figsize=(12, 6))
+    im = plt.imshow(small, aspect="auto", cmap="viridis", vmin=0, vmax=vmax, interpolation="nearest",
+                    extent=(0, mat.shape[1], mat.shape[0], 0))
+    plt.colorbar(im, label="TF-IDF (block maximum)")
+    plt.xlabel(f"words (1-{mat.shape[1]})")
+    plt.ylabel(f"labels (1-{mat.shape[0]})")
+    plt.title(f"Top TF-IDF Words per Annotation Label — overview of {mat.shape[0]} x {mat.shape[1]}")
+    plt.tight_layout()
+    written = save_figure(fig, path, formats, dpi=200)
+    plt.close(fig)
+    return written
+
+
+def main(formats=None, jobs=None):
+    formats = formats or requested_formats(sys.argv[1:])  # --svg / --pdf
+
     df = pd.read_csv(INPUT)
     df["tfidf"] = df["tfidf"].astype(float)
 
@@ -22,32 +75,31 @@ def main():
     # 2) union of all selected words
     vocab = sorted(set(w for words in top_words_per_label.values() for w in words))
 
-    # 3) build matrix: rows = labels, cols = vocab, values = tfidf
-    mat = np.zeros((len(labels), len(vocab)))
-
-    for i, label in enumerate(labels):
-        sub = df[df["annotation_label"] == label]
-        scores = dict(zip(zip(sub["annotation_label"], sub["word"]), sub["tfidf"]))
-        for j, w in enumerate(vocab):
-            mat[i, j] = scores.get((label, w), 0.0)  # 0 if word not in that label
-
-    # 4) plot heatmap
-    plt.figure(figsize=(1.2 * len(vocab), 0.6 * len(labels) + 2))
-
-    im = plt.imshow(mat, aspect="auto", cmap="viridis")
-
-    plt.colorbar(im, label="TF-IDF")
-
-    plt.xticks(ticks=range(len(vocab)), labels=vocab, rotation=90)
-    plt.yticks(ticks=range(len(labels)), labels=labels)
-
-    plt.title("Top TF-IDF Words per Annotation Label")
-    plt.tight_layout()
-
-    plt.savefig(OUTPUT, dpi=200)
-    plt.close()
-
-    print("Saved heatmap →", OUTPUT)
+    # 3) build matrix: rows = labels, cols = vocab, values = tfidf (0 if word not in that label)
+    scores = df.drop_duplicates(["annotation_label", "word"], keep="last")
+    mat = (scores.pivot(index="annotation_label", columns="word", values="tfidf")
+           .reindex(index=labels, columns=vocab).fillna(0.0).to_numpy())
+
+    # 4) plot heatmap, in tiles once it gets too big for one readable figure
+    title = "Top TF-IDF Words per Annotation Label"
+    if len(vocab) <= TILE_COLUMNS and len(labels) <= TILE_ROWS:
+        for path in draw(mat, labels, vocab, (None, None), title, OUTPUT, formats):
+            print("Saved heatmap →", path)
+        return
+
+    vmax = mat.max()  # one colour scale for every tile
+    out = Path(OUTPUT)
+    tasks = []
+    for i, rows in enumerate(tile_slices(len(labels), TILE_ROWS)):
+        for j, cols in enumerate(tile_slices(len(vocab), TILE_COLUMNS)):
+            tasks.append((mat[rows, cols], labels[rows], vocab[cols], (0, vmax),
+                          f"{title} (labels {rows.start + 1}-{rows.stop}, words {cols.start + 1}-{cols.stop})",
+                          out.with_name(f"{out.stem}_tile_r{i}_c{j}{out.suffix}"), formats))
+    render_parallel(_draw_tile, tasks, jobs)
+    print(f"Saved {len(tasks)} heatmap tiles → {out.parent}/{out.stem}_tile_*")
+
+    for path in draw_overview(mat, vmax, OUTPUT, formats):
+        print("Saved heatmap overview →", path)
 
 if __name__ == "__main__":
     main()
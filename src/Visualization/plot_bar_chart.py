@@ -1,39 +1,83 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+from pathlib import Path
 import os
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Visualization.export import render_parallel, requested_formats, save_figure
 
 # ------------------------------
 # Config
 # ------------------------------
 INPUT = "data/processed/processed_speeches/tfidf_custom_labels.csv"
+CI_INPUT = "data/processed/processed_speeches/tfidf_custom_labels_ci.csv"  # from Analysis/bootstrap_ci.py
 OUTPUT_DIR = "data/processed/processed_speeches/tfidf_barplots"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def main():
-    df = pd.read_csv(INPUT)
+def output_path(label, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, f"{label}_tfidf_barplot.png")
+
+
+def plot_label(df, label, output_dir=OUTPUT_DIR, formats=("png",)):
+    subset = df[df["annotation_label"] == label].sort_values("tfidf", ascending=False)[:10]
+
+    # bootstrap interval as error bar when bootstrap_ci.py has been run
+    xerr = None
+    if "ci_low" in subset:
+        xerr = [subset["tfidf"] - subset["ci_low"], subset["ci_high"] - subset["tfidf"]]
+
+    fig = plt.figure(figsize=(10, 5))
+    plt.barh(subset["word"], subset["tfidf"], color="skyblue", xerr=xerr, capsize=3)
+    plt.xlabel("TF-IDF Score")
+    plt.ylabel("Word")
+    plt.title(f"Top 10 TF-IDF Words — {label}")
+    plt.gca().invert_yaxis()  # highest at top
+    plt.tight_layout()
+
+    out_path = output_path(label, output_dir)
+    for path in save_figure(fig, out_path, formats, dpi=200):
+        print(f"Saved → {path}")
+    plt.close(fig)
+    return out_path
+
+
+def load_scores(input_path=INPUT, ci_path=CI_INPUT):
+    df = pd.read_csv(input_path, keep_default_na=False)
 
     # Ensure correct types
     df["tfidf"] = df["tfidf"].astype(float)
 
-    labels = df["annotation_label"].unique()
+    if os.path.exists(ci_path):
+        ci = pd.read_csv(ci_path, keep_default_na=False)
+        df = df.merge(ci[["annotation_label", "word", "ci_low", "ci_high"]],
+                      on=["annotation_label", "word"], how="left")
+    return df
+
+
+def render_label(label, input_path=INPUT, output_dir=OUTPUT_DIR):
+    # one label on its own (used by the pipeline to render labels in parallel)
+    os.makedirs(output_dir, exist_ok=True)
+    return plot_label(load_scores(input_path), label, output_dir)
+
 
-    for label in labels:
-        subset = df[df["annotation_label"] == label].sort_values("tfidf", ascending=False)[:10]
+def _render_subset(task):
+    # worker: one label's rows only, so a task is cheap to send
+    subset, label, output_dir, formats = task
+    return plot_label(subset, label, output_dir, formats)
 
-        plt.figure(figsize=(10, 5))
-        plt.barh(subset["word"], subset["tfidf"], color="skyblue")
-        plt.xlabel("TF-IDF Score")
-        plt.ylabel("Word")
-        plt.title(f"Top 10 TF-IDF Words — {label}")
-        plt.gca().invert_yaxis()  # highest at top
-        plt.tight_layout()
 
-        out_path = os.path.join(OUTPUT_DIR, f"{label}_tfidf_barplot.png")
-        plt.savefig(out_path, dpi=200)
-        plt.close()
+def main(formats=None, jobs=None):
+    formats = formats or requested_formats(sys.argv[1:])  # --svg / --pdf
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    df = load_scores()
+
+    labels = df["annotation_label"].unique()
 
-        print(f"Saved → {out_path}")
+    # one label per task in a worker pool
+    tasks = [(df[df["annotation_label"] == label], label, OUTPUT_DIR, formats) for label in labels]
+    render_parallel(_render_subset, tasks, jobs)
 
     print("\n🎉 All barplots generated!")
 
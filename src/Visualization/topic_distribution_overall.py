@@ -1,36 +1,52 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))  # make src/ importable
+from Dataset_prep.character_partitions import TARGET_CHARACTERS
+from Dataset_prep.annotation_store import iter_annotation_frames
+from Analysis.bootstrap_ci import topic_counts, topic_share_ci_from_counts
 
 DATA_PATH = Path("data/processed/processed_speeches/annotation_dataset_RHD_final.csv")
 OUT_PNG = Path("data/processed/processed_speeches/topic_distribution_overall.png")
 
-MAIN = {"RON", "HERMIONE", "DUMBLEDORE"}
+MAIN = set(TARGET_CHARACTERS)
 
 def main():
-    # Load annotated dataset
-    df = pd.read_csv(DATA_PATH)
-
-    # Keep only the 3 characters
-    df = df[df["character"].str.upper().isin(MAIN)]
-
-    # Count topic frequencies
-    topic_counts = df["annotation_label"].value_counts().sort_index()
+    # Load annotated dataset in chunks of ANNOTATION_CHUNK_SIZE lines (or all at once),
+    # pending label/text fixes included, keeping only the target characters
+    def read():
+        for chunk in iter_annotation_frames(DATA_PATH, usecols=["character", "annotation_label"]):
+            yield chunk[chunk["character"].str.upper().isin(MAIN)]
+
+    # Count topic frequencies (the counts of the chunks add up)
+    label_counts = None
+    for chunk in read():
+        part = chunk["annotation_label"].value_counts()
+        label_counts = part if label_counts is None else label_counts.add(part, fill_value=0)
+    label_counts = label_counts.astype(int).sort_index()
 
     # Convert to percentages
-    total = topic_counts.sum()
-    topic_percent = (topic_counts / total) * 100
+    total = label_counts.sum()
+    topic_percent = (label_counts / total) * 100
 
     print("\nOverall Topic Distribution (% of all lines):\n")
     print(topic_percent.round(2))
 
+    # Bootstrap 95% intervals (all lines resampled together)
+    topics = list(topic_percent.index)
+    pairs = sum(topic_counts(chunk, groups=None, topics=topics) for chunk in read())
+    ci = topic_share_ci_from_counts(pairs, groups=None, topics=topics).set_index("annotation_label")
+    yerr = [topic_percent - ci["ci_low"], ci["ci_high"] - topic_percent]
+
     # Plot
     plt.figure(figsize=(10,6))
-    plt.bar(topic_percent.index, topic_percent.values, color="#4C72B0")
+    plt.bar(topic_percent.index, topic_percent.values, color="#4C72B0", yerr=yerr, capsize=4)
 
     plt.xticks(rotation=30, ha="right")
     plt.ylabel("Percentage of all lines (%)")
-    plt.title("Overall Topic Distribution Across Ron, Hermione, and Dumbledore")
+    names = [c.title() for c in TARGET_CHARACTERS]
+    plt.title(f"Overall Topic Distribution Across {', '.join(names[:-1])}, and {names[-1]}")
 
     plt.tight_layout()
     OUT_PNG.parent.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,162 @@
+"""
+Single entry point for every pipeline stage:
+
+    python src/cli.py <stage> [stage args]
+    python src/cli.py --list
+    python src/cli.py startup-times
+
+Only the module of the chosen stage is imported, so stages that only need
+the csv module don't pay for pandas / sklearn / matplotlib.
+"""
+from pathlib import Path
+import argparse
+import importlib
+import subprocess
+import sys
+import time
+
+SRC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC_DIR))
+
+# stage name -> (module, function, help); nothing here is imported until the stage runs
+STAGES = {
+    # Dataset_prep
+    "extract-text": ("Dataset_prep.extract_text", "main", "PDF scripts → text"),
+    "parse-dialogue": ("Dataset_prep.parse_dialogue", "main", "script text → speech TSVs"),
+    "parse-quality": ("Dataset_prep.parse_quality", "main", "parse metrics and diff against the cleaned files (--reparse)"),
+    "align-scripts": ("Dataset_prep.align_scripts", "main", "diff two versions of a script"),
+    "collect-dumbledore": ("Dataset_prep.collect_dumbledore", "main", "Dumbledore lines from all movies"),
+    "merge-cleaned": ("Dataset_prep.merge_cleaned_chars", "main", "merge manually cleaned files"),
+    "dedup": ("Dataset_prep.dedup_near_duplicates", "main", "drop near-duplicate speeches"),
+    "filter-non-trivial": ("Dataset_prep.filter_non_trivial", "main", "drop trivial lines"),
+    "filter-rhd": ("Dataset_prep.filter_ron_dubledore_hermione_non_trivial", "main", "keep target characters"),
+    "normalize-movies": ("Dataset_prep.normalize_movie_names_RDH", "main", "normalize movie names"),
+    "partition": ("Dataset_prep.character_partitions", "main", "split speeches per character"),
+    "check-normalization": ("Dataset_prep.text_normalization", "main", "normalize_text vs the buffer paths over the corpus"),
+    "corpus-manifest": ("Dataset_prep.corpus_manifest", "main", "series and movies of the corpus (--write to edit)"),
+    "check-movie-names": ("Dataset_prep.check_movie_names_rhd", "main", "list movie names and counts"),
+    "fix-labels": ("Dataset_prep.merge_misspelled_labels", "main", "fix misspelled labels"),
+    "remove-weird-characters": ("Dataset_prep.remove_weird_characters", "main", "ASCII-normalize annotation texts"),
+    "sentences": ("Dataset_prep.sentences", "main", "sentence segmentation of a text / corpus stats"),
+    "token-cache": ("Dataset_prep.tokenization", "main", "show the shared token cache"),
+    "compact-annotations": ("Dataset_prep.annotation_store", "main", "fold logged annotation fixes into the CSV"),
+    # Annotation_open_coding
+    "build-annotation": ("Annotation_open_coding.build_annotation_dataset", "main", "sample the annotation set"),
+    "sample-open-coding": ("Annotation_open_coding.sample_open_coding", "main", "sample 100 lines for open coding"),
+    "annotation-server": ("Annotation_open_coding.annotation_server", "main", "local labelling server (SQLite)"),
+    "select-annotation-batch": ("Annotation_open_coding.select_annotation_batch", "main",
+                                "next lines to annotate (uncertain + diverse)"),
+    # Analysis
+    "analyze-topics": ("Analysis.analyze_topics", "main", "top TF-IDF words per label (sklearn)"),
+    "analyze-vocab": ("Analysis.analyze_vocab", "main", "vocabulary statistics"),
+    "conversation-graph": ("Analysis.conversation_graph", "main", "speaker turns / shared scenes as sparse matrices"),
+    "ngrams": ("Analysis.ngram_stats", "main", "1-4 gram collocations per movie / character"),
+    "corpus-stats": ("Analysis.corpus_stats", "main", "lines / words per character, merged from per-movie shards"),
+    "tfidf": ("Analysis.compute_tf_idf", "main", "label-level TF-IDF table"),
+    "tfidf-sentences": ("Analysis.compute_tf_idf", "main_sentences", "label-level TF-IDF, each sentence counting a word once"),
+    "top3-topics": ("Analysis.character_top3_favourite_topic", "main", "top 3 topics per character"),
+    "agreement": ("Analysis.annotator_agreement", "main", "kappa / alpha between annotation versions"),
+    "topic-classifier": ("Analysis.topic_classifier", "main", "label every parsed line with a trained classifier"),
+    "topic-classifier-sentences": ("Analysis.topic_classifier", "main_sentences", "topic of every sentence of every line"),
+    "similar-lines": ("Analysis.similar_lines", "main", "most similar lines to a text (LSH index)"),
+    "concordance": ("Analysis.concordance", "main", "keyword-in-context lines for a word or phrase (paged)"),
+    "bootstrap-ci": ("Analysis.bootstrap_ci", "main", "bootstrap CIs for topic shares and TF-IDF words"),
+    # Visualization
+    "plot-topics-by-character": ("Visualization.bar_chart_topics_characters", "main", "grouped topic bar chart"),
+    "plot-topic-overall": ("Visualization.topic_distribution_overall", "main", "overall topic distribution"),
+    "plot-tfidf-bars": ("Visualization.plot_bar_chart", "main", "TF-IDF barplot per label"),
+    "plot-heatmap": ("Visualization.heat_map", "main", "TF-IDF heatmap"),
+    # everything at once
+    "pipeline": ("pipeline", "main", "rebuild outdated outputs (parallel, make-style)"),
+    "snapshot": ("snapshot", "main", "check pipeline outputs against the golden fingerprints"),
+}
+
+
+def run_stage(name, stage_args=()):
+    module_name, func_name, _ = STAGES[name]
+    # stages with their own argparse see only their arguments
+    sys.argv = [f"cli.py {name}"] + list(stage_args)
+    module = importlib.import_module(module_name)
+    return getattr(module, func_name)()
+
+
+def import_only(name):
+    importlib.import_module(STAGES[name][0])
+
+
+def startup_times(repeats=3):
+    """
+    Cold start of every stage: a fresh interpreter that imports the stage's
+    module and exits. Best of `repeats` runs, in milliseconds.
+    """
+    baseline = None
+    results = []
+    for name in [None] + list(STAGES):
+        cmd = [sys.executable, str(Path(__file__).resolve()), "--import-only"]
+        cmd += [name] if name else []
+        best = error = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            elapsed = (time.perf_counter() - start) * 1000
+            if proc.returncode != 0:
+                # one failed import marks the stage failed, whatever earlier runs measured
+                best = None
+                error = (proc.stderr.strip().splitlines() or [f"exit status {proc.returncode}"])[-1]
+                break
+            best = elapsed if best is None else min(best, elapsed)
+        if name is None:
+            baseline = best
+            if baseline is None:
+                print(f"cli.py --import-only failed: {error}", file=sys.stderr)
+        else:
+            results.append((name, best))
+
+    print(f"{'stage':<28} {'cold start (ms)':>16}")
+    shown = f"{baseline:.0f}" if baseline is not None else "import failed"
+    print(f"{'(cli only)':<28} {shown:>16}")
+    for name, ms in sorted(results, key=lambda x: (x[1] is None, x[1] or 0)):
+        shown = f"{ms:.0f}" if ms is not None else "import failed"
+        print(f"{name:<28} {shown:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Run one stage of the Harry Potter speech pipeline.",
+    )
+    parser.add_argument("stage", nargs="?", help="stage to run (see --list)")
+    parser.add_argument("stage_args", nargs=argparse.REMAINDER, help="arguments passed to the stage")
+    parser.add_argument("--list", action="store_true", help="list stages and exit")
+    parser.add_argument("--dry-run", action="store_true", help="show what would run without importing it")
+    parser.add_argument("--import-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.import_only:
+        if args.stage in STAGES:
+            import_only(args.stage)
+        return
+
+    if args.list or not args.stage:
+        for name, (module_name, _, help_text) in STAGES.items():
+            print(f"  {name:<26} {help_text}  [{module_name}]")
+        print(f"  {'startup-times':<26} measure cold-start time of every stage")
+        return
+
+    if args.stage == "startup-times":
+        startup_times()
+        return
+
+    if args.stage not in STAGES:
+        parser.error(f"unknown stage {args.stage!r} (see --list)")
+
+    if args.dry_run:
+        module_name, func_name, _ = STAGES[args.stage]
+        print(f"would run {module_name}.{func_name}({' '.join(args.stage_args)})")
+        return
+
+    run_stage(args.stage, args.stage_args)
+
+
+if __name__ == "__main__":
+    main()
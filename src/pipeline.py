@@ -0,0 +1,380 @@
+"""
+Make-style build of the data pipeline.
+
+Every stage declares the files it reads and writes. A stage runs only when
+one of its outputs is missing or older than one of its inputs (or than the
+stage's own source file); independent stages run in parallel worker
+processes. Files nobody produces (script texts, the manually cleaned TSVs,
+the labelled annotation file) are sources; so are the script texts
+that have no PDF in data/raw to be extracted from.
+
+    python src/pipeline.py                 # bring everything up to date
+    python src/pipeline.py tfidf -j 4      # only what tfidf needs
+    python src/pipeline.py --dry-run       # show what would run
+    python src/pipeline.py --force parse:goblet_of_fire
+"""
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import sys
+import time
+
+SRC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC_DIR))
+
+# light modules only (csv / re); their constants keep paths in one place
+from Dataset_prep.parse_dialogue import MOVIES, meta_path, movie_paths, quality_path
+from Dataset_prep.character_partitions import INPUT as PARTITION_INPUT, TARGET_CHARACTERS, partition_path
+from Dataset_prep.annotation_store import changes_path
+
+RAW_DIR = Path("data/raw")
+SPEECHES = Path("data/processed/processed_speeches")
+MANUAL_DIR = SPEECHES / "manually-clean"
+
+# labels the annotators use (one barplot each)
+TOPIC_LABELS = ["Danger", "Duty", "Informative", "Magic", "Mockery", "Relationship", "Storyline"]
+
+# name, "module:function", positional args, inputs, outputs
+Stage = namedtuple("Stage", ["name", "target", "args", "inputs", "outputs"])
+
+
+def build_stages():
+    stages = []
+
+    # script text of every movie that has its PDF in data/raw (same file name)
+    for movie in MOVIES:
+        script = movie_paths(movie)[0]
+        pdf = RAW_DIR / f"{script.stem}.pdf"
+        if pdf.exists():
+            stages.append(Stage(
+                f"extract:{movie}", "Dataset_prep.extract_text:extract_pdf", (str(pdf), str(script)), [pdf], [script],
+            ))
+
+    # one parse stage per movie of the corpus manifest, they don't depend on each other
+    all_tsvs, four_tsvs, quality_shards, meta_files = [], [], [], []
+    for movie in MOVIES:
+        script, out_all, out_four = movie_paths(movie)
+        out_quality = quality_path(movie)
+        out_meta = meta_path(movie)
+        all_tsvs.append(out_all)
+        four_tsvs.append(out_four)
+        quality_shards.append(out_quality)
+        meta_files.append(out_meta)
+        stages.append(Stage(
+            f"parse:{movie}", "Dataset_prep.parse_dialogue:parse_movie",
+            (str(script), str(out_all), str(out_four), str(out_quality), str(out_meta)), [script],
+            [out_all, out_four, out_quality, out_meta],
+        ))
+
+    stages.append(Stage(
+        "collect-dumbledore", "Dataset_prep.collect_dumbledore:main", (),
+        all_tsvs + meta_files, [SPEECHES / "dumbledore_all_movies.csv"],
+    ))
+
+    # the manually cleaned files are edited by hand from the parse outputs, so they are sources
+    manual_four = sorted([*MANUAL_DIR.glob("*_four_chars.tsv"), *MANUAL_DIR.glob("*/*_four_chars.tsv")])
+    manual = manual_four + [MANUAL_DIR / "dumbledore_all_movies_manual_clean.csv"]
+    stages.append(Stage(
+        "merge-cleaned", "Dataset_prep.merge_cleaned_chars:main", (),
+        manual, [SPEECHES / "final_chars_speeches_cleaned.csv"],
+    ))
+    # metrics of every parse, and the parse checked against the cleaned files
+    stages.append(Stage(
+        "parse-quality", "Dataset_prep.parse_quality:main", (),
+        quality_shards + four_tsvs + manual_four,
+        [SPEECHES / "parse_quality.csv", SPEECHES / "parse_manual_diff.csv", SPEECHES / "parse_suspicious_cues.csv"],
+    ))
+    stages.append(Stage(
+        "dedup", "Dataset_prep.dedup_near_duplicates:main", (),
+        [SPEECHES / "final_chars_speeches_cleaned.csv"],
+        [SPEECHES / "final_chars_speeches_dedup.csv", SPEECHES / "near_duplicates_report.csv"],
+    ))
+    stages.append(Stage(
+        "filter-non-trivial", "Dataset_prep.filter_non_trivial:main", (),
+        [SPEECHES / "final_chars_speeches_dedup.csv"], [SPEECHES / "final_chars_speeches_non_trivial.csv"],
+    ))
+    stages.append(Stage(
+        "filter-rhd", "Dataset_prep.filter_ron_dubledore_hermione_non_trivial:main", (),
+        [SPEECHES / "final_chars_speeches_non_trivial.csv"], [SPEECHES / "final_chars_speeches_non_trivial_RHD.csv"],
+    ))
+    stages.append(Stage(
+        "normalize-movies", "Dataset_prep.normalize_movie_names_RDH:main", (),
+        [SPEECHES / "final_chars_speeches_non_trivial_RHD.csv"],
+        [SPEECHES / "final_chars_speeches_non_trivial_RHD_normalized.csv"],
+    ))
+
+    # the samples are drawn from the checked-in cleaned_non_trivial_RHD files (sources), not from the outputs
+    # above: the labelled data is keyed on their rows
+    partitions = [partition_path(c) for c in TARGET_CHARACTERS]
+    stages.append(Stage(
+        "partition", "Dataset_prep.character_partitions:main", (),
+        [PARTITION_INPUT], partitions,
+    ))
+    stages.append(Stage(
+        "build-annotation", "Annotation_open_coding.build_annotation_dataset:main", (),
+        partitions, [SPEECHES / "annotation_dataset_RHD.csv"],
+    ))
+    stages.append(Stage(
+        "sample-open-coding", "Annotation_open_coding.sample_open_coding:main", (),
+        [PARTITION_INPUT.parent / "final_chars_speeches_non_trivial_RHD.csv"], [SPEECHES / "open_coding_sample_RHD_100.csv"],
+    ))
+
+    # everything below starts from the labelled file the annotators hand back
+    annotated = [SPEECHES / "annotation_dataset_RHD_final.csv"]
+    # fixes waiting in the change log count as edits of the labelled file
+    annotated += [p for p in [changes_path(annotated[0])] if p.exists()]
+    stages.append(Stage(
+        "select-annotation-batch", "Annotation_open_coding.select_annotation_batch:main", (),
+        annotated + partitions, [SPEECHES / "annotation_batch_next.csv"],
+    ))
+    tfidf = SPEECHES / "tfidf_custom_labels.csv"
+    stages.append(Stage("tfidf", "Analysis.compute_tf_idf:main", (), annotated, [tfidf]))
+    stages.append(Stage(
+        "tfidf-sentences", "Analysis.compute_tf_idf:main_sentences", (),
+        annotated, [SPEECHES / "tfidf_custom_labels_sentences.csv"],
+    ))
+
+    tfidf_ci = SPEECHES / "tfidf_custom_labels_ci.csv"
+    stages.append(Stage(
+        "bootstrap-ci", "Analysis.bootstrap_ci:main", (),
+        annotated + [tfidf], [SPEECHES / "topic_distribution_RHD_ci.csv", tfidf_ci],
+    ))
+
+    for label in TOPIC_LABELS:
+        out = SPEECHES / "tfidf_barplots" / f"{label}_tfidf_barplot.png"
+        stages.append(Stage(
+            f"plot-tfidf-bars:{label}", "Visualization.plot_bar_chart:render_label",
+            (label,), [tfidf, tfidf_ci], [out],
+        ))
+
+    stages.append(Stage(
+        "plot-heatmap", "Visualization.heat_map:main", (),
+        [tfidf], [SPEECHES / "tfidf_heatmap_all_labels.png"],
+    ))
+    stages.append(Stage(
+        "plot-topics-by-character", "Visualization.bar_chart_topics_characters:main", (),
+        annotated, [SPEECHES / "topic_distribution_RHD.png"],
+    ))
+    graph_dir = SPEECHES / "conversation_graph"
+    stages.append(Stage(
+        "conversation-graph", "Analysis.conversation_graph:main", (),
+        all_tsvs + meta_files, [graph_dir / "characters.csv", graph_dir / "scene_turns.csv"],
+    ))
+    stages.append(Stage(
+        "ngrams", "Analysis.ngram_stats:main", (),
+        all_tsvs, [SPEECHES / "ngram_collocations.csv"],
+    ))
+    # per-movie shards of the corpus statistics, merged into one table
+    shards = []
+    for movie, out_all, out_meta in zip(MOVIES, all_tsvs, meta_files):
+        shard = SPEECHES / "shards" / MOVIES[movie].series / f"{movie}.json"
+        shards.append(shard)
+        stages.append(Stage(
+            f"corpus-stats:{movie}", "Analysis.corpus_stats:shard_stats", (movie,), [out_all, out_meta], [shard],
+        ))
+    stages.append(Stage(
+        "corpus-stats", "Analysis.corpus_stats:merge_stats", (),
+        shards, [SPEECHES / "corpus_character_stats.csv", SPEECHES / "corpus_movie_stats.csv"],
+    ))
+    predictions = SPEECHES / "topic_predictions_all_lines.csv"
+    stages.append(Stage(
+        "topic-classifier", "Analysis.topic_classifier:main", (),
+        annotated + all_tsvs + meta_files, [predictions],
+    ))
+    stages.append(Stage(
+        "topic-classifier-sentences", "Analysis.topic_classifier:main_sentences", (),
+        annotated + all_tsvs + meta_files, [SPEECHES / "topic_predictions_sentences.csv"],
+    ))
+    stages.append(Stage(
+        "plot-topics-by-character-all", "Visualization.bar_chart_topics_characters:main",
+        (str(predictions), str(SPEECHES / "topic_distribution_RHD_all_lines.png")),
+        [predictions], [SPEECHES / "topic_distribution_RHD_all_lines.png"],
+    ))
+    stages.append(Stage(
+        "plot-topic-overall", "Visualization.topic_distribution_overall:main", (),
+        annotated, [SPEECHES / "topic_distribution_overall.png"],
+    ))
+    return stages
+
+
+def source_file(stage):
+    module = stage.target.split(":")[0]
+    return SRC_DIR / (module.replace(".", "/") + ".py")
+
+
+def mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def is_outdated(stage):
+    outputs = [mtime(p) for p in stage.outputs]
+    if any(t is None for t in outputs):
+        return True
+    newest_input = max(
+        [t for t in (mtime(p) for p in stage.inputs) if t is not None] + [mtime(source_file(stage)) or 0]
+    )
+    return min(outputs) < newest_input
+
+
+def run_stage(target, args):
+    # runs inside a worker process; output is captured so parallel stages don't interleave
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    os.environ.setdefault("MPLBACKEND", "Agg")
+
+    module_name, func_name = target.split(":")
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        func = getattr(importlib.import_module(module_name), func_name)
+        func(*args)
+    return log.getvalue(), time.perf_counter() - start
+
+
+def plan(stages, targets=None):
+    """
+    Wire stages together through their files. Returns (stages to consider,
+    {stage name: names of the stages producing its inputs}).
+    """
+    by_name = {s.name: s for s in stages}
+    producer = {}
+    for s in stages:
+        for out in s.outputs:
+            producer[Path(out)] = s.name
+
+    deps = {s.name: {producer[Path(p)] for p in s.inputs if Path(p) in producer} for s in stages}
+
+    if targets:
+        # everything the requested stages need, transitively
+        wanted, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name in wanted:
+                continue
+            if name not in by_name:
+                raise SystemExit(f"unknown stage {name!r}")
+            wanted.add(name)
+            todo.extend(deps[name])
+        stages = [s for s in stages if s.name in wanted]
+
+    return stages, deps
+
+
+def build(stages, deps, jobs=None, force=(), dry_run=False):
+    names = {s.name for s in stages}
+    pending = {s.name: s for s in stages}
+    waiting_on = {name: {d for d in deps[name] if d in names} for name in names}
+    done, failed, ran = set(), set(), []
+
+    def ready():
+        # a failed input makes a stage ready too, so it is skipped instead of waiting forever
+        return [
+            pending[name] for name in list(pending)
+            if not (waiting_on[name] - done - failed)
+        ]
+
+    if dry_run:
+        # staleness only changes when something runs, so assume every outdated stage reruns
+        rerun = set()
+        for s in stages:  # stages are declared in dependency order
+            if s.name in force or is_outdated(s) or deps[s.name] & rerun:
+                rerun.add(s.name)
+                print(f"would run  {s.name}")
+        if not rerun:
+            print("Everything is up to date.")
+        return True
+
+    executor = None
+    running = {}
+    try:
+        while pending or running:
+            batch = ready()
+            for stage in batch:
+                del pending[stage.name]
+                if waiting_on[stage.name] & failed:
+                    failed.add(stage.name)
+                    print(f"skipped    {stage.name} (an input stage failed)")
+                    continue
+
+                missing = [str(p) for p in stage.inputs if mtime(p) is None]
+                if missing:
+                    failed.add(stage.name)
+                    print(f"FAILED     {stage.name}: missing input {missing[0]}")
+                    continue
+
+                if stage.name not in force and not is_outdated(stage):
+                    done.add(stage.name)
+                    continue
+
+                # the pool only starts once there is real work, so a no-op refresh costs a few stat() calls
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=jobs or os.cpu_count())
+                running[executor.submit(run_stage, stage.target, stage.args)] = stage.name
+                print(f"started    {stage.name}")
+
+            if not running:
+                if pending and not batch:
+                    # nothing can start and nothing will finish: stop instead of spinning
+                    for name in sorted(pending):
+                        failed.add(name)
+                        print(f"FAILED     {name}: waiting on {', '.join(sorted(waiting_on[name] - done - failed))}")
+                    pending.clear()
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    log, seconds = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    print(f"FAILED     {name}: {e!r}")
+                    continue
+                done.add(name)
+                ran.append(name)
+                print(f"finished   {name} ({seconds:.1f}s)")
+                for line in log.strip().splitlines():
+                    print(f"    {line}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not ran and not failed:
+        print("Everything is up to date.")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild outdated pipeline outputs.")
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="rerun the named targets even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would run")
+    parser.add_argument("--list", action="store_true", help="list stages with their inputs and outputs")
+    args = parser.parse_args()
+
+    stages, deps = plan(build_stages(), args.targets)
+
+    if args.list:
+        for s in stages:
+            state = "outdated" if is_outdated(s) else "ok"
+            print(f"{s.name:<32} [{state}]  after: {', '.join(sorted(deps[s.name])) or '-'}")
+            for out in s.outputs:
+                print(f"    → {out}")
+        return
+
+    force = set(args.targets) if args.force else set()
+    ok = build(stages, deps, jobs=args.jobs, force=force, dry_run=args.dry_run)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Golden-output regression check for the pipeline.
+
+Rewrites of parse_dialogue, filter_non_trivial, the stratified annotation
+sample (build_annotation_dataset.py) or compute_tf_idf must not change
+what the annotators labelled against. This runs those stages (and the
+stages they need) with pipeline.py on a scratch copy of the checked-in
+sources and compares each output with the fingerprint stored in GOLDEN:
+
+- row count and header
+- one hash per column (values in row order)
+- one hash per block of BLOCK_ROWS rows, which locates a change to a row range
+- the top-k TF-IDF table itself, row by row
+
+Differences are printed per file (which columns, which rows, which TF-IDF
+rows appeared or disappeared) and the exit status is 1.
+
+    python src/snapshot.py              # check
+    python src/snapshot.py --update     # accept the current outputs as golden
+    python src/snapshot.py --keep DIR   # also keep the scratch outputs in DIR
+"""
+from hashlib import blake2b
+from pathlib import Path
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+SRC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(SRC_DIR))
+
+from pipeline import RAW_DIR, SPEECHES, MANUAL_DIR, build, build_stages, plan
+from Dataset_prep.corpus_manifest import MANIFEST_PATH
+from Dataset_prep.parse_dialogue import MOVIES, SCRIPTS_DIR, movie_paths
+from Dataset_prep.tokenization import CACHE_PATH
+from Dataset_prep.annotation_store import changes_path
+from Dataset_prep.character_partitions import INPUT as PARTITION_INPUT
+
+GOLDEN = Path("data/snapshots/golden.json")
+
+ANNOTATED = SPEECHES / "annotation_dataset_RHD_final.csv"
+
+# checked-in inputs copied to the scratch folder (the token cache only saves time), in this order:
+# the copies get fresh mtimes, so the script texts are newer than their PDFs and are not extracted again
+SOURCES = [RAW_DIR, SCRIPTS_DIR, MANUAL_DIR, PARTITION_INPUT.parent, ANNOTATED, changes_path(ANNOTATED), MANIFEST_PATH,
+           CACHE_PATH]
+
+TFIDF = SPEECHES / "tfidf_custom_labels.csv"
+TABLES = {TFIDF}  # stored in full, compared row by row
+
+BLOCK_ROWS = 64  # rows per block hash
+
+
+def checked_outputs():
+    """Output file -> stage that writes it."""
+    outputs = {}
+    for movie in MOVIES:
+        _, out_all, out_four = movie_paths(movie)
+        outputs[out_all] = outputs[out_four] = f"parse:{movie}"
+    outputs[SPEECHES / "final_chars_speeches_non_trivial.csv"] = "filter-non-trivial"
+    outputs[SPEECHES / "annotation_dataset_RHD.csv"] = "build-annotation"
+    outputs[TFIDF] = "tfidf"
+    return outputs
+
+
+def _hash():
+    return blake2b(digest_size=8)
+
+
+def read_table(path):
+    path = Path(path)
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix == ".tsv":
+            # parse_dialogue writes texts unquoted
+            return list(csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE))
+        return list(csv.reader(f))
+
+
+def fingerprint(path, table=False):
+    rows = read_table(path)
+    header, body = (rows[0], rows[1:]) if rows else ([], [])
+    columns = [_hash() for _ in header]
+    blocks = []
+    for start in range(0, len(body), BLOCK_ROWS):
+        block = _hash()
+        for row in body[start:start + BLOCK_ROWS]:
+            for i, h in enumerate(columns):
+                value = (row[i] if i < len(row) else "").encode("utf-8")
+                h.update(value + b"\x00")
+                block.update(value + b"\x00")
+            block.update(b"\x01")
+        blocks.append(block.hexdigest())
+
+    result = {
+        "rows": len(body),
+        "header": header,
+        "columns": {name: h.hexdigest() for name, h in zip(header, columns)},
+        "blocks": blocks,
+    }
+    if table:
+        result["table"] = body
+    return result
+
+
+def compare(name, golden, current):
+    """Lines describing how current differs from golden (empty = same)."""
+    if golden is None:
+        return [f"{name}: not in the golden snapshot (run --update to add it)"]
+    if current is None:
+        return [f"{name}: not produced"]
+
+    diffs = []
+    if golden["rows"] != current["rows"]:
+        diffs.append(f"{name}: {golden['rows']} rows → {current['rows']}")
+    if golden["header"] != current["header"]:
+        diffs.append(f"{name}: header {golden['header']} → {current['header']}")
+
+    changed = [c for c in golden["columns"] if current["columns"].get(c, golden["columns"][c]) != golden["columns"][c]]
+    if changed:
+        diffs.append(f"{name}: columns changed: {', '.join(changed)}")
+
+    blocks = [i for i, (a, b) in enumerate(zip(golden["blocks"], current["blocks"])) if a != b]
+    if len(golden["blocks"]) != len(current["blocks"]):
+        blocks.append(min(len(golden["blocks"]), len(current["blocks"])))
+    if blocks:
+        spans = [f"{i * BLOCK_ROWS + 1}-{(i + 1) * BLOCK_ROWS}" for i in blocks[:5]]
+        more = f" (+{len(blocks) - 5} more blocks)" if len(blocks) > 5 else ""
+        diffs.append(f"{name}: first changed rows: {', '.join(spans)}{more}")
+
+    if "table" in golden:
+        old = {tuple(r) for r in golden["table"]}
+        new = {tuple(r) for r in current.get("table", [])}
+        for row in [r for r in golden["table"] if tuple(r) not in new][:10]:
+            diffs.append(f"{name}:   - {','.join(row)}")
+        for row in [r for r in current.get("table", []) if tuple(r) not in old][:10]:
+            diffs.append(f"{name}:   + {','.join(row)}")
+    return diffs
+
+
+def run_stages(workdir, jobs=None):
+    """Run everything the checked outputs need inside workdir. Returns {output: fingerprint or None}."""
+    for source in SOURCES:
+        if not source.exists():
+            continue
+        target = workdir / source
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.is_dir():
+            shutil.copytree(source, target, copy_function=shutil.copy)
+        else:
+            shutil.copy(source, target)
+
+    outputs = checked_outputs()
+    cwd = os.getcwd()
+    log = io.StringIO()
+    os.chdir(workdir)  # every path in the pipeline is relative to the project root
+    try:
+        stages, deps = plan(build_stages(), sorted(set(outputs.values())))
+        with contextlib.redirect_stdout(log):
+            ok = build(stages, deps, jobs=jobs)
+        if not ok:
+            print(log.getvalue())
+        return {out: fingerprint(out, out in TABLES) if out.exists() else None for out in outputs}
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pipeline outputs with the golden snapshot.")
+    parser.add_argument("--update", action="store_true", help="store the current outputs as the golden snapshot")
+    parser.add_argument("--keep", metavar="DIR", help="keep the scratch outputs in DIR")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.keep:
+        workdir = Path(args.keep)
+        if workdir.exists():
+            raise SystemExit(f"{workdir} already exists")
+        current = run_stages(workdir, args.jobs)
+    else:
+        with tempfile.TemporaryDirectory(prefix="snapshot_") as tmp:
+            current = run_stages(Path(tmp), args.jobs)
+    elapsed = time.perf_counter() - start
+
+    if args.update:
+        GOLDEN.parent.mkdir(parents=True, exist_ok=True)
+        with GOLDEN.open("w", encoding="utf-8") as f:
+            json.dump({str(p): fp for p, fp in current.items() if fp is not None}, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        print(f"Stored fingerprints of {len(current)} outputs → {GOLDEN} ({elapsed:.1f}s)")
+        return
+
+    if not GOLDEN.exists():
+        raise SystemExit(f"{GOLDEN} not found, run with --update first")
+    with GOLDEN.open("r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    diffs = []
+    for path, fp in current.items():
+        diffs += compare(str(path), golden.get(str(path)), fp)
+    for path in golden:
+        if Path(path) not in current:
+            diffs.append(f"{path}: in the golden snapshot but no longer checked")
+
+    if diffs:
+        print(f"{len(current)} outputs checked in {elapsed:.1f}s, differences:")
+        for line in diffs:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"{len(current)} outputs match the golden snapshot ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()